@@ -1,15 +1,38 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request, Query
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Request, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, desc, asc
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Text, Index, desc, asc, text, and_, or_, false, func, literal_column, table, column, select, insert, update, delete
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm import sessionmaker, Session, relationship, make_transient_to_detached
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from pydantic import BaseModel, constr
-from typing import List, Optional
+from pydantic import BaseModel, ValidationError, constr
+from typing import Any, Dict, List, Optional
+import anyio
+import asyncio
+import base64
+import binascii
+import csv
+import io
+import json
 import jwt
+import logging
+import multiprocessing
+import queue
+import struct
+import threading
 import time
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, namedtuple
+from contextvars import ContextVar
+from concurrent.futures import Future, ProcessPoolExecutor
 
 # -----------------------------
 # Настройки приложения и БД
@@ -17,18 +40,121 @@ import time
 import os
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # без orjson ответы кодируются стандартным json с тем же результатом
+    orjson = None
+
 load_dotenv() # Загружаем переменные из .env файла
 
+logger = logging.getLogger("benetasks")
+
 DB_HOST = os.getenv("POSTGRES_HOST")
 DB_PORT = os.getenv("POSTGRES_PORT")
 DB_NAME = os.getenv("POSTGRES_DB")
 DB_USER = os.getenv("POSTGRES_USER")
 DB_PASS = os.getenv("POSTGRES_PASSWORD")
 
-DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+def postgres_url(driver: str) -> str:
+    # без POSTGRES_* модуль всё равно импортируется: инструменты (datagen) передают адрес БД явно
+    return URL.create(f"postgresql+{driver}", username=DB_USER, password=DB_PASS, host=DB_HOST,
+                      port=int(DB_PORT) if DB_PORT else None,
+                      database=DB_NAME).render_as_string(hide_password=False)
+
+DATABASE_URL = os.getenv("DATABASE_URL", postgres_url("psycopg2"))
+# Асинхронный режим (AsyncSession + asyncpg): DB_ASYNC=1
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", postgres_url("asyncpg"))
+
+# Пул соединений: размер подбирается под число воркеров и потоков (у каждого воркера свой пул)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))    # секунд ожидания свободного соединения
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))    # секунд; -1 — не пересоздавать
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"   # проверять соединение перед выдачей
+
+class PoolStats:
+    """Счётчики ожидания соединений пула (накопительные, переживают dispose())."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, elapsed: float, timed_out: bool):
+        with self._lock:
+            self.checkouts += not timed_out
+            self.timeouts += timed_out
+            self.wait_total += elapsed
+            self.wait_max = max(self.wait_max, elapsed)
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            return {
+                "size": pool.size(),
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_total, 6),
+                "wait_seconds_max": round(self.wait_max, 6),
+            }
 
-engine = create_engine(DATABASE_URL)
+class TimedCheckoutPool:
+    """Примесь к QueuePool: замеряет время ожидания соединения и таймауты пула."""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        stats = self.stats
+        with stats._lock:
+            stats.waiting += 1
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            with stats._lock:
+                stats.waiting -= 1
+            stats.record(time.perf_counter() - started, timed_out)
+
+class InstrumentedQueuePool(TimedCheckoutPool, QueuePool):
+    stats = PoolStats()
+
+class InstrumentedAsyncQueuePool(TimedCheckoutPool, AsyncAdaptedQueuePool):
+    stats = PoolStats()
+
+def engine_options(url: str, poolclass) -> dict:
+    """Параметры пула для create_engine()/create_async_engine()."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options  # SQLite в памяти живёт в одном соединении — размер пула к нему не применим
+    options.update(poolclass=poolclass, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+                   pool_timeout=DB_POOL_TIMEOUT)
+    return options
+
+def pool_metrics(bind) -> dict:
+    pool = bind.pool
+    if not isinstance(pool, TimedCheckoutPool):
+        return {"pool": type(pool).__name__}
+    return pool.stats.snapshot(pool)
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, InstrumentedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = (create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, InstrumentedAsyncQueuePool))
+                if DB_ASYNC else None)
+# expire_on_commit=False: после commit атрибуты не перечитываются лениво (в async это недопустимо)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # -----------------------------
@@ -52,6 +178,382 @@ class Task(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="tasks")
 
+    # Составные индексы под форму запросов эндпоинтов: фильтр по owner_id + порядок выдачи.
+    # Для существующих БД они добавляются миграцией 2 (см. «Миграции схемы»).
+    __table_args__ = (
+        Index("ix_tasks_owner_id_id", "owner_id", "id"),                        # GET /tasks, пагинация
+        Index("ix_tasks_owner_title", "owner_id", "title", "id"),               # sort_by=title
+        Index("ix_tasks_owner_status", "owner_id", "status", "id"),             # sort_by=status
+        Index("ix_tasks_owner_created", "owner_id", "created_at", "id"),        # sort_by=created_at
+        Index("ix_tasks_owner_priority_created",                                # топ по умолчанию, priority=
+              "owner_id", desc("priority"), desc("created_at"), desc("id")),
+        Index("ix_tasks_owner_priority_asc_created",                            # топ all_priorities, sort_by=priority
+              "owner_id", "priority", desc("created_at"), desc("id")),
+    )
+
+class TaskCounter(Base):
+    """Число задач владельца с данными статусом и приоритетом; ведётся триггерами на tasks."""
+    __tablename__ = "task_counters"
+    owner_id = Column(Integer, primary_key=True, autoincrement=False)
+    status = Column(String, primary_key=True)
+    priority = Column(Integer, primary_key=True, autoincrement=False)
+    count = Column(Integer, nullable=False, default=0)
+
+# -----------------------------
+# Полнотекстовый поиск (параметр search)
+# -----------------------------
+# PostgreSQL: GIN-индекс по выражению tsvector (русская и английская морфология)
+#             + триграммные GIN-индексы pg_trgm для поиска подстроки (ILIKE '%x%').
+#             Индексы строятся CONCURRENTLY: таблица не переписывается и запись не блокируется.
+#             Запрос должен использовать в точности SEARCH_VECTOR — иначе планировщик не возьмёт индекс.
+# SQLite:     FTS5-таблица tasks_fts с триграммным токенизатором, синхронизируется триггерами.
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+SEARCH_DDL = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    ],
+    "sqlite": [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+            title, description, content='tasks', content_rowid='id', tokenize='trigram'
+        )""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS tasks_fts_au AFTER UPDATE OF title, description ON tasks BEGIN
+            INSERT INTO tasks_fts(tasks_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+    ],
+}
+SEARCH_INDEXES = {
+    "postgresql": [
+        ("ix_tasks_search_tsv", "tasks", f"USING gin (({SEARCH_VECTOR}))"),
+        ("ix_tasks_title_trgm", "tasks", "USING gin (title gin_trgm_ops)"),
+        ("ix_tasks_description_trgm", "tasks", "USING gin (description gin_trgm_ops)"),
+    ],
+}
+SQLITE_TRIGRAM_MIN_LENGTH = 3  # более короткие строки триграммный индекс не находит
+tasks_fts = table("tasks_fts", column("rowid"), column("rank"))
+SQLITE_SEARCH_TRIGGERS = ["tasks_fts_ai", "tasks_fts_ad", "tasks_fts_au"]
+
+def create_index(connection, name: str, table_name: str, definition: str):
+    """
+    CREATE INDEX IF NOT EXISTS. На PostgreSQL в autocommit-соединении индекс строится
+    CONCURRENTLY — без блокировки записи в таблицу.
+    """
+    autocommit = connection.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+    if connection.dialect.name == "postgresql" and autocommit:
+        # прерванная постройка CONCURRENTLY оставляет INVALID-индекс — пересоздаём его
+        invalid = connection.execute(text(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name AND NOT i.indisvalid"
+        ), {"name": name}).first()
+        if invalid:
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table_name} {definition}"))
+    else:
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table_name} {definition}"))
+
+def install_search_index(connection):
+    """Идемпотентно создаёт поисковые индексы для диалекта соединения."""
+    dialect = connection.dialect.name
+    rebuild = dialect == "sqlite" and connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'")
+    ).first() is None
+    for statement in SEARCH_DDL.get(dialect, []):
+        connection.execute(text(statement))
+    for name, table_name, definition in SEARCH_INDEXES.get(dialect, []):
+        create_index(connection, name, table_name, definition)
+    if rebuild:
+        # индекс появился у уже заполненной таблицы — проиндексируем существующие строки
+        connection.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+
+@event.listens_for(Task.__table__, "after_create")
+def _create_search_index(target, connection, **kw):
+    install_search_index(connection)
+
+@event.listens_for(Task.__table__, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS tasks_fts"))
+
+def apply_search(query, dialect: str, search: str):
+    """
+    Добавляет к запросу фильтр по search.
+    Возвращает (запрос, выражение сортировки по релевантности или None).
+    """
+    if dialect == "postgresql":
+        vector = literal_column(f"({SEARCH_VECTOR})")
+        tsquery = func.plainto_tsquery("russian", search).op("||")(func.plainto_tsquery("english", search))
+        query = query.filter(
+            vector.op("@@")(tsquery)
+            | Task.title.icontains(search, autoescape=True)
+            | Task.description.icontains(search, autoescape=True)
+        )
+        return query, desc(func.ts_rank(vector, tsquery) + func.similarity(Task.title, search))
+    if dialect == "sqlite" and len(search) >= SQLITE_TRIGRAM_MIN_LENGTH:
+        phrase = '"' + search.replace('"', '""') + '"'
+        query = query.join(tasks_fts, tasks_fts.c.rowid == Task.id).filter(
+            text("tasks_fts MATCH :search_phrase").bindparams(search_phrase=phrase)
+        )
+        return query, asc(tasks_fts.c.rank)
+    # простой поиск подстроки в заголовке или описании
+    query = query.filter(
+        Task.title.contains(search, autoescape=True) | Task.description.contains(search, autoescape=True)
+    )
+    return query, None
+
+# -----------------------------
+# Счётчики задач по статусам и приоритетам (GET /tasks/stats)
+# -----------------------------
+# task_counters хранит по строке на (владелец, статус, приоритет). Триггеры на tasks меняют
+# счётчик в той же транзакции, что и задачу, поэтому его видят все пути записи: CRUD, пакетные
+# операции, импорт через COPY и правки прямым SQL. Пустые статус и приоритет учитываются как
+# '' и -1 (столбцы ключа не допускают NULL). reconcile_task_counters пересчитывает счётчики
+# по задачам — после сбоев, восстановления из бэкапа или загрузки с отключёнными триггерами.
+TASK_STATUSES = ["в ожидании", "в работе", "завершено"]
+TASK_COUNTER_TRIGGERS = ["task_counters_ai", "task_counters_ad", "task_counters_au"]
+
+def _counter_key(row: str) -> str:
+    return f"coalesce({row}.owner_id, 0), coalesce({row}.status, ''), coalesce({row}.priority, -1)"
+
+def _counter_match(row: str) -> str:
+    return (f"owner_id = coalesce({row}.owner_id, 0) AND status = coalesce({row}.status, '') "
+            f"AND priority = coalesce({row}.priority, -1)")
+
+_COUNTER_CHANGED = "old.owner_id IS NOT new.owner_id OR old.status IS NOT new.status OR old.priority IS NOT new.priority"
+
+TASK_COUNTER_DDL = {
+    "sqlite": [
+        f"""CREATE TRIGGER IF NOT EXISTS task_counters_ai AFTER INSERT ON tasks BEGIN
+            INSERT INTO task_counters (owner_id, status, priority, count) VALUES ({_counter_key('new')}, 1)
+            ON CONFLICT (owner_id, status, priority) DO UPDATE SET count = count + 1;
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS task_counters_ad AFTER DELETE ON tasks BEGIN
+            UPDATE task_counters SET count = count - 1 WHERE {_counter_match('old')};
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS task_counters_au AFTER UPDATE OF owner_id, status, priority ON tasks
+        WHEN {_COUNTER_CHANGED} BEGIN
+            UPDATE task_counters SET count = count - 1 WHERE {_counter_match('old')};
+            INSERT INTO task_counters (owner_id, status, priority, count) VALUES ({_counter_key('new')}, 1)
+            ON CONFLICT (owner_id, status, priority) DO UPDATE SET count = count + 1;
+        END""",
+    ],
+    "postgresql": [
+        f"""CREATE OR REPLACE FUNCTION task_counters_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE task_counters SET count = count - 1 WHERE {_counter_match('OLD')};
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO task_counters (owner_id, status, priority, count) VALUES ({_counter_key('NEW')}, 1)
+                ON CONFLICT (owner_id, status, priority) DO UPDATE SET count = task_counters.count + 1;
+            END IF;
+            RETURN NULL;
+        END $$ LANGUAGE plpgsql""",
+        "CREATE TRIGGER task_counters_ai AFTER INSERT ON tasks FOR EACH ROW EXECUTE FUNCTION task_counters_apply()",
+        "CREATE TRIGGER task_counters_ad AFTER DELETE ON tasks FOR EACH ROW EXECUTE FUNCTION task_counters_apply()",
+        f"""CREATE TRIGGER task_counters_au AFTER UPDATE OF owner_id, status, priority ON tasks FOR EACH ROW
+        WHEN ({_COUNTER_CHANGED.replace(' IS NOT ', ' IS DISTINCT FROM ')})
+        EXECUTE FUNCTION task_counters_apply()""",
+    ],
+}
+
+def task_counter_triggers_installed(connection) -> bool:
+    if connection.dialect.name == "postgresql":
+        query = "SELECT 1 FROM pg_trigger WHERE tgname = :name"
+    else:
+        query = "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = :name"
+    return connection.execute(text(query), {"name": TASK_COUNTER_TRIGGERS[0]}).first() is not None
+
+RECONCILE_BATCH_OWNERS = int(os.getenv("RECONCILE_BATCH_OWNERS", "1000"))
+
+def reconcile_task_counters(connection, owner_id: Optional[int] = None, owner_range=None) -> int:
+    """
+    Пересобирает счётчики владельца, диапазона владельцев [low, high) или всех из строк tasks;
+    возвращает число строк счётчиков. Вызывать внутри транзакции: на PostgreSQL tasks
+    блокируется от записи до её конца — для всей таблицы используйте reconcile_task_counters_in_batches.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("LOCK TABLE tasks IN SHARE MODE"))
+    key = [func.coalesce(Task.owner_id, 0), func.coalesce(Task.status, ""), func.coalesce(Task.priority, -1)]
+    counted = select(*key, func.count()).group_by(*key)
+    clear = delete(TaskCounter)
+    if owner_id is not None:
+        counted = counted.where(Task.owner_id == owner_id)
+        clear = clear.where(TaskCounter.owner_id == owner_id)
+    if owner_range is not None:
+        low, high = owner_range
+        condition = and_(Task.owner_id >= low, Task.owner_id < high)
+        if low <= 0 < high:
+            condition = or_(condition, Task.owner_id.is_(None))  # задачи без владельца считаются как owner_id 0
+        counted = counted.where(condition)
+        clear = clear.where(TaskCounter.owner_id >= low, TaskCounter.owner_id < high)
+    connection.execute(clear)
+    result = connection.execute(insert(TaskCounter).from_select(
+        ["owner_id", "status", "priority", "count"], counted
+    ))
+    return result.rowcount
+
+def reconcile_task_counters_in_batches(bind, batch_owners: int = RECONCILE_BATCH_OWNERS) -> int:
+    """
+    Пересчёт всех счётчиков короткими транзакциями по диапазонам owner_id: блокировка tasks
+    держится, пока считается один диапазон (по индексу owner_id), а не вся таблица.
+    Триггеры должны быть уже установлены: диапазоны, пересчитанные раньше, дальше ведут они,
+    а владельцы, появившиеся после подсчёта границ, с самого начала учитываются триггерами.
+    """
+    with bind.connect() as connection:
+        low, high = connection.execute(select(func.min(Task.owner_id), func.max(Task.owner_id))).one()
+    low = min(low if low is not None else 0, 0)
+    high = max(high if high is not None else 0, 0)
+    rows = 0
+    for start in range(low, high + 1, batch_owners):
+        with bind.begin() as connection:
+            rows += reconcile_task_counters(connection, owner_range=(start, start + batch_owners))
+    return rows
+
+def install_task_counters(connection, reconcile: bool = True):
+    """
+    Идемпотентно создаёт таблицу и триггеры; при первой установке заполняет счётчики по задачам
+    (reconcile=False — заполнение остаётся вызывающему, см. миграцию 3).
+    """
+    TaskCounter.__table__.create(connection, checkfirst=True)
+    if connection.dialect.name not in TASK_COUNTER_DDL or task_counter_triggers_installed(connection):
+        return
+    for statement in TASK_COUNTER_DDL[connection.dialect.name]:
+        connection.execute(text(statement))
+    if reconcile:
+        reconcile_task_counters(connection)
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_task_counters(target, connection, tables=(), **kw):
+    # только для новой БД, где tasks создана этим же create_all: в существующую БД счётчики
+    # ставит миграция 3 под advisory-lock, а не каждый воркер при старте
+    if Task.__table__ in tables:
+        install_task_counters(connection)
+
+def task_stats_statement(owner_id: int):
+    return select(TaskCounter.status, TaskCounter.priority, TaskCounter.count).where(
+        TaskCounter.owner_id == owner_id, TaskCounter.count > 0
+    )
+
+def task_stats(rows) -> dict:
+    """Итог GET /tasks/stats из строк счётчиков: известные статусы есть в ответе всегда, даже с нулём."""
+    total, by_status, by_priority = 0, dict.fromkeys(TASK_STATUSES, 0), {}
+    for status_value, priority, count in rows:
+        total += count
+        if status_value != "":
+            by_status[status_value] = by_status.get(status_value, 0) + count
+        if priority != -1:
+            by_priority[priority] = by_priority.get(priority, 0) + count
+    return {"total": total, "by_status": by_status, "by_priority": dict(sorted(by_priority.items()))}
+
+# -----------------------------
+# Миграции схемы
+# -----------------------------
+# create_all создаёт только отсутствующие таблицы, поэтому изменения существующей схемы
+# оформляются версионными миграциями. Применённые версии хранятся в schema_migrations.
+# На PostgreSQL миграции выполняются в autocommit-режиме (индексы строятся CONCURRENTLY)
+# под advisory-lock. Применяются они отдельным шагом развёртывания (python main.py migrate),
+# а не при старте воркеров: пока один строит индексы большой таблицы, остальные ждали бы
+# advisory-lock и не обслуживали запросы. Воркер при старте только предупреждает о
+# неприменённых версиях; RUN_MIGRATIONS=1 возвращает применение при старте (разработка).
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "0") == "1"
+MIGRATIONS_LOCK_KEY = 7264001
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+MIGRATIONS = []
+
+def migration(version: int, description: str):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+@migration(1, "Полнотекстовый и триграммный поиск по задачам")
+def _migration_search_index(connection):
+    install_search_index(connection)
+
+@migration(2, "Составные индексы (owner_id, столбец сортировки, ...)")
+def _migration_owner_indexes(connection):
+    create_index(connection, "ix_tasks_owner_id_id", "tasks", "(owner_id, id)")
+    create_index(connection, "ix_tasks_owner_title", "tasks", "(owner_id, title, id)")
+    create_index(connection, "ix_tasks_owner_status", "tasks", "(owner_id, status, id)")
+    create_index(connection, "ix_tasks_owner_created", "tasks", "(owner_id, created_at, id)")
+    create_index(connection, "ix_tasks_owner_priority_created", "tasks",
+                 "(owner_id, priority DESC, created_at DESC, id DESC)")
+    create_index(connection, "ix_tasks_owner_priority_asc_created", "tasks",
+                 "(owner_id, priority, created_at DESC, id DESC)")
+
+@migration(3, "Счётчики задач по статусам и приоритетам")
+def _migration_task_counters(connection):
+    if connection.dialect.name == "postgresql":
+        # миграции идут в autocommit: таблица и триггеры — одной короткой транзакцией,
+        # затем пересчёт по диапазонам владельцев, не блокируя запись во всю таблицу надолго
+        with connection.engine.begin() as transaction:
+            install_task_counters(transaction, reconcile=False)
+        reconcile_task_counters_in_batches(connection.engine)
+    else:
+        install_task_counters(connection)
+
+@event.listens_for(Base.metadata, "after_create")
+def _mark_migrations_applied(target, connection, tables=(), **kw):
+    # новая БД сразу создана по текущей схеме — применять к ней нечего
+    if Task.__table__ in tables and SchemaMigration.__table__ in tables:
+        now = datetime.utcnow()
+        connection.execute(insert(SchemaMigration.__table__), [
+            {"version": version, "description": description, "applied_at": now}
+            for version, description, _ in MIGRATIONS
+        ])
+
+def pending_migrations(bind):
+    """Версии и описания неприменённых миграций."""
+    with bind.connect() as connection:
+        if not connection.dialect.has_table(connection, SchemaMigration.__tablename__):
+            applied = set()
+        else:
+            applied = set(connection.execute(select(SchemaMigration.version)).scalars())
+    return [(version, description) for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0])
+            if version not in applied]
+
+def run_migrations(bind):
+    """Применяет недостающие миграции по возрастанию версии."""
+    with bind.connect() as connection:
+        postgres = connection.dialect.name == "postgresql"
+        if postgres:
+            connection.execution_options(isolation_level="AUTOCOMMIT")
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        try:
+            SchemaMigration.__table__.create(connection, checkfirst=True)
+            applied = set(connection.execute(select(SchemaMigration.version)).scalars())
+            for version, description, apply in sorted(MIGRATIONS, key=lambda m: m[0]):
+                if version in applied:
+                    continue
+                apply(connection)
+                connection.execute(insert(SchemaMigration.__table__).values(
+                    version=version, description=description, applied_at=datetime.utcnow()
+                ))
+                connection.commit()
+                print(f"Миграция {version} применена: {description}")
+        finally:
+            if postgres:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+
 # -----------------------------
 # Pydantic-схемы
 # -----------------------------
@@ -67,6 +569,16 @@ class TaskUpdate(BaseModel):
     status: Optional[str]
     priority: Optional[int]
 
+class TaskPatch(BaseModel):
+    id: int
+    title: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[str] = None
+    priority: Optional[int] = None
+
+class TaskIds(BaseModel):
+    ids: List[int]
+
 class TaskOut(BaseModel):
     id: int
     title: str
@@ -78,6 +590,24 @@ class TaskOut(BaseModel):
     class Config:
         orm_mode = True
 
+class BulkError(BaseModel):
+    index: int
+    id: Optional[int] = None
+    detail: Any
+
+class BulkTasksResult(BaseModel):
+    tasks: List[TaskOut]
+    errors: List[BulkError]
+
+class BulkDeleteResult(BaseModel):
+    deleted: List[int]
+    errors: List[BulkError]
+
+class TaskStats(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[int, int]
+
 class UserCreate(BaseModel):
     username: constr(min_length=3, max_length=50)
     password: constr(min_length=6)
@@ -86,6 +616,39 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+# -----------------------------
+# Гистограммы для метрик Prometheus
+# -----------------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """Гистограмма Prometheus: число наблюдений по корзинам (le), сумма и количество."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя корзина — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str = "") -> List[str]:
+        prefix = labels + "," if labels else ""
+        lines, total = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {total}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
 # -----------------------------
 # Безопасность и JWT
 # -----------------------------
@@ -96,11 +659,123 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# -----------------------------
+# Пул процессов для bcrypt
+# -----------------------------
+# bcrypt тратит десятки-сотни миллисекунд CPU на вызов. Хеширование выполняется в отдельном
+# пуле процессов: оно масштабируется по ядрам и не занимает потоки, обслуживающие CRUD.
+# Очередь ограничена: при переполнении запрос сразу получает 503, а не ждёт.
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))  # 0 — считать в вызывающем потоке
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))  # выполняющиеся + ожидающие задачи
+
+def _timed_hash(password):
+    started = time.perf_counter()
+    return pwd_context.hash(password), time.perf_counter() - started
+
+def _timed_verify(plain_password, hashed_password):
+    started = time.perf_counter()
+    return pwd_context.verify(plain_password, hashed_password), time.perf_counter() - started
+
+class PasswordHasher:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(queue_limit)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.bcrypt_seconds = 0.0  # чистое время bcrypt в воркерах
+        self.total_seconds = 0.0   # вместе с ожиданием в очереди
+        self.bcrypt_histogram = Histogram()
+        self.total_histogram = Histogram()
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: воркеры не наследуют потоки и блокировки сервера
+                self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Сервер перегружен, повторите попытку позже")
+        started = time.perf_counter()
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+        try:
+            if self.workers > 0:
+                future = self._executor().submit(fn, *args)
+            else:
+                future = Future()
+                try:
+                    future.set_result(fn(*args))
+                except Exception as exc:
+                    future.set_exception(exc)
+        except Exception:
+            self._done(started, None)
+            raise
+        future.add_done_callback(lambda f: self._done(started, f))
+        return future
+
+    def _done(self, started: float, future: Optional[Future]):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_seconds += elapsed
+            self.total_histogram.observe(elapsed)
+            if future is not None and not future.cancelled() and future.exception() is None:
+                result = future.result()
+                if isinstance(result, tuple):
+                    self.bcrypt_seconds += result[1]
+                    self.bcrypt_histogram.observe(result[1])
+        self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self.submit(_timed_hash, password).result()[0]
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return self.submit(_timed_verify, plain_password, hashed_password).result()[0]
+
+    async def hash_async(self, password: str) -> str:
+        return (await asyncio.wrap_future(self.submit(_timed_hash, password)))[0]
+
+    async def verify_async(self, plain_password: str, hashed_password: str) -> bool:
+        return (await asyncio.wrap_future(self.submit(_timed_verify, plain_password, hashed_password)))[0]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "bcrypt_seconds": self.bcrypt_seconds,
+                "total_seconds": self.total_seconds,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+password_hasher = PasswordHasher(HASH_WORKERS, HASH_QUEUE_LIMIT)
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -128,30 +803,1144 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def token_payload(token: str) -> dict:
+    """Проверенный payload токена с обязательным sub."""
     payload = decode_token(token)
     if payload is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный токен")
     username: str = payload.get("sub")
     if username is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Неверный токен")
-    user = db.query(User).filter(User.username == username).first()
+    return payload
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    payload = token_payload(token)
+    user = db.query(User).filter(User.username == payload["sub"]).first()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Пользователь не найден")
+    return principal_cache.remember(token, user, payload.get("exp"))
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+    payload = token_payload(token)
+    user = await db.scalar(select(User).where(User.username == payload["sub"]))
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Пользователь не найден")
-    return user
+    return principal_cache.remember(token, user, payload.get("exp"))
 
 # -----------------------------
-# Кэширование (простой in-memory кэш для GET /tasks без параметров)
+# Шина инвалидации между воркерами (поколения по владельцам)
 # -----------------------------
-CACHE_TIMEOUT = 30  # секунд
-cache_data = {
-    "tasks": None,
-    "timestamp": 0
-}
+# Каждая запись задач увеличивает «поколение» владельца. Кэш запоминает поколение,
+# при котором была сделана выборка, и не отдаёт запись, если поколение с тех пор изменилось.
+# local    — счётчики в памяти процесса (один воркер);
+# file     — счётчики в общем файле через mmap (несколько воркеров на одном хосте);
+# postgres — локальные счётчики + LISTEN/NOTIFY (воркеры на разных хостах).
+CACHE_BUS = os.getenv("CACHE_BUS", "local")
+CACHE_BUS_PATH = os.getenv("CACHE_BUS_PATH", "/tmp/benetasks-generations.bin")
+CACHE_BUS_SLOTS = int(os.getenv("CACHE_BUS_SLOTS", "65536"))
+CACHE_BUS_CHANNEL = "benetasks_cache"
+
+class LocalGenerations:
+    """Счётчики поколений внутри одного процесса."""
+
+    def __init__(self):
+        self._generations = {}
+        self._lock = threading.Lock()
+        # счётчики начинаются с нуля при каждом запуске — эпоха отличает их от прошлых
+        self.epoch = format(time.time_ns(), "x")
+
+    def get(self, key) -> int:
+        return self._generations.get(key, 0)
+
+    def bump(self, key) -> int:
+        with self._lock:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            return generation
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+class FileGenerations:
+    """
+    Счётчики поколений в файле, отображённом в память: все воркеры на хосте
+    читают одни и те же значения без обращения к БД. Ключи хэшируются в
+    фиксированное число слотов — коллизия даёт лишь лишний промах кэша.
+    """
+
+    def __init__(self, path: str, slots: int):
+        import fcntl
+        import mmap
+
+        self._fcntl = fcntl
+        self._slots = slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * 8
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._mm = mmap.mmap(self._fd, size)
+        # счётчики живут, пока жив файл: пересозданный файл получает новую эпоху
+        self.epoch = format(os.fstat(self._fd).st_ino, "x")
+
+    def _offset(self, key) -> int:
+        return (zlib.crc32(str(key).encode()) % self._slots) * 8
+
+    def get(self, key) -> int:
+        return struct.unpack_from("<Q", self._mm, self._offset(key))[0]
+
+    def bump(self, key) -> int:
+        offset = self._offset(key)
+        self._fcntl.flock(self._fd, self._fcntl.LOCK_EX)
+        try:
+            generation = struct.unpack_from("<Q", self._mm, offset)[0] + 1
+            struct.pack_into("<Q", self._mm, offset, generation)
+            return generation
+        finally:
+            self._fcntl.flock(self._fd, self._fcntl.LOCK_UN)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+class PostgresGenerations(LocalGenerations):
+    """
+    Локальные счётчики, синхронизируемые через LISTEN/NOTIFY: bump() публикует
+    уведомление, а фоновый поток каждого воркера увеличивает своё поколение.
+    Уведомления, отправленные, пока LISTEN-соединение было разорвано, теряются, поэтому
+    после каждого подключения все поколения сдвигаются (_resyncs) и меняется эпоха ETag.
+    """
+
+    def __init__(self, bind):
+        super().__init__()
+        self._bind = bind
+        self._stopped = threading.Event()
+        self._thread = None
+        self._origin = f"{os.getpid()}-{id(self)}"
+        self._resyncs = 0
+
+    def get(self, key) -> int:
+        return super().get(key) + self._resyncs
+
+    def resync(self):
+        """Считает устаревшим всё, что закэшировано до (пере)подключения к шине."""
+        with self._lock:
+            self._resyncs += 1
+            self.epoch = format(time.time_ns(), "x")
+
+    def bump(self, key) -> int:
+        generation = super().bump(key) + self._resyncs
+        with self._bind.connect() as conn:
+            conn.execute(text("SELECT pg_notify(:channel, :payload)"),
+                         {"channel": CACHE_BUS_CHANNEL, "payload": f"{self._origin}:{key}"})
+            conn.commit()
+        return generation
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._listen, name="cache-bus", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _listen(self):
+        import select
+
+        while not self._stopped.is_set():
+            try:
+                raw = self._bind.raw_connection()
+                try:
+                    conn = raw.driver_connection
+                    conn.autocommit = True
+                    conn.cursor().execute(f"LISTEN {CACHE_BUS_CHANNEL}")
+                    self.resync()  # уведомления до LISTEN не дошли
+                    while not self._stopped.is_set():
+                        if select.select([conn], [], [], 5) == ([], [], []):
+                            continue
+                        conn.poll()
+                        while conn.notifies:
+                            origin, _, key = conn.notifies.pop(0).payload.partition(":")
+                            if origin != self._origin:
+                                super().bump(int(key) if key.isdigit() else key)
+                finally:
+                    raw.close()
+            except Exception:  # соединение оборвалось — переподключаемся
+                logger.exception("Шина инвалидации кэша: LISTEN-соединение потеряно, переподключение")
+                self._stopped.wait(1)
+
+def make_generation_store(kind: str):
+    if kind == "file":
+        return FileGenerations(CACHE_BUS_PATH, CACHE_BUS_SLOTS)
+    if kind == "postgres":
+        return PostgresGenerations(engine)
+    return LocalGenerations()
+
+generations = make_generation_store(CACHE_BUS)
+
+# -----------------------------
+# Кэширование списков задач (per-user LRU + TTL для GET /tasks)
+# -----------------------------
+CACHE_TIMEOUT = int(os.getenv("CACHE_TIMEOUT", "30"))  # секунд
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+# Число записей не ограничивает память: страница без limit у пользователя с сотнями тысяч
+# задач весит десятки мегабайт. Поэтому сумма размеров тел ограничена отдельно, а слишком
+# большие тела не кэшируются вовсе (0 — без ограничения).
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+
+class TaskListCache:
+    """
+    Ограниченный по числу записей и по суммарному размеру LRU-кэш с TTL.
+    Ключ начинается с owner_id, поэтому пользователи не видят чужие списки,
+    а запись одного пользователя сбрасывает только его записи.
+    sizeof — размер значения в байтах.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, generations=None,
+                 max_bytes: int = 0, max_entry_bytes: int = 0, sizeof=len):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generations = generations if generations is not None else LocalGenerations()
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()  # key -> (expires_at, generation, value, size)
+        self._by_owner = {}         # owner_id -> set(key)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale = 0
+        self.oversized = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def generation(self, owner_id) -> int:
+        """Текущее поколение владельца; читать до выборки и передавать в set()."""
+        return self.generations.get(owner_id)
+
+    def get(self, key):
+        now = time.monotonic()
+        generation = self.generations.get(key[0])
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, entry_generation, value, _ = entry
+            if now >= expires_at or entry_generation != generation:
+                if entry_generation != generation:
+                    self.stale += 1
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, generation: int):
+        size = self.sizeof(value)
+        with self._lock:
+            self._remove(key)
+            if self.max_entry_bytes and size > self.max_entry_bytes:
+                self.oversized += 1  # одно такое тело вытеснило бы много обычных
+                return
+            self._data[key] = (time.monotonic() + self.ttl, generation, value, size)
+            self._by_owner.setdefault(key[0], set()).add(key)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_entries
+                                  or (self.max_bytes and self._bytes > self.max_bytes)):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_owner(self, owner_id):
+        # сначала поколение: остальные воркеры перестают отдавать свои копии
+        generation = self.generations.bump(owner_id)
+        with self._lock:
+            for key in self._by_owner.pop(owner_id, ()):
+                self._bytes -= self._data.pop(key)[3]
+            self.invalidations += 1
+        return generation
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_owner.clear()
+            self._bytes = 0
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "oversized": self.oversized,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stale": self.stale,
+                "bus": type(self.generations).__name__,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[3]
+        keys = self._by_owner.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_owner[key[0]]
+
+task_cache = TaskListCache(CACHE_MAX_ENTRIES, CACHE_TIMEOUT, generations,
+                           max_bytes=CACHE_MAX_BYTES, max_entry_bytes=CACHE_MAX_ENTRY_BYTES,
+                           sizeof=lambda cached: len(cached[0]))  # (body, next_cursor)
+
+def tasks_cache_key(owner_id: int, sort_by: Optional[str], order: Optional[str], search: Optional[str],
+                    limit: Optional[int] = None, cursor: Optional[str] = None, fields=None):
+    # order без sort_by ни на что не влияет, пустой search — то же, что его отсутствие
+    return (owner_id, sort_by, order if sort_by else None, search or None, limit, cursor,
+            tuple(fields) if fields else None)
+
+def clear_cache(owner_id: Optional[int] = None) -> Optional[int]:
+    """
+    Сбрасывает кэш пользователя owner_id (или весь кэш, если owner_id не указан).
+    Возвращает новое поколение владельца — по нему top_index принимает созданную задачу.
+    """
+    if owner_id is None:
+        task_cache.clear()
+        top_index.clear()
+        return None
+    return task_cache.invalidate_owner(owner_id)
+
+# -----------------------------
+# Кэш аутентифицированных пользователей (токен -> пользователь)
+# -----------------------------
+# Повторные запросы с уже проверенным токеном не декодируют JWT и не обращаются к users.
+# Запись живёт не дольше PRINCIPAL_CACHE_TTL и не дольше exp самого токена. Изменение или
+# удаление пользователя через ORM сбрасывает его записи после commit (во всех воркерах —
+# через ту же шину поколений, что и кэш задач).
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "300"))  # секунд
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+
+class PrincipalCache:
+    def __init__(self, max_entries: int, ttl: float, generations):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generations = generations
+        self._data = OrderedDict()  # token -> (expires_at, generation, user)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _generation_key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    def get(self, token: str) -> Optional[User]:
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(token)
+            if entry is not None:
+                expires_at, generation, user = entry
+                if now < expires_at and generation == self.generations.get(self._generation_key(user.id)):
+                    self._data.move_to_end(token)
+                    self.hits += 1
+                    return user
+                del self._data[token]
+            self.misses += 1
+            return None
+
+    def remember(self, token: str, user: User, exp: Optional[float]) -> User:
+        """Кэширует отвязанную от сессии копию пользователя и возвращает её."""
+        generation = self.generations.get(self._generation_key(user.id))
+        principal = User(id=user.id, username=user.username, hashed_password=user.hashed_password)
+        make_transient_to_detached(principal)
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        with self._lock:
+            self._data[token] = (expires_at, generation, principal)
+            self._data.move_to_end(token)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return principal
+
+    def invalidate_user(self, user_id: int):
+        self.generations.bump(self._generation_key(user_id))
+        with self._lock:
+            for token in [t for t, (_, _, user) in self._data.items() if user.id == user_id]:
+                del self._data[token]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_MAX_ENTRIES, PRINCIPAL_CACHE_TTL, generations)
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = {obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)}
+    if changed:
+        session.info.setdefault("changed_users", set()).update(changed)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    # сбрасываем после commit, иначе параллельный запрос успел бы закэшировать старую строку
+    for user_id in session.info.pop("changed_users", ()):
+        principal_cache.invalidate_user(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed_users(session):
+    session.info.pop("changed_users", None)
+
+# -----------------------------
+# Keyset-пагинация (limit + cursor)
+# -----------------------------
+# Вместо OFFSET следующая страница выбирается условием «строго после последней
+# строки предыдущей» по (столбец сортировки, ..., id), поэтому страница N стоит
+# столько же, сколько первая. Курсор непрозрачен для клиента и привязан к порядку
+# сортировки, с которым был выдан. NULL (title, status, priority после PUT/PATCH) считается
+# больше любого значения — так строки лежат в btree-индексах Postgres, и индексы годятся
+# для выдачи в обоих направлениях; порядок NULL задан явно и учтён в keyset-условии.
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def tasks_ordering(sort_by: Optional[str], order: Optional[str]):
+    """Порядок GET /tasks со стабильным добором по id (order учитывается только вместе с sort_by)."""
+    if sort_by is None:
+        return [(Task.id, "asc")]
+    direction = "desc" if order == "desc" else "asc"
+    return [(getattr(Task, sort_by), direction), (Task.id, direction)]
+
+def order_clauses(ordering):
+    clauses = []
+    for column, direction in ordering:
+        if direction == "desc":
+            clauses.append(desc(column).nulls_first() if column.nullable else desc(column))
+        else:
+            clauses.append(asc(column).nulls_last() if column.nullable else asc(column))
+    return clauses
+
+def encode_cursor(scope: str, ordering, item) -> str:
+    values = []
+    for column, _ in ordering:
+        value = getattr(item, column.key)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    payload = json.dumps({"s": scope, "v": values}, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def cursor_value(column, value):
+    """Значение столбца из курсора; подделанный курсор с чужим типом — ValueError."""
+    if value is None:
+        if not column.nullable:
+            raise ValueError(column.key)
+        return None
+    if isinstance(column.type, DateTime):
+        if not isinstance(value, str):
+            raise ValueError(column.key)
+        return datetime.fromisoformat(value)
+    expected = int if isinstance(column.type, Integer) else str
+    if type(value) is not expected:  # bool — подкласс int, но не номер
+        raise ValueError(column.key)
+    return value
+
+def decode_cursor(scope: str, ordering, cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        values = payload["v"]
+        if payload["s"] != scope or not isinstance(values, list) or len(values) != len(ordering):
+            raise ValueError(cursor)
+        return [cursor_value(column, value) for (column, _), value in zip(ordering, values)]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Неверный курсор")
+
+def _after(column, direction: str, value):
+    """Условие «столбец строго дальше value» при NULL, большем любого значения."""
+    if direction == "desc":
+        # NULL идут первыми: после NULL — все значения, после значения — только меньшие
+        return column.isnot(None) if value is None else column < value
+    if value is None:
+        return false()
+    return or_(column > value, column.is_(None)) if column.nullable else column > value
+
+def _equal(column, value):
+    return column.is_(None) if value is None else column == value
+
+def keyset_filter(ordering, values):
+    """(c1 > v1) OR (c1 = v1 AND c2 > v2) OR ... с учётом направления каждого столбца и NULL."""
+    clauses = []
+    for i, (column, direction) in enumerate(ordering):
+        equal_prefix = [_equal(c, v) for (c, _), v in zip(ordering[:i], values[:i])]
+        clauses.append(and_(*equal_prefix, _after(column, direction, values[i])))
+    return or_(*clauses)
+
+def paginate(stmt, ordering, scope: str, limit: int, cursor: Optional[str]):
+    """Добавляет keyset-условие, порядок и limit + 1 (лишняя строка — признак следующей страницы)."""
+    if cursor:
+        stmt = stmt.where(keyset_filter(ordering, decode_cursor(scope, ordering, cursor)))
+    return stmt.order_by(*order_clauses(ordering)).limit(max(limit, 0) + 1)
+
+def split_page(rows, ordering, scope: str, limit: int):
+    """Возвращает (страница, курсор следующей страницы или None)."""
+    if limit <= 0:
+        return [], None
+    if len(rows) > limit:
+        return rows[:limit], encode_cursor(scope, ordering, rows[limit - 1])
+    return rows, None
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+# -----------------------------
+# Запросы к задачам (общие для sync- и async-эндпоинтов)
+# -----------------------------
+# Каждый построитель возвращает select() и функцию, превращающую полученные строки
+# в (задачи, курсор следующей страницы). Выполнение запроса остаётся за эндпоинтом.
+#
+# Чтение задач не создаёт ORM-объекты и не прогоняет их через TaskOut: выбираются
+# только столбцы TaskOut, а строки сразу кодируются в JSON (orjson, если установлен).
+# Байты ответа совпадают с тем, что FastAPI выдал бы по response_model.
+#
+# Параметр fields=id,title,priority сужает ответ: невыбранные столбцы не читаются из БД
+# и не кодируются. Столбцы сортировки для курсора выбираются всегда, но в ответ не попадают.
+TASK_OUT_FIELDS = list(TaskOut.__fields__)
+TASK_OUT_COLUMNS = [getattr(Task, name) for name in TASK_OUT_FIELDS]
+FIELDS_QUERY = Query(None, description="Поля ответа через запятую, например id,title,priority")
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Список полей в порядке TaskOut или None (все поля)."""
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    if not requested or not requested <= set(TASK_OUT_FIELDS):
+        raise HTTPException(status_code=400, detail="Неверный список полей")
+    if len(requested) == len(TASK_OUT_FIELDS):
+        return None
+    return [name for name in TASK_OUT_FIELDS if name in requested]
+
+def task_columns(fields: Optional[List[str]], ordering=()):
+    if fields is None:
+        return TASK_OUT_COLUMNS
+    columns = [getattr(Task, name) for name in fields]
+    return columns + [column for column, _ in ordering if column.key not in fields]
+
+SORT_FIELDS = {"title", "status", "created_at", "priority"}
+
+def check_sort_by(sort_by: Optional[str]):
+    if sort_by and sort_by not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail="Неверный параметр сортировки")
+
+def whole_list(rows):
+    return rows, None
+
+def tasks_statement(owner_id: int, sort_by: Optional[str], order: Optional[str], search: Optional[str],
+                    dialect: str, limit: Optional[int], cursor: Optional[str], fields: Optional[List[str]] = None):
+    ordering = tasks_ordering(sort_by, order) if limit is not None else ()
+    stmt = select(*task_columns(fields, ordering)).where(Task.owner_id == owner_id)
+    relevance = None
+    if search:
+        stmt, relevance = apply_search(stmt, dialect, search)
+    if limit is not None:
+        scope = f"tasks:{sort_by}:{order}" if sort_by else "tasks"
+        return (paginate(stmt, ordering, scope, limit, cursor),
+                lambda rows: split_page(rows, ordering, scope, limit))
+    if sort_by:
+        sort_column = getattr(Task, sort_by)
+        if order == "desc":
+            stmt = stmt.order_by(desc(sort_column))
+        else:
+            stmt = stmt.order_by(asc(sort_column))
+    elif relevance is not None:
+        # без явной сортировки результаты поиска упорядочены по релевантности
+        stmt = stmt.order_by(relevance)
+    return stmt, whole_list
+
+def top_ordering(priority: Optional[int], all_priorities: bool):
+    """(дополнительные условия, порядок, область курсора) для ветки top_tasks."""
+    if priority is not None and not all_priorities:
+        # Если указан конкретный приоритет, фильтруем по нему
+        # Логично отсортировать по дате создания (самые новые первыми) или как вам удобно
+        return ([Task.priority == priority], [(Task.created_at, "desc"), (Task.id, "desc")],
+                f"top:{priority}")
+
+    elif all_priorities:
+        # Если галочка "Все приоритеты", выводим n задач,
+        # начиная с наименьшего приоритета и далее
+        return [], [(Task.priority, "asc"), (Task.created_at, "desc"), (Task.id, "desc")], "top:all"
+
+    else:
+        # По умолчанию – "топ" в смысле самых высоких приоритетов
+        return [], [(Task.priority, "desc"), (Task.created_at, "desc"), (Task.id, "desc")], "top"
+
+def top_statement(owner_id: int, n: int, priority: Optional[int], all_priorities: bool, cursor: Optional[str],
+                  fields: Optional[List[str]] = None):
+    conditions, ordering, scope = top_ordering(priority, all_priorities)
+    stmt = select(*task_columns(fields, ordering)).where(Task.owner_id == owner_id, *conditions)
+    return paginate(stmt, ordering, scope, n, cursor), lambda rows: split_page(rows, ordering, scope, n)
+
+def task_statement(owner_id: int, task_id: int):
+    return select(Task).where(Task.id == task_id, Task.owner_id == owner_id)
+
+def task_row_statement(owner_id: int, task_id: int, fields: Optional[List[str]] = None):
+    return select(*task_columns(fields)).where(Task.id == task_id, Task.owner_id == owner_id)
+
+def task_exists_statement(owner_id: int, task_id: int):
+    return select(literal_column("1")).where(Task.id == task_id, Task.owner_id == owner_id)
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat().replace("+00:00", "Z")
+    raise TypeError(f"{type(value).__name__} не сериализуется в JSON")
+
+def dump_json(content) -> bytes:
+    """JSON в том же виде, что у pydantic: без пробелов, UTF-8, даты ISO 8601 (UTC как Z)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                      default=_json_default).encode("utf-8")
+
+def rows_json(rows, fields: Optional[List[str]] = None) -> bytes:
+    if fields is None:
+        return dump_json([row._asdict() for row in rows])
+    return dump_json([{name: getattr(row, name) for name in fields} for row in rows])
+
+def row_json(row, fields: Optional[List[str]] = None) -> bytes:
+    if fields is None:
+        return dump_json(row._asdict())
+    return dump_json({name: getattr(row, name) for name in fields})
+
+def json_response(response: Response, body: bytes) -> Response:
+    """Готовое тело JSON вместе с заголовками, выставленными эндпоинтом (ETag, курсор)."""
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(body, media_type="application/json", headers=headers)
+
+def cached_tasks(response: Response, cache_key):
+    """Тело ответа GET /tasks из кэша (и заголовок курсора) или None."""
+    cached = task_cache.get(cache_key)
+    if cached is None:
+        return None
+    body, next_cursor = cached
+    set_next_cursor(response, next_cursor)
+    return json_response(response, body)
+
+# -----------------------------
+# Условные запросы (ETag / If-None-Match)
+# -----------------------------
+# Версия задач владельца — его поколение в шине инвалидации: его увеличивает любая
+# запись задач (clear_cache). ETag строится из версии до выборки, поэтому при
+# совпадении с If-None-Match ответ 304 отдаётся без запроса к БД и сериализации.
+# Для одной задачи перед 304 проверяется только её существование (SELECT 1 по ключу):
+# If-None-Match не превращает 404 в 304 (RFC 9110, 13.1.2 — «*» не совпадает с
+# отсутствующим ресурсом).
+def tasks_etag(owner_id: int, generation: int) -> str:
+    return f'W/"{generations.epoch}-{owner_id}-{generation}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    weak = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == weak
+        for candidate in (item.strip() for item in if_none_match.split(","))
+    )
+
+def tasks_version(request: Request, response: Response, owner_id: int):
+    """Поколение владельца (читается до выборки) и ответ 304, если валидатор клиента актуален."""
+    generation = task_cache.generation(owner_id)
+    etag = tasks_etag(owner_id, generation)
+    response.headers["ETag"] = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return generation, Response(status_code=304, headers={"ETag": etag})
+    return generation, None
+
+# -----------------------------
+# Топ-N задач в памяти (GET /tasks/top/)
+# -----------------------------
+# Для каждого владельца и ветки top_tasks (по умолчанию, priority=p, all_priorities) хранится
+# отсортированный префикс выдачи длиной до TOP_INDEX_DEPTH. Он загружается одним запросом
+# при первом обращении к ветке, и созданные задачи добавляются в него без запросов к БД.
+# Изменение и удаление префикс владельца сбрасывают: две правки одной задачи могут закоммититься
+# в одном порядке, а дойти до индекса в другом, и префикс (с его ETag) разошёлся бы с БД.
+# У новой задачи такой гонки нет — её id до ответа никому не известен.
+# complete — в префиксе все задачи ветки; иначе известны только первые len(items) и запрос
+# глубже префикса уходит в SQL. Префикс действителен, пока поколение владельца в шине
+# инвалидации совпадает с запомненным: запись в другом воркере или пакетная операция
+# увеличивают поколение без обновления префикса, и он выбрасывается.
+TOP_INDEX_DEPTH = int(os.getenv("TOP_INDEX_DEPTH", "50"))            # 0 — отключить
+TOP_INDEX_MAX_OWNERS = int(os.getenv("TOP_INDEX_MAX_OWNERS", "1000"))
 
-def clear_cache():
-    cache_data["tasks"] = None
-    cache_data["timestamp"] = 0
+TopItem = namedtuple("TopItem", TASK_OUT_FIELDS)
+MICROSECOND = timedelta(microseconds=1)
+
+def task_item(task) -> TopItem:
+    return TopItem(*(getattr(task, name) for name in TASK_OUT_FIELDS))
+
+def _sort_value(value, direction: str):
+    # NULL больше любого значения, как в order_clauses: последним при asc, первым при desc
+    if value is None:
+        return (1, 0) if direction == "asc" else (0, 0)
+    if isinstance(value, datetime):
+        value = (value - datetime.min.replace(tzinfo=value.tzinfo)) // MICROSECOND
+    return (1, -value) if direction == "desc" else (0, value)
+
+def sort_key(ordering, values):
+    return tuple(_sort_value(value, direction) for (_, direction), value in zip(ordering, values))
+
+class TopList:
+    """Префикс одной ветки: задачи и их ключи в порядке выдачи."""
+
+    def __init__(self, ordering, priority: Optional[int], items, complete: bool):
+        self.ordering = ordering
+        self.priority = priority  # ветка priority=p принимает только задачи с этим приоритетом
+        self.items = list(items)
+        self.keys = [self.key(item) for item in self.items]
+        self.complete = complete
+
+    def key(self, item):
+        return sort_key(self.ordering, [getattr(item, column.key) for column, _ in self.ordering])
+
+    def discard(self, task_id: int):
+        for index, item in enumerate(self.items):
+            if item.id == task_id:
+                del self.items[index], self.keys[index]
+                return
+
+    def add(self, item: TopItem, depth: int):
+        if self.priority is not None and item.priority != self.priority:
+            return
+        key = self.key(item)
+        # за неполным префиксом могут быть неизвестные задачи — позиция новой там не определена
+        if not self.complete and (not self.keys or key > self.keys[-1]):
+            return
+        index = bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.items.insert(index, item)
+        if len(self.items) > depth:
+            self.items.pop()
+            self.keys.pop()
+            self.complete = False
+
+    def page(self, need: int, after=None):
+        """need задач после ключа after или None, если префикса не хватает."""
+        start = 0 if after is None else bisect_right(self.keys, after)
+        if start + need > len(self.items) and not self.complete:
+            return None
+        return self.items[start:start + need]
+
+class TopIndex:
+    def __init__(self, depth: int, max_owners: int, generations):
+        self.depth = depth
+        self.max_owners = max_owners
+        self.generations = generations
+        self._owners = OrderedDict()  # owner_id -> (generation, {scope: TopList})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.evictions = 0
+        self.stale = 0
+
+    def page(self, owner_id: int, generation: int, n: int, priority: Optional[int], all_priorities: bool,
+             cursor: Optional[str]):
+        """Строки для split_page (до n + 1) из памяти или None — тогда выдачу строит SQL."""
+        if self.depth <= 0:
+            return None
+        _, ordering, scope = top_ordering(priority, all_priorities)
+        after = sort_key(ordering, decode_cursor(scope, ordering, cursor)) if cursor else None
+        with self._lock:
+            lists = self._lists(owner_id, generation)
+            top_list = lists.get(scope) if lists is not None else None
+            rows = top_list.page(max(n, 0) + 1, after) if top_list is not None else None
+            if rows is None:
+                self.misses += 1
+                return None
+            self._owners.move_to_end(owner_id)
+            self.hits += 1
+            return rows
+
+    def needs_load(self, owner_id: int, generation: int, priority: Optional[int], all_priorities: bool) -> bool:
+        """Ветка ещё не загружена или её префикс сократился удалениями."""
+        if self.depth <= 0:
+            return False
+        _, _, scope = top_ordering(priority, all_priorities)
+        with self._lock:
+            lists = self._lists(owner_id, generation)
+            top_list = lists.get(scope) if lists is not None else None
+            return top_list is None or (not top_list.complete and len(top_list.items) < self.depth)
+
+    def load(self, owner_id: int, generation: int, priority: Optional[int], all_priorities: bool, rows):
+        """
+        Сохраняет префикс ветки из rows — результата top_statement(owner_id, depth, ...).
+        Поколение читается до выборки: если с тех пор была запись, префикс не сохраняется.
+        """
+        _, ordering, scope = top_ordering(priority, all_priorities)
+        top_list = TopList(ordering, None if all_priorities else priority,
+                           [TopItem(*row) for row in rows[:self.depth]], complete=len(rows) <= self.depth)
+        with self._lock:
+            if self.generations.get(owner_id) != generation:
+                return
+            entry = self._owners.get(owner_id)
+            if entry is None or entry[0] != generation:
+                entry = (generation, {})
+                self._owners[owner_id] = entry
+            entry[1][scope] = top_list
+            self._owners.move_to_end(owner_id)
+            self.loads += 1
+            while len(self._owners) > self.max_owners:
+                self._owners.popitem(last=False)
+                self.evictions += 1
+
+    def upsert(self, owner_id: int, generation: int, item: TopItem):
+        """Созданная задача; generation — поколение, выданное clear_cache."""
+        with self._lock:
+            entry = self._owners.get(owner_id)
+            if entry is None:
+                return
+            # префикс знает все записи до generation - 1 только если между ними не было чужих
+            if entry[0] != generation - 1:
+                del self._owners[owner_id]
+                self.stale += 1
+                return
+            for top_list in entry[1].values():
+                top_list.discard(item.id)
+                top_list.add(item, self.depth)
+            self._owners[owner_id] = (generation, entry[1])
+
+    def forget(self, owner_id: int):
+        """Изменение или удаление задачи: префикс владельца перечитается при следующем запросе."""
+        with self._lock:
+            self._owners.pop(owner_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._owners.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "owners": len(self._owners),
+                "max_owners": self.max_owners,
+                "depth": self.depth,
+                "hits": self.hits,
+                "misses": self.misses,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "stale": self.stale,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _lists(self, owner_id: int, generation: int):
+        entry = self._owners.get(owner_id)
+        if entry is None:
+            return None
+        if entry[0] != generation:
+            del self._owners[owner_id]
+            self.stale += 1
+            return None
+        return entry[1]
+
+top_index = TopIndex(TOP_INDEX_DEPTH, TOP_INDEX_MAX_OWNERS, generations)
+
+# -----------------------------
+# Групповая запись новых задач (GROUP_COMMIT=1)
+# -----------------------------
+# Без группировки каждый POST /tasks — отдельная транзакция, и под потоком вставок БД упирается
+# в fsync на COMMIT. С GROUP_COMMIT=1 вставки, пришедшие в течение GROUP_COMMIT_WINDOW_MS после
+# первой (не больше GROUP_COMMIT_MAX_ROWS), пишутся одной транзакцией: один многострочный
+# INSERT ... RETURNING и один COMMIT на пачку. Каждый запрос получает свою строку.
+# Долговечность прежняя: ответ уходит только после COMMIT транзакции, в которую попала задача.
+# Если транзакция пачки не прошла, её задачи пишутся по одной — ошибку получает только свой запрос.
+# Исключение — разорванное соединение: исход COMMIT неизвестен, и повтор мог бы записать задачу дважды.
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "0") == "1"
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_ROWS = int(os.getenv("GROUP_COMMIT_MAX_ROWS", "256"))
+
+def task_insert_statement():
+    # sort_by_parameter_order: строки RETURNING идут в порядке переданных параметров
+    return insert(Task).returning(*Task.__table__.columns, sort_by_parameter_order=True)
+
+def can_split_batch(batch, exc: Exception) -> bool:
+    return len(batch) > 1 and not getattr(exc, "connection_invalidated", False)
+
+def settle(future, result=None, error: Optional[BaseException] = None):
+    """Отдаёт результат ждущему запросу; уже завершённый (отменённый) Future пропускается."""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+class GroupCommitWriter:
+    """Общее для потокового и asyncio-писателя: параметры пачки и счётчики."""
+
+    def __init__(self, bind, window: float, max_rows: int):
+        self.bind = bind
+        self.window = window  # секунд
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.largest_batch = 0
+        self.split_batches = 0  # пачки, записанные по одной строке после ошибки
+
+    def _record(self, size: int, split: bool):
+        with self._lock:
+            self.batches += 1
+            self.rows += size
+            self.largest_batch = max(self.largest_batch, size)
+            self.split_batches += split
+
+    def stats(self):
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "rows": self.rows,
+                "largest_batch": self.largest_batch,
+                "split_batches": self.split_batches,
+            }
+
+class TaskWriter(GroupCommitWriter):
+    """Пачки собирает и пишет один поток; запросы ждут свой Future."""
+
+    def __init__(self, bind, window: float, max_rows: int):
+        super().__init__(bind, window, max_rows)
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def submit(self, values: dict) -> Future:
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="task-writer", daemon=True)
+                self._thread.start()
+        self._queue.put((values, future))
+        return future
+
+    def insert(self, values: dict):
+        return self.submit(values).result()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_rows:
+                try:
+                    # после окончания окна забираем только уже ждущие вставки
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._write_safely(batch)
+                    return
+                batch.append(item)
+            self._write_safely(batch)
+
+    def _write_safely(self, batch):
+        # ошибка одной пачки не должна останавливать поток: иначе все следующие вставки ждали бы вечно
+        try:
+            self._write(batch)
+        except Exception as exc:
+            for _, future in batch:
+                settle(future, error=exc)
+
+    def _execute(self, rows):
+        with self.bind.begin() as connection:
+            return connection.execute(task_insert_statement(), rows).all()
+
+    def _write(self, batch):
+        try:
+            rows = self._execute([values for values, _ in batch])
+        except Exception as exc:
+            split = can_split_batch(batch, exc)
+            self._record(len(batch), split)
+            for values, future in batch:
+                if not split:
+                    settle(future, error=exc)
+                    continue
+                try:
+                    settle(future, self._execute([values])[0])
+                except Exception as row_exc:
+                    settle(future, error=row_exc)
+            return
+        self._record(len(batch), False)
+        for (_, future), row in zip(batch, rows):
+            settle(future, row)
+
+class AsyncTaskWriter(GroupCommitWriter):
+    """То же для DB_ASYNC=1: пачки собирает задача asyncio своего event loop, запись через AsyncEngine."""
+
+    def __init__(self, bind, window: float, max_rows: int):
+        super().__init__(bind, window, max_rows)
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    async def insert(self, values: dict):
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.put_nowait((values, future))
+        return await future
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_rows:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write(batch)
+            except Exception as exc:  # см. TaskWriter._write_safely
+                for _, future in batch:
+                    settle(future, error=exc)
+
+    async def _execute(self, rows):
+        async with self.bind.begin() as connection:
+            return (await connection.execute(task_insert_statement(), rows)).all()
+
+    async def _write(self, batch):
+        try:
+            rows = await self._execute([values for values, _ in batch])
+        except Exception as exc:
+            split = can_split_batch(batch, exc)
+            self._record(len(batch), split)
+            for values, future in batch:
+                if future.done():  # запрос отменён (клиент ушёл) — строку не пишем
+                    continue
+                if not split:
+                    settle(future, error=exc)
+                    continue
+                try:
+                    # запрос может быть отменён, пока идёт запись его строки: settle это учитывает
+                    settle(future, (await self._execute([values]))[0])
+                except Exception as row_exc:
+                    settle(future, error=row_exc)
+            return
+        self._record(len(batch), False)
+        for (_, future), row in zip(batch, rows):
+            settle(future, row)
+
+class GroupCommit:
+    """Писатели по движкам БД (для asyncio — ещё и по event loop)."""
+
+    def __init__(self, window_ms: float, max_rows: int):
+        self.window = window_ms / 1000
+        self.max_rows = max_rows
+        self._writers = {}
+        self._retired = {"batches": 0, "rows": 0, "largest_batch": 0, "split_batches": 0}  # остановленные писатели
+        self._lock = threading.Lock()
+
+    def writer(self, bind) -> TaskWriter:
+        with self._lock:
+            if bind not in self._writers:
+                self._writers[bind] = TaskWriter(bind, self.window, self.max_rows)
+            return self._writers[bind]
+
+    def async_writer(self, bind) -> AsyncTaskWriter:
+        key = (bind, asyncio.get_running_loop())
+        with self._lock:
+            if key not in self._writers:
+                self._writers[key] = AsyncTaskWriter(bind, self.window, self.max_rows)
+            return self._writers[key]
+
+    @staticmethod
+    def _add(totals: dict, stats: dict):
+        for name in ("batches", "rows", "split_batches"):
+            totals[name] += stats[name]
+        totals["largest_batch"] = max(totals["largest_batch"], stats["largest_batch"])
+
+    def stats(self):
+        with self._lock:
+            totals = dict(self._retired)
+            writers = list(self._writers.values())
+        for writer in writers:
+            self._add(totals, writer.stats())
+        totals["avg_batch"] = totals["rows"] / totals["batches"] if totals["batches"] else 0.0
+        return {"enabled": GROUP_COMMIT, "window_ms": self.window * 1000, "max_rows": self.max_rows, **totals}
+
+    def stop(self):
+        with self._lock:
+            writers, self._writers = list(self._writers.values()), {}
+        for writer in writers:
+            writer.stop()
+            with self._lock:
+                self._add(self._retired, writer.stats())
+
+group_commit = GroupCommit(GROUP_COMMIT_WINDOW_MS, GROUP_COMMIT_MAX_ROWS)
 
 # -----------------------------
 # Инициализация приложения
@@ -160,9 +1949,19 @@ app = FastAPI()
 
 @app.on_event("startup")
 def startup():
+    generations.start()
     # Автоматическая инициализация таблиц
     Base.metadata.create_all(bind=engine)
+    # Изменения схемы для уже существующих таблиц — отдельным шагом: python main.py migrate
+    if RUN_MIGRATIONS:
+        run_migrations(engine)
+    else:
+        pending = pending_migrations(engine)
+        if pending:
+            logger.warning("Не применены миграции схемы %s: выполните python main.py migrate",
+                           ", ".join(f"{version} ({description})" for version, description in pending))
     # Автоматическое создание пользователя admin/admin, если не существует
+    # (хеш считается тем же пулом password_hasher, что и в /register)
     db = SessionLocal()
     try:
         admin = db.query(User).filter(User.username == "admin").first()
@@ -172,20 +1971,150 @@ def startup():
                 hashed_password=get_password_hash("admin")
             )
             db.add(admin_user)
-            db.commit()
-            print("Пользователь admin создан!")
+            try:
+                db.commit()
+            except sa_exc.IntegrityError:
+                # воркеры стартуют одновременно: admin уже создал соседний процесс
+                db.rollback()
+            else:
+                print("Пользователь admin создан!")
     finally:
         db.close()
 
+@app.on_event("shutdown")
+def shutdown():
+    generations.stop()
+    password_hasher.shutdown()
+    group_commit.stop()
+
 @event.listens_for(Task, "init", propagate=True)
 def _task_init(target, args, kwargs):
     if "priority" not in kwargs:
         target.priority = 0
 
+# -----------------------------
+# Общая логика эндпоинтов задач
+# -----------------------------
+# Обработчики чтения — генераторы: они отдают через yield запрос к БД, получают обратно
+# его Result и возвращают ответ. run_query_flow (Session) и run_query_flow_async (AsyncSession)
+# только выполняют эти запросы, поэтому у sync- и async-версий эндпоинта одна логика.
+def run_query_flow(db: Session, flow):
+    try:
+        statement = next(flow)
+        while True:
+            statement = flow.send(db.execute(statement))
+    except StopIteration as stop:
+        return stop.value
+
+async def run_query_flow_async(db: AsyncSession, flow):
+    try:
+        statement = next(flow)
+        while True:
+            statement = flow.send(await db.execute(statement))
+    except StopIteration as stop:
+        return stop.value
+
+def tasks_flow(request: Request, response: Response, owner_id: int, dialect_name: str,
+               sort_by, order, search, limit, cursor, fields):
+    check_sort_by(sort_by)
+    fields = parse_fields(fields)
+    if cursor and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+
+    generation, not_modified = tasks_version(request, response, owner_id)
+    if not_modified is not None:
+        return not_modified
+
+    cache_key = tasks_cache_key(owner_id, sort_by, order, search, limit, cursor, fields)
+    cached = cached_tasks(response, cache_key)
+    if cached is not None:
+        return cached
+
+    stmt, finish = tasks_statement(owner_id, sort_by, order, search, dialect_name, limit, cursor, fields)
+    rows, next_cursor = finish((yield stmt).all())
+    body = rows_json(rows, fields)
+
+    task_cache.set(cache_key, (body, next_cursor), generation)
+    set_next_cursor(response, next_cursor)
+    return json_response(response, body)
+
+def task_stats_flow(request: Request, response: Response, owner_id: int):
+    _, not_modified = tasks_version(request, response, owner_id)
+    if not_modified is not None:
+        return not_modified
+    return task_stats((yield task_stats_statement(owner_id)).all())
+
+def task_flow(request: Request, response: Response, owner_id: int, task_id: int, fields):
+    fields = parse_fields(fields)
+    _, not_modified = tasks_version(request, response, owner_id)
+    if not_modified is not None:
+        if (yield task_exists_statement(owner_id, task_id)).first() is None:
+            raise HTTPException(status_code=404, detail="Задача не найдена")
+        return not_modified
+    row = (yield task_row_statement(owner_id, task_id, fields)).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return json_response(response, row_json(row, fields))
+
+def top_tasks_flow(request: Request, response: Response, owner_id: int,
+                   n: int, priority, all_priorities: bool, cursor, fields):
+    fields = parse_fields(fields)
+    generation, not_modified = tasks_version(request, response, owner_id)
+    if not_modified is not None:
+        return not_modified
+    if top_index.needs_load(owner_id, generation, priority, all_priorities):
+        stmt, _ = top_statement(owner_id, top_index.depth, priority, all_priorities, None)
+        top_index.load(owner_id, generation, priority, all_priorities, (yield stmt).all())
+    stmt, finish = top_statement(owner_id, n, priority, all_priorities, cursor, fields)
+    rows = top_index.page(owner_id, generation, n, priority, all_priorities, cursor)
+    if rows is None:
+        rows = (yield stmt).all()
+    rows, next_cursor = finish(rows)
+    set_next_cursor(response, next_cursor)
+    return json_response(response, rows_json(rows, fields))
+
+def new_task_values(task: TaskCreate, owner_id: int) -> dict:
+    return dict(
+        title=task.title,
+        description=task.description,
+        status=task.status,
+        priority=task.priority,
+        owner_id=owner_id
+    )
+
+def task_created(owner_id: int, db_task):
+    generation = clear_cache(owner_id)  # обновляем кэш
+    top_index.upsert(owner_id, generation, task_item(db_task))
+
+def task_changed(owner_id: int):
+    clear_cache(owner_id)  # обновляем кэш
+    top_index.forget(owner_id)
+
+def found_task(task):
+    if not task:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return task
+
+def apply_task_update(task, task_update: TaskUpdate):
+    for field, value in task_update.dict(exclude_unset=True).items():
+        setattr(task, field, value)
+
+def token_response(subject: str, **extra) -> dict:
+    access_token = create_access_token(data={"sub": subject})
+    return {"access_token": access_token, "token_type": "bearer", **extra}
+
 # -----------------------------
 # Эндпоинты аутентификации
 # -----------------------------
-@app.post("/register", response_model=Token)
+# Эндпоинты с доступом к БД объявлены на двух роутерах: sync_api (Session, threadpool)
+# и async_api (AsyncSession). К приложению подключается один из них — см. DB_ASYNC.
+# extra_api — пакетные операции, экспорт и импорт: они работают только через синхронную
+# Session (в пуле потоков) и подключаются в обоих режимах.
+sync_api = APIRouter()
+async_api = APIRouter()
+extra_api = APIRouter()
+
+@sync_api.post("/register", response_model=Token)
 def register(user: UserCreate, db: Session = Depends(get_db)):
     existing = db.query(User).filter(User.username == user.username).first()
     if existing:
@@ -197,109 +2126,96 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
-    access_token = create_access_token(data={"sub": new_user.username})
-    return {"access_token": access_token, "token_type": "bearer", "username": new_user.username}
+    return token_response(new_user.username, username=new_user.username)
 
-@app.post("/token", response_model=Token)
+@sync_api.post("/token", response_model=Token)
 def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = db.query(User).filter(User.username == form_data.username).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Неверные имя пользователя или пароль")
-    access_token = create_access_token(data={"sub": user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    return token_response(user.username)
 
 # -----------------------------
 # CRUD для задач
 # -----------------------------
-@app.post("/tasks", response_model=TaskOut)
+@sync_api.post("/tasks", response_model=TaskOut)
 def create_task(task: TaskCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_task = Task(
-        title=task.title,
-        description=task.description,
-        status=task.status,
-        priority=task.priority,
-        owner_id=current_user.id
-    )
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
-    clear_cache()  # обновляем кэш
+    values = new_task_values(task, current_user.id)
+    if GROUP_COMMIT:
+        bind = db.get_bind()
+        # соединение сессии (если get_current_user читал пользователя) — обратно в пул до ожидания пачки,
+        # иначе ждущие запросы могут занять весь пул и писателю не достанется соединения
+        db.close()
+        db_task = group_commit.writer(bind).insert(values)
+    else:
+        db_task = Task(**values)
+        db.add(db_task)
+        db.commit()
+        db.refresh(db_task)
+    task_created(current_user.id, db_task)
     return db_task
 
-@app.get("/tasks", response_model=List[TaskOut])
+@sync_api.get("/tasks", response_model=List[TaskOut])
 def get_tasks(
+    request: Request,
+    response: Response,
     sort_by: Optional[str] = None,          # 'title', 'status', 'created_at', 'priority'
     order: Optional[str] = "asc",           # 'asc' или 'desc'
     search: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description=f"Курсор из заголовка {NEXT_CURSOR_HEADER}"),
+    fields: Optional[str] = FIELDS_QUERY,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    # Если нет параметров сортировки и поиска – проверяем кэш
-    if sort_by is None and search is None:
-        now = time.time()
-        if cache_data["tasks"] is not None and now - cache_data["timestamp"] < CACHE_TIMEOUT:
-            return cache_data["tasks"]
+    return run_query_flow(db, tasks_flow(request, response, current_user.id, db.get_bind().dialect.name,
+                                         sort_by, order, search, limit, cursor, fields))
 
-    query = db.query(Task).filter(Task.owner_id == current_user.id)
-    if search:
-        # простой поиск подстроки в заголовке или описании
-        query = query.filter(
-            (Task.title.contains(search)) | (Task.description.contains(search))
-        )
-    if sort_by:
-        if sort_by not in {"title", "status", "created_at", "priority"}:
-            raise HTTPException(status_code=400, detail="Неверный параметр сортировки")
-        sort_column = getattr(Task, sort_by)
-        if order == "desc":
-            query = query.order_by(desc(sort_column))
-        else:
-            query = query.order_by(asc(sort_column))
-    tasks = query.all()
-
-    if sort_by is None and search is None:
-        cache_data["tasks"] = tasks
-        cache_data["timestamp"] = time.time()
-    return tasks
+@sync_api.get("/tasks/stats", response_model=TaskStats)
+def get_task_stats(request: Request, response: Response, db: Session = Depends(get_db),
+                   current_user: User = Depends(get_current_user)):
+    """
+    Число задач пользователя всего, по статусам и по приоритетам. Читается из task_counters —
+    несколько строк независимо от числа задач. Объявлен раньше /tasks/{task_id}.
+    """
+    return run_query_flow(db, task_stats_flow(request, response, current_user.id))
 
-@app.get("/tasks/{task_id}", response_model=TaskOut)
-def get_task(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    task = db.query(Task).filter(Task.id == task_id, Task.owner_id == current_user.id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Задача не найдена")
-    return task
+@sync_api.get("/tasks/{task_id}", response_model=TaskOut)
+def get_task(task_id: int, request: Request, response: Response, fields: Optional[str] = FIELDS_QUERY,
+             db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    return run_query_flow(db, task_flow(request, response, current_user.id, task_id, fields))
 
-@app.put("/tasks/{task_id}", response_model=TaskOut)
+@sync_api.put("/tasks/{task_id}", response_model=TaskOut)
 def update_task(task_id: int, task_update: TaskUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    task = db.query(Task).filter(Task.id == task_id, Task.owner_id == current_user.id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Задача не найдена")
-    for field, value in task_update.dict(exclude_unset=True).items():
-        setattr(task, field, value)
+    task = found_task(db.execute(task_statement(current_user.id, task_id)).scalars().first())
+    apply_task_update(task, task_update)
     db.commit()
     db.refresh(task)
-    clear_cache()  # обновляем кэш
+    task_changed(current_user.id)
     return task
 
-@app.delete("/tasks/{task_id}")
+@sync_api.delete("/tasks/{task_id}")
 def delete_task(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    task = db.query(Task).filter(Task.id == task_id, Task.owner_id == current_user.id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Задача не найдена")
+    task = found_task(db.execute(task_statement(current_user.id, task_id)).scalars().first())
     db.delete(task)
     db.commit()
-    clear_cache()  # обновляем кэш
+    task_changed(current_user.id)
     return {"detail": "Задача удалена"}
 
 # -----------------------------
 # Эндпоинт топ-N задач по приоритету
 # -----------------------------
-@app.get("/tasks/top/", response_model=List[TaskOut])
+@sync_api.get("/tasks/top/", response_model=List[TaskOut])
 def top_tasks(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     n: int = 5,
     priority: Optional[int] = Query(None, description="Если указан, выводим только задачи с этим приоритетом"),
-    all_priorities: bool = False
+    all_priorities: bool = False,
+    cursor: Optional[str] = Query(None, description=f"Курсор из заголовка {NEXT_CURSOR_HEADER}: следующие n задач"),
+    fields: Optional[str] = FIELDS_QUERY
 ):
     """
     Выводит список из n задач с учётом приоритета.
@@ -308,39 +2224,719 @@ def top_tasks(
     - priority: если указан, выводим только этот приоритет
     - all_priorities: если True, выводим задачи всех приоритетов в порядке возрастания
       (при этом игнорируем значение 'priority')
+    - cursor: продолжение выдачи — следующие n задач в том же порядке
+    - fields: поля ответа через запятую (по умолчанию все)
     """
-    query = db.query(Task).filter(Task.owner_id == current_user.id)
+    return run_query_flow(db, top_tasks_flow(request, response, current_user.id,
+                                             n, priority, all_priorities, cursor, fields))
 
-    if priority is not None and not all_priorities:
-        # Если указан конкретный приоритет, фильтруем по нему
-        query = query.filter(Task.priority == priority)
-        # Логично отсортировать по дате создания (самые новые первыми) или как вам удобно
-        tasks = query.order_by(desc(Task.created_at)).limit(n).all()
+# -----------------------------
+# Асинхронные версии эндпоинтов (DB_ASYNC=1)
+# -----------------------------
+# Та же логика и те же запросы, что выше, но через AsyncSession: обработчики работают
+# в event loop без пула потоков. bcrypt ожидается через пул процессов password_hasher.
+@async_api.post("/register", response_model=Token)
+async def register_async(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing = await db.scalar(select(User).where(User.username == user.username))
+    if existing:
+        raise HTTPException(status_code=400, detail="Пользователь уже существует")
+    new_user = User(
+        username=user.username,
+        hashed_password=await password_hasher.hash_async(user.password)
+    )
+    db.add(new_user)
+    await db.commit()
+    return token_response(new_user.username, username=new_user.username)
 
-    elif all_priorities:
-        # Если галочка "Все приоритеты", выводим n задач,
-        # начиная с наименьшего приоритета и далее
-        tasks = query.order_by(asc(Task.priority), desc(Task.created_at)).limit(n).all()
+@async_api.post("/token", response_model=Token)
+async def login_async(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.username == form_data.username))
+    if not user or not await password_hasher.verify_async(form_data.password, user.hashed_password):
+        raise HTTPException(status_code=400, detail="Неверные имя пользователя или пароль")
+    return token_response(user.username)
 
+@async_api.post("/tasks", response_model=TaskOut)
+async def create_task_async(task: TaskCreate, db: AsyncSession = Depends(get_async_db),
+                            current_user: User = Depends(get_current_user_async)):
+    values = new_task_values(task, current_user.id)
+    if GROUP_COMMIT:
+        bind = db.bind
+        await db.close()  # см. create_task
+        db_task = await group_commit.async_writer(bind).insert(values)
     else:
-        # По умолчанию – "топ" в смысле самых высоких приоритетов
-        tasks = query.order_by(desc(Task.priority), desc(Task.created_at)).limit(n).all()
+        db_task = Task(**values)
+        db.add(db_task)
+        await db.commit()
+        await db.refresh(db_task)
+    task_created(current_user.id, db_task)
+    return db_task
+
+@async_api.get("/tasks", response_model=List[TaskOut])
+async def get_tasks_async(
+    request: Request,
+    response: Response,
+    sort_by: Optional[str] = None,
+    order: Optional[str] = "asc",
+    search: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Размер страницы"),
+    cursor: Optional[str] = Query(None, description=f"Курсор из заголовка {NEXT_CURSOR_HEADER}"),
+    fields: Optional[str] = FIELDS_QUERY,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    return await run_query_flow_async(db, tasks_flow(request, response, current_user.id, db.bind.dialect.name,
+                                                     sort_by, order, search, limit, cursor, fields))
 
-    return tasks
+@async_api.get("/tasks/stats", response_model=TaskStats)
+async def get_task_stats_async(request: Request, response: Response, db: AsyncSession = Depends(get_async_db),
+                               current_user: User = Depends(get_current_user_async)):
+    return await run_query_flow_async(db, task_stats_flow(request, response, current_user.id))
 
+@async_api.get("/tasks/{task_id}", response_model=TaskOut)
+async def get_task_async(task_id: int, request: Request, response: Response, fields: Optional[str] = FIELDS_QUERY,
+                         db: AsyncSession = Depends(get_async_db),
+                         current_user: User = Depends(get_current_user_async)):
+    return await run_query_flow_async(db, task_flow(request, response, current_user.id, task_id, fields))
 
-@app.get("/tasks/{task_id}", response_model=TaskOut)
-def get_task(task_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    task = db.query(Task).filter(Task.id == task_id, Task.owner_id == current_user.id).first()
-    if not task:
-        raise HTTPException(status_code=404, detail="Задача не найдена")
+@async_api.put("/tasks/{task_id}", response_model=TaskOut)
+async def update_task_async(task_id: int, task_update: TaskUpdate, db: AsyncSession = Depends(get_async_db),
+                            current_user: User = Depends(get_current_user_async)):
+    task = found_task((await db.execute(task_statement(current_user.id, task_id))).scalars().first())
+    apply_task_update(task, task_update)
+    await db.commit()
+    await db.refresh(task)
+    task_changed(current_user.id)
     return task
 
+@async_api.delete("/tasks/{task_id}")
+async def delete_task_async(task_id: int, db: AsyncSession = Depends(get_async_db),
+                            current_user: User = Depends(get_current_user_async)):
+    task = found_task((await db.execute(task_statement(current_user.id, task_id))).scalars().first())
+    await db.delete(task)
+    await db.commit()
+    task_changed(current_user.id)
+    return {"detail": "Задача удалена"}
+
+@async_api.get("/tasks/top/", response_model=List[TaskOut])
+async def top_tasks_async(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async),
+    n: int = 5,
+    priority: Optional[int] = Query(None, description="Если указан, выводим только задачи с этим приоритетом"),
+    all_priorities: bool = False,
+    cursor: Optional[str] = Query(None, description=f"Курсор из заголовка {NEXT_CURSOR_HEADER}: следующие n задач"),
+    fields: Optional[str] = FIELDS_QUERY
+):
+    return await run_query_flow_async(db, top_tasks_flow(request, response, current_user.id,
+                                                         n, priority, all_priorities, cursor, fields))
+
+# -----------------------------
+# Пакетные операции с задачами
+# -----------------------------
+# Каждая операция выполняется одним запросом к БД (executemany / IN (...)) в одной транзакции
+# и сбрасывает кэш владельца один раз на пакет. Ошибки валидации и «чужие»/несуществующие id
+# не прерывают пакет, а возвращаются в errors с индексом элемента.
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "5000"))
+
+def check_bulk_size(items):
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Не более {BULK_MAX_ITEMS} элементов за запрос")
+
+def validate_items(model, items: List[Dict[str, Any]]):
+    """Возвращает [(index, объект)] валидных элементов и список ошибок."""
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model(**item)))
+        except (ValidationError, TypeError) as exc:
+            if isinstance(exc, ValidationError):
+                detail = [{"loc": list(error["loc"]), "msg": error["msg"]} for error in exc.errors()]
+            else:
+                detail = str(exc)
+            errors.append(BulkError(index=index, id=item.get("id") if isinstance(item, dict) else None,
+                                    detail=detail))
+    return valid, errors
+
+@extra_api.post("/tasks/bulk", response_model=BulkTasksResult)
+def create_tasks_bulk(items: List[Dict[str, Any]], db: Session = Depends(get_db),
+                      current_user: User = Depends(get_current_user)):
+    check_bulk_size(items)
+    valid, errors = validate_items(TaskCreate, items)
+    tasks = []
+    if valid:
+        rows = [dict(task, owner_id=current_user.id) for _, task in valid]  # как в import_records
+        tasks = db.scalars(insert(Task).returning(Task), rows).all()
+        db.commit()
+        clear_cache(current_user.id)  # обновляем кэш один раз на пакет
+    return {"tasks": tasks, "errors": errors}
+
+@extra_api.patch("/tasks/bulk", response_model=BulkTasksResult)
+def update_tasks_bulk(items: List[Dict[str, Any]], db: Session = Depends(get_db),
+                      current_user: User = Depends(get_current_user)):
+    check_bulk_size(items)
+    valid, errors = validate_items(TaskPatch, items)
+    requested = {patch.id for _, patch in valid}
+    owned = set(db.scalars(
+        select(Task.id).where(Task.owner_id == current_user.id, Task.id.in_(requested))
+    )) if requested else set()
+
+    rows, accepted = [], set()
+    for index, patch in valid:
+        if patch.id not in owned:
+            errors.append(BulkError(index=index, id=patch.id, detail="Задача не найдена"))
+            continue
+        fields = patch.dict(exclude_unset=True)
+        # явный null не пропускаем: столбец стал бы NULL, и задача не прошла бы TaskOut
+        nulls = [name for name, value in fields.items() if value is None]
+        if nulls:
+            errors.append(BulkError(index=index, id=patch.id,
+                                    detail=[{"loc": [name], "msg": "Поле не может быть null"} for name in nulls]))
+            continue
+        accepted.add(patch.id)
+        if len(fields) > 1:
+            rows.append(fields)
+    if rows:
+        db.execute(update(Task), rows)  # UPDATE ... WHERE id = ? через executemany
+    # в ответе — только изменённые задачи и пустые патчи; отклонённые элементы есть лишь в errors
+    tasks = db.scalars(select(Task).where(Task.id.in_(accepted)).order_by(Task.id)).all() if accepted else []
+    db.commit()
+    if rows:
+        clear_cache(current_user.id)  # обновляем кэш один раз на пакет
+    errors.sort(key=lambda error: error.index)
+    return {"tasks": tasks, "errors": errors}
+
+@extra_api.delete("/tasks/bulk", response_model=BulkDeleteResult)
+def delete_tasks_bulk(payload: TaskIds, db: Session = Depends(get_db),
+                      current_user: User = Depends(get_current_user)):
+    check_bulk_size(payload.ids)
+    deleted = set()
+    if payload.ids:
+        deleted = set(db.scalars(
+            delete(Task).where(Task.owner_id == current_user.id, Task.id.in_(payload.ids)).returning(Task.id)
+        ))
+        db.commit()
+    if deleted:
+        clear_cache(current_user.id)  # обновляем кэш один раз на пакет
+    errors = [BulkError(index=index, id=task_id, detail="Задача не найдена")
+              for index, task_id in enumerate(payload.ids) if task_id not in deleted]
+    return {"deleted": sorted(deleted), "errors": errors}
+
+@extra_api.get("/tasks/bulk", response_model=BulkTasksResult)
+def get_tasks_bulk(ids: List[int] = Query(..., description="id задач: ?ids=1&ids=2"),
+                   db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    check_bulk_size(ids)
+    found = {task.id: task for task in db.scalars(
+        select(Task).where(Task.owner_id == current_user.id, Task.id.in_(ids))
+    )}
+    errors = [BulkError(index=index, id=task_id, detail="Задача не найдена")
+              for index, task_id in enumerate(ids) if task_id not in found]
+    # порядок ответа — порядок запрошенных id
+    tasks = [found[task_id] for task_id in dict.fromkeys(ids) if task_id in found]
+    return {"tasks": tasks, "errors": errors}
+
+# -----------------------------
+# Потоковый экспорт задач
+# -----------------------------
+# Строки читаются серверным курсором (stream_results + yield_per) пачками по
+# EXPORT_BATCH_SIZE и сразу отправляются клиенту, поэтому память не зависит от числа задач.
+# Чтение идёт через отдельное соединение того же engine: ответ отдаётся уже после
+# завершения обработчика, когда сессия запроса может быть закрыта.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_COLUMNS = ["id", "title", "description", "status", "created_at", "priority"]
+
+def export_batches(bind, owner_id: int):
+    stmt = (
+        select(*[getattr(Task, name) for name in EXPORT_COLUMNS])
+        .where(Task.owner_id == owner_id)
+        .order_by(Task.id)
+    )
+    with bind.connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE).execute(stmt)
+        for batch in result.partitions():
+            yield batch
+
+def export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def ndjson_export(bind, owner_id: int):
+    for batch in export_batches(bind, owner_id):
+        yield "".join(
+            json.dumps({name: export_value(value) for name, value in zip(EXPORT_COLUMNS, row)},
+                       ensure_ascii=False, separators=(",", ":")) + "\n"
+            for row in batch
+        ).encode()
+
+def csv_export(bind, owner_id: int):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode()
+    for batch in export_batches(bind, owner_id):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([export_value(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode()
+
+EXPORT_FORMATS = {
+    "ndjson": (ndjson_export, "application/x-ndjson"),
+    "csv": (csv_export, "text/csv; charset=utf-8"),
+}
+
+@extra_api.get("/tasks/export")
+def export_tasks(format: str = "ndjson", db: Session = Depends(get_db),
+                 current_user: User = Depends(get_current_user)):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Неверный формат экспорта")
+    generate, media_type = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        generate(db.get_bind(), current_user.id),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'},
+    )
+
+# -----------------------------
+# Массовый импорт задач
+# -----------------------------
+# Тело запроса (CSV с заголовком или NDJSON) читается потоком, строки проверяются схемой
+# TaskCreate и пишутся пачками по IMPORT_CHUNK_SIZE: на PostgreSQL через COPY FROM STDIN,
+# на остальных БД — executemany. Весь импорт — одна транзакция; невалидные строки
+# пропускаются и попадают в отчёт (первые IMPORT_MAX_ERRORS). Триггеры поискового
+# индекса и счётчиков остаются на месте и срабатывают на каждую строку; снимать их
+# (без DDL в рабочем запросе) умеет только офлайн-загрузчик tests/performance/datagen.py.
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+IMPORT_COLUMNS = ["title", "description", "status", "priority", "created_at", "owner_id"]
+CSV_OPTIONAL_FIELDS = {"status", "priority"}  # пустая ячейка — значение по умолчанию
+
+class ImportRowError(BaseModel):
+    line: int
+    detail: Any
+
+class ImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ImportRowError]
+
+class RequestBodyReader(io.RawIOBase):
+    """Файлоподобная обёртка над телом запроса; next_chunk() возвращает bytes или None в конце."""
+
+    def __init__(self, next_chunk):
+        self._next_chunk = next_chunk
+        self._buffer = b""
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer and not self._eof:
+            chunk = self._next_chunk()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buffer = chunk
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+def csv_records(text_stream):
+    reader = csv.DictReader(text_stream)
+    for record in reader:
+        yield reader.line_num, {
+            key: value for key, value in record.items()
+            if key is not None and not (key in CSV_OPTIONAL_FIELDS and value == "")
+        }
+
+def ndjson_records(text_stream):
+    for number, line in enumerate(text_stream, start=1):
+        if line.strip():
+            yield number, line
+
+IMPORT_FORMATS = {"csv": csv_records, "ndjson": ndjson_records}
+
+def copy_text_value(value) -> str:
+    """Значение в текстовом формате COPY."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+def write_import_chunk(db: Session, rows: List[Dict[str, Any]]):
+    dialect = db.get_bind().dialect
+    if dialect.name == "postgresql":
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write("\t".join(copy_text_value(row[name]) for name in IMPORT_COLUMNS) + "\n")
+        buffer.seek(0)
+        cursor = db.connection().connection.driver_connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY tasks ({', '.join(IMPORT_COLUMNS)}) FROM STDIN", buffer)
+        finally:
+            cursor.close()
+    elif dialect.name == "sqlite":
+        # executemany драйвера кортежами: без ORM-обработки и привязки параметров на каждую строку
+        created_at = Task.created_at.type.dialect_impl(dialect).bind_processor(dialect)
+        placeholders = ", ".join("?" for _ in IMPORT_COLUMNS)
+        db.connection().exec_driver_sql(
+            f"INSERT INTO tasks ({', '.join(IMPORT_COLUMNS)}) VALUES ({placeholders})",
+            [tuple(created_at(row[name]) if name == "created_at" else row[name] for name in IMPORT_COLUMNS)
+             for row in rows],
+        )
+    else:
+        db.execute(insert(Task), rows)
+
+def import_records(db: Session, owner_id: int, records) -> dict:
+    imported, failed, errors, chunk = 0, 0, [], []
+    for line, record in records:
+        try:
+            if isinstance(record, str):
+                record = json.loads(record)
+            task = TaskCreate(**record)
+        except (ValidationError, ValueError, TypeError) as exc:
+            failed += 1
+            if len(errors) < IMPORT_MAX_ERRORS:
+                if isinstance(exc, ValidationError):
+                    detail = [{"loc": list(error["loc"]), "msg": error["msg"]} for error in exc.errors()]
+                else:
+                    detail = str(exc)
+                errors.append({"line": line, "detail": detail})
+            continue
+        chunk.append(dict(task, created_at=datetime.utcnow(), owner_id=owner_id))  # dict(model) — без копий и предупреждений .dict()
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            write_import_chunk(db, chunk)
+            imported += len(chunk)
+            chunk = []
+    if chunk:
+        write_import_chunk(db, chunk)
+        imported += len(chunk)
+    db.commit()
+    if imported:
+        clear_cache(owner_id)  # обновляем кэш один раз на импорт
+    return {"imported": imported, "failed": failed, "errors": errors}
+
+async def _next_body_chunk(chunks):
+    try:
+        return await chunks.__anext__()
+    except StopAsyncIteration:
+        return None
+
+@extra_api.post("/tasks/import", response_model=ImportResult)
+async def import_tasks(request: Request, format: str = "csv", db: Session = Depends(get_db),
+                       current_user: User = Depends(get_current_user)):
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Неверный формат импорта")
+    chunks = request.stream()
+
+    def run_import():
+        # поток пула забирает очередные куски тела у event loop по мере разбора
+        raw = RequestBodyReader(lambda: anyio.from_thread.run(_next_body_chunk, chunks))
+        text_stream = io.TextIOWrapper(io.BufferedReader(raw), encoding="utf-8-sig", newline="")
+        return import_records(db, current_user.id, IMPORT_FORMATS[format](text_stream))
+
+    return await run_in_threadpool(run_import)
+
+# -----------------------------
+# Служебные эндпоинты
+# -----------------------------
+@app.get("/metrics/cache")
+def cache_metrics():
+    """Счётчики кэша GET /tasks: попадания, промахи, вытеснения, инвалидации."""
+    return task_cache.stats()
+
+@app.get("/metrics/top")
+def top_index_metrics():
+    """Счётчики топ-N в памяти: ответы без SQL (hits), обращения к SQL (misses), загрузки веток."""
+    return top_index.stats()
+
+@app.get("/metrics/group-commit")
+def group_commit_metrics():
+    """Групповая запись POST /tasks: число пачек и строк, средняя и наибольшая пачка."""
+    return group_commit.stats()
+
+@app.get("/metrics/principals")
+def principal_metrics():
+    """Счётчики кэша аутентифицированных пользователей."""
+    return principal_cache.stats()
+
+@app.get("/metrics/hashing")
+def hashing_metrics():
+    """Счётчики пула bcrypt: очередь, выполненные и отклонённые задачи, затраченное время."""
+    return password_hasher.stats()
+
+@app.get("/metrics/pool")
+def pool_metrics_endpoint():
+    """
+    Пул соединений с БД: размер, занятые (in_use) и сверх размера (overflow) соединения,
+    ждущие запросы, число выдач и таймаутов, суммарное и максимальное ожидание.
+    """
+    metrics = {"sync": pool_metrics(engine)}
+    if async_engine is not None:
+        metrics["async"] = pool_metrics(async_engine.sync_engine)
+    return metrics
+
+# -----------------------------
+# Метрики в формате Prometheus (GET /metrics)
+# -----------------------------
+# Middleware — чистый ASGI без BaseHTTPMiddleware: на запрос это два вызова perf_counter
+# и обновление пары словарей. Маршрут берётся шаблоном (/tasks/{task_id}), а не путём,
+# чтобы число рядов не росло с числом задач. Метрики свои у каждого воркера:
+# Prometheus собирает их с каждого процесса отдельно.
+class HttpMetrics:
+    """Счётчики запросов по (метод, маршрут, статус) и гистограммы длительности по (метод, маршрут)."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = {}
+        self.latency = {}
+
+    def observe(self, method: str, route: str, status_code: int, elapsed: float):
+        key = (method, route, status_code)
+        self.requests[key] = self.requests.get(key, 0) + 1
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = Histogram()
+        histogram.observe(elapsed)
+
+http_metrics = HttpMetrics()
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500  # если приложение упало до ответа
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_metrics.in_flight -= 1
+            route = scope.get("route")
+            http_metrics.observe(scope["method"], getattr(route, "path", "unmatched"), status_code,
+                                 time.perf_counter() - started)
+
+app.add_middleware(MetricsMiddleware)
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _metric(lines: List[str], name: str, kind: str, help_text: str, samples):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for labels, value in samples:
+        lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+
+def render_metrics() -> str:
+    lines = []
+    _metric(lines, "benetasks_http_requests_total", "counter", "Число HTTP-запросов.", [
+        (f'method="{method}",route="{_label(route)}",status="{status_code}"', count)
+        for (method, route, status_code), count in sorted(http_metrics.requests.items())
+    ])
+    name = "benetasks_http_request_duration_seconds"
+    lines += [f"# HELP {name} Длительность HTTP-запросов.", f"# TYPE {name} histogram"]
+    for (method, route), histogram in sorted(http_metrics.latency.items()):
+        lines += histogram.render(name, f'method="{method}",route="{_label(route)}"')
+    _metric(lines, "benetasks_http_requests_in_flight", "gauge", "Запросы в обработке.",
+            [("", http_metrics.in_flight)])
+
+    cache = task_cache.stats()
+    _metric(lines, "benetasks_task_cache_hits_total", "counter", "Попадания в кэш GET /tasks.", [("", cache["hits"])])
+    _metric(lines, "benetasks_task_cache_misses_total", "counter", "Промахи кэша GET /tasks.", [("", cache["misses"])])
+    _metric(lines, "benetasks_task_cache_hit_ratio", "gauge", "Доля попаданий в кэш GET /tasks.",
+            [("", cache["hit_ratio"])])
+    _metric(lines, "benetasks_task_cache_entries", "gauge", "Записей в кэше GET /tasks.", [("", cache["entries"])])
+    _metric(lines, "benetasks_task_cache_bytes", "gauge", "Суммарный размер тел в кэше GET /tasks.",
+            [("", cache["bytes"])])
+
+    top = top_index.stats()
+    _metric(lines, "benetasks_top_index_hits_total", "counter", "Ответы GET /tasks/top/ из памяти.", [("", top["hits"])])
+    _metric(lines, "benetasks_top_index_misses_total", "counter", "Ответы GET /tasks/top/ через SQL.",
+            [("", top["misses"])])
+    _metric(lines, "benetasks_top_index_owners", "gauge", "Владельцы с топ-N в памяти.", [("", top["owners"])])
+
+    batches = group_commit.stats()
+    _metric(lines, "benetasks_group_commit_batches_total", "counter", "Транзакции групповой записи задач.",
+            [("", batches["batches"])])
+    _metric(lines, "benetasks_group_commit_rows_total", "counter", "Задачи, записанные групповой записью.",
+            [("", batches["rows"])])
+
+    hashing = password_hasher.stats()
+    with password_hasher._lock:
+        bcrypt_lines = password_hasher.bcrypt_histogram.render("benetasks_bcrypt_seconds")
+        total_lines = password_hasher.total_histogram.render("benetasks_bcrypt_total_seconds")
+    lines += ["# HELP benetasks_bcrypt_seconds Время bcrypt в пуле процессов.",
+              "# TYPE benetasks_bcrypt_seconds histogram"] + bcrypt_lines
+    lines += ["# HELP benetasks_bcrypt_total_seconds Время bcrypt вместе с ожиданием в очереди.",
+              "# TYPE benetasks_bcrypt_total_seconds histogram"] + total_lines
+    _metric(lines, "benetasks_bcrypt_in_flight", "gauge", "Операции bcrypt в очереди и в работе.",
+            [("", hashing["in_flight"])])
+    _metric(lines, "benetasks_bcrypt_rejected_total", "counter", "Операции bcrypt, отклонённые с 503.",
+            [("", hashing["rejected"])])
+
+    pool = pool_metrics(engine)
+    if "in_use" in pool:
+        _metric(lines, "benetasks_db_pool_in_use", "gauge", "Выданные соединения пула.", [("", pool["in_use"])])
+        _metric(lines, "benetasks_db_pool_overflow", "gauge", "Соединения сверх DB_POOL_SIZE.", [("", pool["overflow"])])
+        _metric(lines, "benetasks_db_pool_waiting", "gauge", "Запросы, ждущие соединение.", [("", pool["waiting"])])
+        _metric(lines, "benetasks_db_pool_wait_seconds_total", "counter", "Суммарное ожидание соединения.",
+                [("", pool["wait_seconds_total"])])
+        _metric(lines, "benetasks_db_pool_timeouts_total", "counter", "Таймауты ожидания соединения.",
+                [("", pool["timeouts"])])
+    return "\n".join(lines) + "\n"
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    # async: выполняется в том же event loop, что и middleware, без гонок со счётчиками
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# -----------------------------
+# SQL-запросы каждого HTTP-запроса: Server-Timing, медленные запросы, N+1
+# -----------------------------
+# События before/after_cursor_execute на классе Engine охватывают все движки (и sync_engine
+# асинхронного). Статистика текущего запроса лежит в contextvar: пул потоков FastAPI
+# копирует контекст, поэтому запросы из sync-эндпоинтов и зависимостей тоже учитываются.
+SQL_INSTRUMENTATION = os.getenv("SQL_INSTRUMENTATION", "1") == "1"
+SQL_SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "5"))  # 0 — не искать
+# параметры — это пароли (хеши), тексты задач, целые пачки: в лог только по явному SQL_LOG_PARAMS=1
+SQL_LOG_PARAMS = os.getenv("SQL_LOG_PARAMS", "0") == "1"
+SQL_LOG_PARAMS_LIMIT = 500  # символов параметров в логе
+sql_logger = logging.getLogger("benetasks.sql")
+
+class RequestQueries:
+    """Запросы к БД в рамках одного HTTP-запроса."""
+
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+
+    def record(self, statement: str, elapsed: float, executemany: bool = False):
+        self.count += 1
+        self.seconds += elapsed
+        # executemany (импорт, массовое создание, group commit) — уже пакетная запись:
+        # её повторы по пачкам — не N+1, в поиск повторов она не попадает
+        if not executemany:
+            self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated(self, threshold: int):
+        """Одинаковые запросы, выполненные не меньше threshold раз, — кандидаты в N+1."""
+        if threshold <= 0:
+            return []
+        return [(statement, count) for statement, count in self.statements.items() if count >= threshold]
+
+    def server_timing(self) -> str:
+        return f'db;desc="{self.count} SQL";dur={self.seconds * 1000:.2f}'
+
+current_queries: ContextVar[Optional[RequestQueries]] = ContextVar("current_queries", default=None)
+
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    queries = current_queries.get()
+    if queries is not None:
+        queries.record(statement, elapsed, executemany)
+    if elapsed * 1000 >= SQL_SLOW_QUERY_MS:
+        if not SQL_LOG_PARAMS:
+            sql_logger.warning("Медленный SQL-запрос (%.1f мс): %s", elapsed * 1000, statement)
+            return
+        params = repr(parameters)
+        if len(params) > SQL_LOG_PARAMS_LIMIT:
+            params = params[:SQL_LOG_PARAMS_LIMIT] + "..."
+        sql_logger.warning("Медленный SQL-запрос (%.1f мс): %s параметры: %s", elapsed * 1000, statement, params)
+
+def _query_failed(exception_context):
+    started = exception_context.connection.info.get("query_started") if exception_context.connection else None
+    if started:
+        started.pop()
+
+if SQL_INSTRUMENTATION:
+    event.listen(Engine, "before_cursor_execute", _query_started)
+    event.listen(Engine, "after_cursor_execute", _query_finished)
+    event.listen(Engine, "handle_error", _query_failed)
+
+def report_repeated_queries(method: str, route: str, queries: RequestQueries):
+    for statement, count in queries.repeated(SQL_N_PLUS_ONE_THRESHOLD):
+        sql_logger.warning("Возможный N+1 в %s %s: запрос выполнен %d раз: %s", method, route, count, statement)
+
+class QueryTimingMiddleware:
+    """Считает SQL-запросы HTTP-запроса и отдаёт их число и время в заголовке Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not SQL_INSTRUMENTATION:
+            await self.app(scope, receive, send)
+            return
+        queries = RequestQueries()
+        token = current_queries.set(queries)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", queries.server_timing().encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_queries.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            report_repeated_queries(scope["method"], route, queries)
+
+app.add_middleware(QueryTimingMiddleware)
+
+# extra_api — первым: иначе /tasks/bulk перехватил бы маршрут /tasks/{task_id}
+app.include_router(extra_api)
+app.include_router(async_api if DB_ASYNC else sync_api)
+
 # -----------------------------
 # Краткое объяснение кэширования:
 #
-# Для эндпоинта GET /tasks, когда нет дополнительных параметров сортировки или поиска,
-# применяется простой in-memory кэш. Это позволяет ускорить выдачу часто запрашиваемых данных,
-# поскольку список задач пользователя может меняться не очень часто. При изменении данных (create, update, delete)
-# кэш очищается. В продакшене рекомендуется использовать внешнее решение (например, Redis) для кэширования.
+# Для эндпоинта GET /tasks применяется in-memory кэш с ключом (owner_id, sort_by, order, search).
+# Кэш ограничен по числу записей и их суммарному размеру (CACHE_MAX_ENTRIES, CACHE_MAX_BYTES,
+# вытеснение по LRU; тела больше CACHE_MAX_ENTRY_BYTES не кэшируются) и по времени жизни записи
+# (CACHE_TIMEOUT). При изменении данных (create, update, delete) сбрасываются только записи
+# владельца задачи, поэтому кэш других пользователей продолжает работать.
+# В продакшене рекомендуется использовать внешнее решение (например, Redis) для кэширования.
 # -----------------------------
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Служебные команды BeneTasks")
+    parser.add_argument("command", choices=["migrate", "reconcile-stats"],
+                        help="migrate — применить миграции схемы; reconcile-stats — пересчитать счётчики задач")
+    parser.add_argument("--owner-id", type=int, help="reconcile-stats: только для этого пользователя")
+    args = parser.parse_args()
+    if args.command == "migrate":
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+    elif args.command == "reconcile-stats":
+        if args.owner_id is None:
+            rows = reconcile_task_counters_in_batches(engine)
+        else:
+            with engine.begin() as connection:
+                rows = reconcile_task_counters(connection, args.owner_id)
+        print(f"Счётчики задач пересчитаны: {rows} строк")
@@ -0,0 +1,226 @@
+"""
+Клиент API BeneTasks для Streamlit-интерфейса.
+
+- Один requests.Session на процесс (st.cache_resource): keep-alive и пул соединений,
+  таймауты на каждый запрос, повтор идемпотентных запросов при обрыве соединения и 502/503/504.
+- Чтения кэшируются st.cache_data по (токен, путь, параметры, версия данных пользователя):
+  перезапуск скрипта при изменении виджета не ходит в API. create/update/delete увеличивают
+  версию (она хранится в st.session_state и уходит вместе с сессией) — следующее чтение
+  идёт на сервер.
+- Промах кэша отправляет If-None-Match с сохранённым ETag: если задачи не менялись
+  (например, истёк TTL), сервер отвечает 304 без тела.
+- run_concurrently выполняет независимые вызовы параллельно, каждый в своём потоке
+  с ScriptRunContext сессии: st.cache_data и st.session_state работают в них как в скрипте.
+
+Функции не вызывают st.error/st.success — ошибки API приходят исключением ApiError.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx
+from urllib3.util.retry import Retry
+
+API_URL = os.getenv("API_URL", "http://backend:8000").rstrip("/")  # URL вашего FastAPI-приложения
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3"))  # секунд
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))       # секунд
+API_RETRIES = int(os.getenv("API_RETRIES", "3"))
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))               # соединений к backend-у
+TASKS_CACHE_TTL = int(os.getenv("TASKS_CACHE_TTL", "30"))           # секунд
+TASKS_CACHE_MAX_ENTRIES = 256
+ETAG_CACHE_MAX_ENTRIES = 256
+
+class ApiError(Exception):
+    def __init__(self, status_code, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code  # None — backend недоступен
+        self.detail = detail
+
+# -----------------------------
+# Соединения
+# -----------------------------
+@st.cache_resource
+def get_session() -> requests.Session:
+    retry = Retry(
+        total=API_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        # POST не повторяется после отправки: задача создалась бы дважды
+        allowed_methods=frozenset({"GET", "PUT", "DELETE"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=API_POOL_SIZE, pool_maxsize=API_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def call(method: str, path: str, token=None, headers=None, **kwargs) -> requests.Response:
+    headers = dict(headers or {})
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    try:
+        return get_session().request(method, f"{API_URL}{path}", headers=headers,
+                                     timeout=(API_CONNECT_TIMEOUT, API_READ_TIMEOUT), **kwargs)
+    except requests.RequestException as exc:
+        raise ApiError(None, f"API недоступен: {exc}")
+
+def _check(response: requests.Response):
+    if response.status_code == 200:
+        return response.json()
+    try:
+        detail = response.json().get("detail")
+    except ValueError:
+        detail = None
+    raise ApiError(response.status_code, detail if isinstance(detail, str) else response.text)
+
+# -----------------------------
+# Условные GET и кэш чтений
+# -----------------------------
+class EtagStore:
+    """(токен, путь, параметры) -> (ETag, данные, курсор); общий для сессий процесса."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+etags = EtagStore(ETAG_CACHE_MAX_ENTRIES)
+
+def conditional_get(token: str, path: str, params: dict):
+    """GET с If-None-Match. Возвращает (данные, курсор следующей страницы или None)."""
+    key = (token, path, tuple(sorted(params.items())))
+    saved = etags.get(key)
+    headers = {"If-None-Match": saved[0]} if saved else None
+    response = call("GET", path, token, headers=headers, params=params)
+    if response.status_code == 304 and saved:
+        return saved[1], saved[2]
+    data = _check(response)
+    next_cursor = response.headers.get("X-Next-Cursor")
+    if "ETag" in response.headers:
+        etags.set(key, (response.headers["ETag"], data, next_cursor))
+    return data, next_cursor
+
+def _versions() -> dict:
+    """Токен -> версия данных в этой сессии; меняется при каждой записи через клиент."""
+    return st.session_state.setdefault("api_data_versions", {})
+
+def data_version(token: str) -> int:
+    return _versions().get(token, 0)
+
+def invalidate(token: str):
+    """Следующие чтения пользователя пройдут мимо st.cache_data."""
+    versions = _versions()
+    versions[token] = versions.get(token, 0) + 1
+
+@st.cache_data(ttl=TASKS_CACHE_TTL, max_entries=TASKS_CACHE_MAX_ENTRIES, show_spinner=False)
+def _cached_get(token: str, path: str, params: tuple, version: int):
+    return conditional_get(token, path, dict(params))
+
+def cached_get(token: str, path: str, params=None):
+    params = tuple(sorted((key, value) for key, value in (params or {}).items() if value is not None))
+    return _cached_get(token, path, params, data_version(token))
+
+# -----------------------------
+# Эндпоинты
+# -----------------------------
+def login(username: str, password: str) -> str:
+    response = call("POST", "/token", data={"username": username, "password": password})
+    return _check(response)["access_token"]
+
+def register(username: str, password: str) -> str:
+    response = call("POST", "/register", json={"username": username, "password": password})
+    return _check(response)["access_token"]
+
+def get_tasks_page(token: str, sort_by=None, order="asc", search=None, limit=None, cursor=None, fields=None):
+    """
+    Страница задач: (задачи, курсор следующей страницы или None). Без limit — весь список.
+    fields — поля через запятую (например, без description для таблицы).
+    """
+    params = {"search": search or None, "limit": limit, "cursor": cursor, "fields": fields}
+    if sort_by:
+        params.update(sort_by=sort_by, order=order)
+    return cached_get(token, "/tasks", params)
+
+def get_tasks(token: str, sort_by=None, order="asc", search=None):
+    return get_tasks_page(token, sort_by, order, search)[0]
+
+def get_task(token: str, task_id: int):
+    return cached_get(token, f"/tasks/{task_id}")[0]
+
+def get_top_tasks(token: str, n=5, priority=None, all_priorities=False):
+    params = {"n": n}
+    if all_priorities:
+        params["all_priorities"] = "true"
+    elif priority is not None:
+        params["priority"] = priority
+    # в серверном коде маршрут /tasks/top/ (со слэшем в конце)
+    return cached_get(token, "/tasks/top/", params)[0]
+
+def get_stats(token: str):
+    return cached_get(token, "/tasks/stats")[0]
+
+def create_task(token: str, title, description, status, priority):
+    json_data = {"title": title, "description": description, "status": status, "priority": priority}
+    try:
+        return _check(call("POST", "/tasks", token, json=json_data))
+    finally:
+        invalidate(token)
+
+def update_task(token: str, task_id: int, title, description, status, priority):
+    json_data = {"title": title, "description": description, "status": status, "priority": priority}
+    try:
+        return _check(call("PUT", f"/tasks/{task_id}", token, json=json_data))
+    finally:
+        invalidate(token)
+
+def delete_task(token: str, task_id: int):
+    try:
+        return _check(call("DELETE", f"/tasks/{task_id}", token))
+    finally:
+        invalidate(token)
+
+# -----------------------------
+# Параллельные вызовы
+# -----------------------------
+def run_concurrently(*calls):
+    """
+    Выполняет независимые вызовы (функции без аргументов, например functools.partial)
+    одновременно. Возвращает [(результат, текст ошибки или None)] в порядке вызовов.
+    Потоки создаются на каждый вызов и получают ScriptRunContext до старта: в общем пуле
+    контекст одной сессии оставался бы на потоке и достался бы чужим вызовам.
+    """
+    outcomes = [None] * len(calls)
+
+    def run(index, fn):
+        try:
+            outcomes[index] = (fn(), None)
+        except ApiError as exc:
+            outcomes[index] = (None, exc.detail)
+        except BaseException as exc:
+            outcomes[index] = exc
+
+    threads = [add_script_run_ctx(threading.Thread(target=run, args=(index, fn), name=f"api-{index}"))
+               for index, fn in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for outcome in outcomes:
+        if isinstance(outcome, BaseException):
+            raise outcome
+    return outcomes
@@ -1,7 +1,9 @@
+import math
+from functools import partial
+
 import streamlit as st
-import requests
 
-API_URL = "backend:8000"  # URL вашего FastAPI-приложения
+import api_client as api
 
 # Инициализация session_state для хранения токена, имени пользователя и текущей «страницы»
 if "token" not in st.session_state:
@@ -10,84 +12,86 @@ if "username" not in st.session_state:
     st.session_state.username = None
 if "menu" not in st.session_state:
     st.session_state.menu = "Login"  # Стартовая «страница»
+if "task_cursors" not in st.session_state:
+    st.session_state.task_cursors = [None]  # курсоры открытых страниц списка; последний — текущая
+    st.session_state.task_view = None       # сортировка/поиск/размер страницы, к которым относятся курсоры
+    st.session_state.task_table = 0         # номер таблицы: смена сбрасывает выбранную строку
+
+TASK_STATUSES = ["в ожидании", "в работе", "завершено"]
+PAGE_SIZES = [25, 50, 100, 200]
+# Таблица не показывает описание — его не запрашиваем; полная задача читается только для формы
+TABLE_COLUMNS = {"id": "ID", "title": "Заголовок", "status": "Статус", "priority": "Приоритет", "created_at": "Создана"}
+TABLE_FIELDS = ",".join(TABLE_COLUMNS)
 
 # -----------------------------
-# Функции для работы с API
+# Функции для работы с API (запросы — в api_client.py)
 # -----------------------------
 def login(username, password):
-    data = {"username": username, "password": password}
-    response = requests.post(f"{API_URL}/token", data=data)
-    if response.status_code == 200:
-        token = response.json()["access_token"]
-        st.session_state.token = token
-        st.session_state.username = username
-        st.success("Вход выполнен успешно!")
-        # Переходим на страницу "Задачи"
-        st.session_state.menu = "Задачи"
-    else:
-        st.error("Ошибка входа: " + response.json().get("detail", "Неизвестная ошибка"))
+    try:
+        token = api.login(username, password)
+    except api.ApiError as exc:
+        st.error("Ошибка входа: " + exc.detail)
+        return
+    st.session_state.token = token
+    st.session_state.username = username
+    st.success("Вход выполнен успешно!")
+    # Переходим на страницу "Задачи"
+    st.session_state.menu = "Задачи"
 
 def register(username, password):
-    json_data = {"username": username, "password": password}
-    response = requests.post(f"{API_URL}/register", json=json_data)
-    if response.status_code == 200:
-        token = response.json()["access_token"]
-        st.session_state.token = token
-        st.session_state.username = username
-        st.success("Регистрация прошла успешно!")
-    else:
-        st.error("Ошибка регистрации: " + response.json().get("detail", "Неизвестная ошибка"))
-
-def get_tasks(sort_by=None, order="asc", search=None):
-    headers = {"Authorization": f"Bearer {st.session_state.token}"}
-    params = {}
-    if sort_by:
-        params["sort_by"] = sort_by
-        params["order"] = order
-    if search:
-        params["search"] = search
-    response = requests.get(f"{API_URL}/tasks", headers=headers, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error("Ошибка получения задач: " + response.text)
-        return []
+    try:
+        token = api.register(username, password)
+    except api.ApiError as exc:
+        st.error("Ошибка регистрации: " + exc.detail)
+        return
+    st.session_state.token = token
+    st.session_state.username = username
+    st.success("Регистрация прошла успешно!")
+
+def get_tasks_and_stats(sort_by=None, order="asc", search=None, limit=None, cursor=None):
+    """Страница задач и счётчики запрашиваются одновременно. Возвращает (задачи, следующий курсор, счётчики)."""
+    token = st.session_state.token
+    (page, tasks_error), (stats, stats_error) = api.run_concurrently(
+        partial(api.get_tasks_page, token, sort_by, order, search, limit, cursor, TABLE_FIELDS),
+        partial(api.get_stats, token),
+    )
+    if tasks_error is not None:
+        st.error("Ошибка получения задач: " + tasks_error)
+    if stats_error is not None:
+        st.error("Ошибка получения статистики: " + stats_error)
+    tasks, next_cursor = page or ([], None)
+    return tasks, next_cursor, stats
+
+def get_task(task_id):
+    try:
+        return api.get_task(st.session_state.token, task_id)
+    except api.ApiError as exc:
+        st.error("Ошибка получения задачи: " + exc.detail)
+        return None
 
 def create_task(title, description, status, priority):
-    headers = {"Authorization": f"Bearer {st.session_state.token}"}
-    json_data = {
-        "title": title,
-        "description": description,
-        "status": status,
-        "priority": priority
-    }
-    response = requests.post(f"{API_URL}/tasks", headers=headers, json=json_data)
-    if response.status_code == 200:
-        st.success("Задача создана!")
-    else:
-        st.error("Ошибка создания задачи: " + response.text)
+    try:
+        api.create_task(st.session_state.token, title, description, status, priority)
+    except api.ApiError as exc:
+        st.error("Ошибка создания задачи: " + exc.detail)
+        return
+    st.success("Задача создана!")
 
 def update_task(task_id, title, description, status, priority):
-    headers = {"Authorization": f"Bearer {st.session_state.token}"}
-    json_data = {
-        "title": title,
-        "description": description,
-        "status": status,
-        "priority": priority
-    }
-    response = requests.put(f"{API_URL}/tasks/{task_id}", headers=headers, json=json_data)
-    if response.status_code == 200:
-        st.success("Задача обновлена!")
-    else:
-        st.error("Ошибка обновления задачи: " + response.text)
+    try:
+        api.update_task(st.session_state.token, task_id, title, description, status, priority)
+    except api.ApiError as exc:
+        st.error("Ошибка обновления задачи: " + exc.detail)
+        return False
+    return True
 
 def delete_task(task_id):
-    headers = {"Authorization": f"Bearer {st.session_state.token}"}
-    response = requests.delete(f"{API_URL}/tasks/{task_id}", headers=headers)
-    if response.status_code == 200:
-        st.success("Задача удалена!")
-    else:
-        st.error("Ошибка удаления задачи: " + response.text)
+    try:
+        api.delete_task(st.session_state.token, task_id)
+    except api.ApiError as exc:
+        st.error("Ошибка удаления задачи: " + exc.detail)
+        return False
+    return True
 
 def get_top_tasks(n=5, priority=None, all_priorities=False):
     """
@@ -96,24 +100,33 @@ def get_top_tasks(n=5, priority=None, all_priorities=False):
     - priority (если нужен конкретный приоритет)
     - all_priorities (если True, выводим все приоритеты в порядке возрастания)
     """
-    headers = {"Authorization": f"Bearer {st.session_state.token}"}
-    params = {"n": n}
-
-    if all_priorities:
-        # Если галочка "Все приоритеты" включена
-        params["all_priorities"] = "true"
-    elif priority is not None:
-        # Если приоритет выбран
-        params["priority"] = priority
-
-    # Важно: в серверном коде маршрут /tasks/top/ (со слэшем в конце)
-    response = requests.get(f"{API_URL}/tasks/top/", headers=headers, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error("Ошибка получения ТОП задач: " + response.text)
+    try:
+        return api.get_top_tasks(st.session_state.token, n, priority, all_priorities)
+    except api.ApiError as exc:
+        st.error("Ошибка получения ТОП задач: " + exc.detail)
         return []
 
+# -----------------------------
+# Постраничный список задач
+# -----------------------------
+def reset_pages():
+    st.session_state.task_cursors = [None]
+    st.session_state.task_table += 1
+
+def next_page(cursor):
+    st.session_state.task_cursors.append(cursor)
+    st.session_state.task_table += 1
+
+def previous_page():
+    st.session_state.task_cursors.pop()
+    st.session_state.task_table += 1
+
+def show_notice(message):
+    """Сообщение переживает st.rerun и показывается над таблицей."""
+    st.session_state.notice = message
+    st.session_state.task_table += 1
+    st.rerun()
+
 # -----------------------------
 # Боковое меню (кнопки)
 # -----------------------------
@@ -162,48 +175,83 @@ elif st.session_state.menu == "Задачи":
     if st.session_state.token is None:
         st.warning("Сначала необходимо выполнить вход!")
     else:
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         with col1:
             sort_by = st.selectbox("Сортировать по", ["", "title", "status", "created_at", "priority"])
         with col2:
             order = st.selectbox("Порядок", ["asc", "desc"])
+        with col3:
+            page_size = st.selectbox("Задач на странице", PAGE_SIZES, index=1)
         search = st.text_input("Поиск по тексту")
 
-        tasks = get_tasks(
+        view = (sort_by, order, search, page_size)
+        if st.session_state.task_view != view:
+            st.session_state.task_view = view
+            reset_pages()
+        cursors = st.session_state.task_cursors
+
+        tasks, next_cursor, stats = get_tasks_and_stats(
             sort_by if sort_by != "" else None,
             order,
-            search if search != "" else None
+            search if search != "" else None,
+            page_size,
+            cursors[-1]
         )
+        if stats:
+            columns = st.columns(1 + len(stats["by_status"]))
+            columns[0].metric("Всего", stats["total"])
+            for column, (status_name, count) in zip(columns[1:], stats["by_status"].items()):
+                column.metric(status_name.capitalize(), count)
+
+        notice = st.session_state.pop("notice", None)
+        if notice:
+            st.success(notice)
+
+        # Таблица рисует только текущую страницу: стоимость перерисовки не зависит от числа задач
+        selected = []
         if tasks:
-            for task in tasks:
-                st.write("Заголовок:", task["title"])
-                st.write("Описание:", task["description"])
-                st.write("Статус:", task["status"])
-                st.write("Приоритет:", task["priority"])
-                st.write("Создана:", task["created_at"])
-
-                col_del, col_upd = st.columns([1, 2])
-                with col_del:
-                    if st.button("Удалить", key=f"delete_{task['id']}"):
-                        delete_task(task["id"])
-                        st.info("Обновите страницу или нажмите «Задачи» заново, чтобы увидеть изменения.")
-                with col_upd:
-                    with st.expander("Редактировать"):
-                        with st.form(f"update_form_{task['id']}"):
-                            new_title = st.text_input("Заголовок", value=task["title"])
-                            new_description = st.text_area("Описание", value=task["description"])
-                            possible_statuses = ["в ожидании", "в работе", "завершено"]
-                            status_index = possible_statuses.index(task["status"]) if task["status"] in possible_statuses else 0
-                            new_status = st.selectbox("Статус", possible_statuses, index=status_index)
-                            new_priority = st.number_input("Приоритет", value=task["priority"], step=1)
-                            submitted_update = st.form_submit_button("Обновить")
-                        if submitted_update:
-                            update_task(task["id"], new_title, new_description, new_status, new_priority)
-                            st.info("Обновите страницу или нажмите «Задачи» заново, чтобы увидеть изменения.")
-                st.write("---")
+            event = st.dataframe(
+                tasks,
+                column_config=TABLE_COLUMNS,
+                column_order=list(TABLE_COLUMNS),
+                hide_index=True,
+                on_select="rerun",
+                selection_mode="single-row",
+                key=f"tasks_table_{st.session_state.task_table}",
+            )
+            selected = [row for row in event.selection.rows if row < len(tasks)]
         else:
             st.info("Задачи не найдены.")
 
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button("← Назад", on_click=previous_page, disabled=len(cursors) == 1)
+        with col_page:
+            page_label = f"Страница {len(cursors)}"
+            if stats and not search:
+                page_label += f" из {max(1, math.ceil(stats['total'] / page_size))}"
+            st.caption(page_label)
+        with col_next:
+            st.button("Вперёд →", on_click=next_page, args=(next_cursor,), disabled=not next_cursor)
+
+        if not selected:
+            st.caption("Выберите задачу в таблице, чтобы отредактировать или удалить её.")
+        else:
+            task = get_task(tasks[selected[0]]["id"])
+            if task:
+                st.subheader(f"Задача #{task['id']}")
+                with st.form(f"update_form_{task['id']}"):
+                    new_title = st.text_input("Заголовок", value=task["title"])
+                    new_description = st.text_area("Описание", value=task["description"])
+                    status_index = TASK_STATUSES.index(task["status"]) if task["status"] in TASK_STATUSES else 0
+                    new_status = st.selectbox("Статус", TASK_STATUSES, index=status_index)
+                    new_priority = st.number_input("Приоритет", value=task["priority"], step=1)
+                    submitted_update = st.form_submit_button("Обновить")
+                if submitted_update and update_task(task["id"], new_title, new_description, new_status, new_priority):
+                    show_notice("Задача обновлена!")
+                if st.button("Удалить", key=f"delete_{task['id']}") and delete_task(task["id"]):
+                    show_notice("Задача удалена!")
+
 elif st.session_state.menu == "Создать задачу":
     st.header("Создать новую задачу")
     if st.session_state.token is None:
@@ -212,7 +260,7 @@ elif st.session_state.menu == "Создать задачу":
         with st.form("create_task_form"):
             title = st.text_input("Заголовок")
             description = st.text_area("Описание")
-            status = st.selectbox("Статус", ["в ожидании", "в работе", "завершено"])
+            status = st.selectbox("Статус", TASK_STATUSES)
             priority = st.number_input("Приоритет", min_value=0, step=1)
             submitted = st.form_submit_button("Создать задачу")
             if submitted:
@@ -235,12 +283,8 @@ elif st.session_state.menu == "TopTasks":
             tasks = get_top_tasks(n=n_value, priority=selected_prio, all_priorities=all_prio)
             if tasks:
                 st.write(f"Показаны задачи (n={n_value}). Приоритет: {'все' if all_prio else selected_prio}")
-                for task in tasks:
-                    st.write("Заголовок:", task["title"])
-                    st.write("Описание:", task["description"])
-                    st.write("Статус:", task["status"])
-                    st.write("Приоритет:", task["priority"])
-                    st.write("Создана:", task["created_at"])
-                    st.write("---")
+                st.dataframe(tasks, column_config={**TABLE_COLUMNS, "description": "Описание"},
+                             column_order=["title", "description", "status", "priority", "created_at"],
+                             hide_index=True)
             else:
                 st.info("Нет задач для отображения или произошла ошибка.")
@@ -0,0 +1,78 @@
+from backend import main
+
+
+async def _auth(aclient, username="etag_user"):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def test_not_modified_until_write(aclient):
+    headers = await _auth(aclient)
+    task = (await aclient.post("/tasks", json={"title": "a", "description": "b"}, headers=headers)).json()
+
+    for path in ("/tasks", f"/tasks/{task['id']}", "/tasks/top/"):
+        first = await aclient.get(path, headers=headers)
+        etag = first.headers["etag"]
+        again = await aclient.get(path, headers={**headers, "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["etag"] == etag
+
+    await aclient.put(
+        f"/tasks/{task['id']}",
+        json={"title": "new", "description": "b", "status": "в ожидании", "priority": 0},
+        headers=headers,
+    )
+    changed = await aclient.get("/tasks", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()[0]["title"] == "new"
+    assert changed.headers["etag"] != etag
+
+
+async def test_not_modified_skips_database(aclient, monkeypatch):
+    headers = await _auth(aclient, "etag_user2")
+    etag = (await aclient.get("/tasks", headers=headers)).headers["etag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("запрос к задачам не должен выполняться")
+
+    monkeypatch.setattr(main, "tasks_statement", fail)
+    r = await aclient.get("/tasks", headers={**headers, "If-None-Match": f'"other", {etag}'})
+    assert r.status_code == 304
+
+
+async def test_etag_is_per_owner(aclient):
+    first = await _auth(aclient, "etag_owner1")
+    second = await _auth(aclient, "etag_owner2")
+    etag = (await aclient.get("/tasks", headers=first)).headers["etag"]
+    r = await aclient.get("/tasks", headers={**second, "If-None-Match": etag})
+    assert r.status_code == 200
+
+
+async def test_missing_task_is_not_found_despite_validator(aclient):
+    headers = await _auth(aclient, "etag_missing")
+    task = (await aclient.post("/tasks", json={"title": "a", "description": "b"}, headers=headers)).json()
+    await aclient.delete(f"/tasks/{task['id']}", headers=headers)
+    etag = (await aclient.get("/tasks", headers=headers)).headers["etag"]  # актуальная версия владельца
+
+    for validator in ("*", etag):
+        r = await aclient.get(f"/tasks/{task['id']}", headers={**headers, "If-None-Match": validator})
+        assert r.status_code == 404
+        r = await aclient.get("/tasks/999999999", headers={**headers, "If-None-Match": validator})
+        assert r.status_code == 404
+
+
+def test_etag_matches():
+    assert main.etag_matches('W/"1-2-3"', 'W/"1-2-3"')
+    assert main.etag_matches('"1-2-3"', 'W/"1-2-3"')
+    assert main.etag_matches('"x", W/"1-2-3"', 'W/"1-2-3"')
+    assert main.etag_matches("*", 'W/"1-2-3"')
+    assert not main.etag_matches(None, 'W/"1-2-3"')
+    assert not main.etag_matches('W/"1-2-4"', 'W/"1-2-3"')
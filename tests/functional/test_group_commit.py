@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from backend import main
+
+
+async def _auth(aclient, username):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture()
+def group_commit(monkeypatch):
+    monkeypatch.setattr(main, "GROUP_COMMIT", True)
+    # широкое окно: параллельные запросы теста гарантированно попадают в общую пачку
+    monkeypatch.setattr(main.group_commit, "window", 0.05)
+    yield main.group_commit
+    main.group_commit.stop()
+
+
+async def test_concurrent_creates_share_transactions(aclient, group_commit):
+    headers = await _auth(aclient, "group_user")
+    before = group_commit.stats()
+
+    responses = await asyncio.gather(*[
+        aclient.post("/tasks", json={"title": f"g{i}", "description": f"d{i}", "priority": i % 4}, headers=headers)
+        for i in range(20)
+    ])
+
+    assert all(r.status_code == 200 for r in responses)
+    created = [r.json() for r in responses]
+    # каждый запрос получил свою строку
+    assert [task["title"] for task in created] == [f"g{i}" for i in range(20)]
+    assert [task["priority"] for task in created] == [i % 4 for i in range(20)]
+    assert len({task["id"] for task in created}) == 20
+    assert all(task["status"] == "в ожидании" and task["created_at"] for task in created)
+
+    after = group_commit.stats()
+    assert after["rows"] - before["rows"] == 20
+    assert after["batches"] - before["batches"] < 20
+
+    listed = (await aclient.get("/tasks", headers=headers)).json()
+    assert sorted(task["id"] for task in listed) == sorted(task["id"] for task in created)
+    assert (await aclient.get("/tasks/stats", headers=headers)).json()["total"] == 20
+    top = (await aclient.get("/tasks/top/", params={"n": 3, "all_priorities": "true"}, headers=headers)).json()
+    assert [task["priority"] for task in top] == [0, 0, 0]
+
+
+async def test_metrics_report_batches(aclient, group_commit):
+    headers = await _auth(aclient, "group_metrics")
+    await aclient.post("/tasks", json={"title": "m", "description": "d"}, headers=headers)
+
+    metrics = (await aclient.get("/metrics/group-commit")).json()
+    assert metrics["enabled"] is True and metrics["max_rows"] == main.GROUP_COMMIT_MAX_ROWS
+    assert metrics["rows"] >= 1 and metrics["largest_batch"] >= 1
+    assert "benetasks_group_commit_rows_total" in (await aclient.get("/metrics")).text
@@ -0,0 +1,149 @@
+import base64
+import json
+
+import pytest
+from sqlalchemy import text
+
+from tests.conftest import engine
+
+
+async def _auth(aclient, username):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _walk(aclient, headers, url, params):
+    """Проходит все страницы и возвращает задачи в порядке выдачи."""
+    pages, cursor = [], None
+    while True:
+        query = dict(params)
+        if cursor:
+            query["cursor"] = cursor
+        r = await aclient.get(url, params=query, headers=headers)
+        assert r.status_code == 200
+        pages.append(r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+@pytest.mark.parametrize("sort_by", [None, "title", "status", "created_at", "priority"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+async def test_keyset_pages_cover_full_list(aclient, sort_by, order):
+    headers = await _auth(aclient, "pager")
+    existing = (await aclient.get("/tasks", headers=headers)).json()
+    if not existing:
+        # одинаковые заголовки/приоритеты проверяют добор по id
+        for i in range(7):
+            await aclient.post(
+                "/tasks",
+                json={"title": f"t{i % 3}", "description": "x", "priority": i % 2},
+                headers=headers,
+            )
+
+    params = {"limit": 3, "order": order}
+    if sort_by:
+        params["sort_by"] = sort_by
+    pages = await _walk(aclient, headers, "/tasks", params)
+
+    assert [len(p) for p in pages] == [3, 3, 1]
+    ids = [t["id"] for page in pages for t in page]
+    assert len(ids) == len(set(ids)) == 7
+
+    key = sort_by or "id"
+    flat = [t for page in pages for t in page]
+    # без sort_by порядок order не учитывается — выдача по id
+    expected = sorted(flat, key=lambda t: (t[key], t["id"]), reverse=bool(sort_by) and order == "desc")
+    assert flat == expected
+
+
+async def test_top_tasks_cursor_continues_order(aclient):
+    headers = await _auth(aclient, "toppager")
+    for pr in (1, 3, 3, 5, 2):
+        await aclient.post(
+            "/tasks", json={"title": f"p{pr}", "description": "x", "priority": pr}, headers=headers
+        )
+
+    pages = await _walk(aclient, headers, "/tasks/top/", {"n": 2})
+    assert [t["priority"] for page in pages for t in page] == [5, 3, 3, 2, 1]
+
+
+async def test_cursor_rejected_for_other_ordering(aclient):
+    headers = await _auth(aclient, "pager")
+    r = await aclient.get("/tasks", params={"limit": 1, "sort_by": "title"}, headers=headers)
+    cursor = r.headers["X-Next-Cursor"]
+
+    r_bad = await aclient.get(
+        "/tasks", params={"limit": 1, "sort_by": "priority", "cursor": cursor}, headers=headers
+    )
+    assert r_bad.status_code == 400
+    assert r_bad.json()["detail"] == "Неверный курсор"
+
+    r_garbage = await aclient.get("/tasks", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert r_garbage.status_code == 400
+
+
+async def _create_with_nulls(aclient, headers, column):
+    """Пять задач, у двух из которых column выставлен в NULL в обход API."""
+    ids = []
+    for i in range(5):
+        r = await aclient.post(
+            "/tasks", json={"title": f"n{i}", "description": "x", "priority": i}, headers=headers
+        )
+        ids.append(r.json()["id"])
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE tasks SET {column} = NULL WHERE id IN (:a, :b)"), {"a": ids[1], "b": ids[3]})
+    return ids
+
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+async def test_null_sort_values_kept_on_later_pages(aclient, order):
+    headers = await _auth(aclient, f"null_pager_{order}")
+    ids = await _create_with_nulls(aclient, headers, "title")
+
+    pages = await _walk(aclient, headers, "/tasks", {"limit": 2, "sort_by": "title", "order": order})
+    titles = [t["title"] for page in pages for t in page]
+    assert sorted(t["id"] for page in pages for t in page) == sorted(ids)
+    # NULL больше любого значения: в конце при asc и в начале при desc
+    if order == "asc":
+        assert titles == ["n0", "n2", "n4", None, None]
+    else:
+        assert titles == [None, None, "n4", "n2", "n0"]
+
+
+async def test_null_priority_kept_in_top_pages(aclient):
+    headers = await _auth(aclient, "null_top")
+    await _create_with_nulls(aclient, headers, "priority")
+
+    pages = await _walk(aclient, headers, "/tasks/top/", {"n": 2})
+    assert [t["priority"] for page in pages for t in page] == [None, None, 4, 2, 0]
+    pages = await _walk(aclient, headers, "/tasks/top/", {"n": 2, "all_priorities": "true"})
+    assert [t["priority"] for page in pages for t in page] == [0, 2, 4, None, None]
+
+
+@pytest.mark.parametrize("url, scope, values", [
+    ("/tasks", "tasks", ["abc"]),
+    ("/tasks", "tasks", [True]),
+    ("/tasks", "tasks", [None]),
+    ("/tasks", "tasks:title:asc", [1, 2]),
+    ("/tasks", "tasks", "1"),
+    ("/tasks/top/", "top", [3, "not-a-date", 1]),
+    ("/tasks/top/", "top", ["3", "2024-01-01T00:00:00", 1]),
+])
+async def test_forged_cursor_values_rejected(aclient, url, scope, values):
+    headers = await _auth(aclient, "forger")
+    payload = json.dumps({"s": scope, "v": values}).encode()
+    cursor = base64.urlsafe_b64encode(payload).decode().rstrip("=")
+    params = {"cursor": cursor, "limit": 2}
+    if scope.startswith("tasks:"):
+        params.update(sort_by="title", order="asc")
+    r = await aclient.get(url, params=params, headers=headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Неверный курсор"
@@ -0,0 +1,82 @@
+from sqlalchemy import text
+
+from backend import main
+from tests.conftest import engine
+
+
+async def _auth(aclient, username):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _stats(aclient, headers):
+    r = await aclient.get("/tasks/stats", headers=headers)
+    assert r.status_code == 200
+    return r.json()
+
+
+async def _recount(aclient, headers):
+    tasks = (await aclient.get("/tasks", headers=headers)).json()
+    by_status = dict.fromkeys(main.TASK_STATUSES, 0)
+    by_priority = {}
+    for task in tasks:
+        by_status[task["status"]] = by_status.get(task["status"], 0) + 1
+        by_priority[str(task["priority"])] = by_priority.get(str(task["priority"]), 0) + 1
+    return {"total": len(tasks), "by_status": by_status, "by_priority": dict(sorted(by_priority.items()))}
+
+
+async def test_stats_follow_every_write_path(aclient):
+    headers = await _auth(aclient, "stats_user")
+    assert await _stats(aclient, headers) == {
+        "total": 0, "by_status": {"в ожидании": 0, "в работе": 0, "завершено": 0}, "by_priority": {},
+    }
+
+    ids = [(await aclient.post("/tasks", json={"title": f"s{i}", "description": "d", "priority": i % 3},
+                               headers=headers)).json()["id"] for i in range(5)]
+    await aclient.put(f"/tasks/{ids[0]}", json={"title": "s0", "description": "d", "status": "в работе",
+                                                "priority": 5}, headers=headers)
+    await aclient.delete(f"/tasks/{ids[1]}", headers=headers)
+    await aclient.post("/tasks/bulk", json=[{"title": "b", "description": "d", "status": "завершено"}] * 3,
+                       headers=headers)
+    await aclient.patch("/tasks/bulk", json=[{"id": ids[2], "status": "завершено"}], headers=headers)
+    await aclient.request("DELETE", "/tasks/bulk", json={"ids": [ids[3]]}, headers=headers)
+    await aclient.post("/tasks/import?format=ndjson", content='{"title": "i", "description": "d", "priority": 4}\n',
+                       headers=headers)
+
+    stats = await _stats(aclient, headers)
+    assert stats == await _recount(aclient, headers)
+    assert stats["total"] == 7
+    assert stats["by_status"]["завершено"] == 4
+
+
+async def test_stats_are_per_user_and_support_etag(aclient):
+    mine = await _auth(aclient, "stats_mine")
+    other = await _auth(aclient, "stats_other")
+    await aclient.post("/tasks", json={"title": "x", "description": "d"}, headers=other)
+
+    first = await aclient.get("/tasks/stats", headers=mine)
+    assert first.json()["total"] == 0
+    again = await aclient.get("/tasks/stats", headers={**mine, "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+
+async def test_reconcile_repairs_counters(aclient):
+    headers = await _auth(aclient, "stats_reconcile")
+    for i in range(3):
+        await aclient.post("/tasks", json={"title": f"r{i}", "description": "d", "priority": 1}, headers=headers)
+    with engine.begin() as conn:
+        owner_id = conn.execute(text("SELECT id FROM users WHERE username = 'stats_reconcile'")).scalar()
+        conn.execute(text("UPDATE task_counters SET count = 42 WHERE owner_id = :o"), {"o": owner_id})
+    assert (await _stats(aclient, headers))["total"] == 42
+
+    with engine.begin() as conn:
+        main.reconcile_task_counters(conn, owner_id)
+
+    assert await _stats(aclient, headers) == await _recount(aclient, headers)
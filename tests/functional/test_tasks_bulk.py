@@ -0,0 +1,107 @@
+async def _auth(aclient, username="bulker"):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def test_bulk_create_reports_invalid_items(aclient):
+    headers = await _auth(aclient)
+    r = await aclient.post(
+        "/tasks/bulk",
+        json=[
+            {"title": "a", "description": "1", "priority": 1},
+            {"description": "нет заголовка"},
+            {"title": "c", "description": "3", "status": "в работе"},
+        ],
+        headers=headers,
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert [t["title"] for t in body["tasks"]] == ["a", "c"]
+    assert body["tasks"][1]["status"] == "в работе"
+    assert body["tasks"][1]["priority"] == 0
+    assert [e["index"] for e in body["errors"]] == [1]
+    assert body["errors"][0]["detail"][0]["loc"] == ["title"]
+
+
+async def test_bulk_update_delete_and_multi_get(aclient):
+    headers = await _auth(aclient, "bulker2")
+    other = await _auth(aclient, "bulker_other")
+    created = (
+        await aclient.post(
+            "/tasks/bulk",
+            json=[{"title": f"t{i}", "description": "x", "priority": i} for i in range(3)],
+            headers=headers,
+        )
+    ).json()["tasks"]
+    ids = [t["id"] for t in created]
+    foreign = (
+        await aclient.post("/tasks", json={"title": "чужая", "description": "x"}, headers=other)
+    ).json()["id"]
+
+    # заполняем кэш — пакетное обновление должно его сбросить
+    await aclient.get("/tasks", headers=headers)
+
+    r = await aclient.patch(
+        "/tasks/bulk",
+        json=[
+            {"id": ids[0], "title": "renamed"},
+            {"id": ids[1], "priority": 9, "status": "завершено"},
+            {"id": foreign, "title": "взлом"},
+            {"title": "без id"},
+        ],
+        headers=headers,
+    )
+    body = r.json()
+    by_id = {t["id"]: t for t in body["tasks"]}
+    assert by_id[ids[0]]["title"] == "renamed"
+    assert by_id[ids[0]]["priority"] == 0  # неуказанные поля не трогаем
+    assert by_id[ids[1]]["priority"] == 9
+    assert [(e["index"], e["id"]) for e in body["errors"]] == [(2, foreign), (3, None)]
+    listed = {t["id"]: t for t in (await aclient.get("/tasks", headers=headers)).json()}
+    assert listed[ids[0]]["title"] == "renamed"
+
+    r = await aclient.get("/tasks/bulk", params=[("ids", ids[2]), ("ids", ids[0]), ("ids", foreign)], headers=headers)
+    body = r.json()
+    assert [t["id"] for t in body["tasks"]] == [ids[2], ids[0]]
+    assert [e["id"] for e in body["errors"]] == [foreign]
+
+    r = await aclient.request("DELETE", "/tasks/bulk", json={"ids": ids + [foreign]}, headers=headers)
+    body = r.json()
+    assert body["deleted"] == sorted(ids)
+    assert [e["id"] for e in body["errors"]] == [foreign]
+    assert (await aclient.get("/tasks", headers=headers)).json() == []
+    assert (await aclient.get(f"/tasks/{foreign}", headers=other)).status_code == 200
+
+
+async def test_bulk_size_limit(aclient, monkeypatch):
+    from backend import main
+
+    headers = await _auth(aclient, "bulker3")
+    monkeypatch.setattr(main, "BULK_MAX_ITEMS", 2)
+    r = await aclient.post(
+        "/tasks/bulk", json=[{"title": "x", "description": "y"}] * 3, headers=headers
+    )
+    assert r.status_code == 413
+
+
+async def test_bulk_update_rejects_explicit_nulls(aclient):
+    headers = await _auth(aclient, "bulker4")
+    task = (await aclient.post("/tasks", json={"title": "keep", "description": "x"}, headers=headers)).json()
+
+    r = await aclient.patch(
+        "/tasks/bulk", json=[{"id": task["id"], "title": None, "priority": 3}], headers=headers
+    )
+    assert r.status_code == 200
+    body = r.json()
+    assert [(e["index"], e["id"]) for e in body["errors"]] == [(0, task["id"])]
+    assert body["errors"][0]["detail"][0]["loc"] == ["title"]
+    assert body["tasks"] == []  # отклонённая задача не выдаётся за обновлённую
+    unchanged = (await aclient.get(f"/tasks/{task['id']}", headers=headers)).json()
+    assert (unchanged["title"], unchanged["priority"]) == ("keep", 0)
@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+
+from backend import main
+from tests.conftest import engine
+
+
+async def _auth(aclient, username="exporter"):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def test_export_ndjson_and_csv(aclient):
+    headers = await _auth(aclient)
+    await aclient.post(
+        "/tasks/bulk",
+        json=[
+            {"title": "первая", "description": 'с "кавычками", и запятой', "priority": 2},
+            {"title": "second", "description": "строка\nперенос", "priority": 1},
+        ],
+        headers=headers,
+    )
+    listed = (await aclient.get("/tasks", headers=headers)).json()
+
+    r = await aclient.get("/tasks/export", params={"format": "ndjson"}, headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert rows == listed  # те же поля и значения, что и в GET /tasks
+
+    r = await aclient.get("/tasks/export", params={"format": "csv"}, headers=headers)
+    assert r.headers["content-disposition"] == 'attachment; filename="tasks.csv"'
+    reader = list(csv.DictReader(io.StringIO(r.text)))
+    assert [row["description"] for row in reader] == [t["description"] for t in listed]
+    assert [int(row["priority"]) for row in reader] == [2, 1]
+
+
+async def test_export_rejects_unknown_format(aclient):
+    headers = await _auth(aclient, "exporter2")
+    r = await aclient.get("/tasks/export", params={"format": "xml"}, headers=headers)
+    assert r.status_code == 400
+
+
+async def test_export_streams_in_batches(aclient, monkeypatch):
+    headers = await _auth(aclient, "exporter3")
+    await aclient.post(
+        "/tasks/bulk", json=[{"title": f"t{i}", "description": "x"} for i in range(5)], headers=headers
+    )
+    monkeypatch.setattr(main, "EXPORT_BATCH_SIZE", 2)
+
+    with engine.connect() as conn:
+        owner_id = conn.exec_driver_sql("SELECT id FROM users WHERE username = 'exporter3'").scalar()
+    batches = list(main.export_batches(engine, owner_id))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
@@ -0,0 +1,107 @@
+import json
+
+from backend import main
+
+
+async def _auth(aclient, username="importer"):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def test_import_csv_roundtrip_with_export(aclient):
+    source = await _auth(aclient, "importer_src")
+    await aclient.post(
+        "/tasks/bulk",
+        json=[
+            {"title": "первая", "description": 'с "кавычками", и запятой', "priority": 2},
+            {"title": "second", "description": "строка\nперенос", "status": "done"},
+        ],
+        headers=source,
+    )
+    exported = await aclient.get("/tasks/export", params={"format": "csv"}, headers=source)
+
+    headers = await _auth(aclient)
+    r = await aclient.post("/tasks/import", content=exported.content, headers=headers)
+    assert r.status_code == 200
+    assert r.json() == {"imported": 2, "failed": 0, "errors": []}
+
+    tasks = (await aclient.get("/tasks", headers=headers)).json()
+    assert [(t["title"], t["description"], t["status"], t["priority"]) for t in tasks] == [
+        ("первая", 'с "кавычками", и запятой', "в ожидании", 2),
+        ("second", "строка\nперенос", "done", 0),
+    ]
+
+
+async def test_import_ndjson_reports_bad_rows(aclient):
+    headers = await _auth(aclient, "importer2")
+    await aclient.get("/tasks", headers=headers)  # прогреваем кэш
+    body = "\n".join([
+        json.dumps({"title": "ok", "description": "d"}),
+        "{broken",
+        "",
+        json.dumps({"description": "без заголовка"}),
+        json.dumps({"title": "ok2", "description": "d", "priority": 3}),
+    ])
+    r = await aclient.post("/tasks/import", params={"format": "ndjson"}, content=body, headers=headers)
+    result = r.json()
+    assert (result["imported"], result["failed"]) == (2, 2)
+    assert [error["line"] for error in result["errors"]] == [2, 4]
+
+    tasks = (await aclient.get("/tasks", headers=headers)).json()
+    assert [t["title"] for t in tasks] == ["ok", "ok2"]
+
+
+async def test_import_writes_in_chunks(aclient, monkeypatch):
+    headers = await _auth(aclient, "importer3")
+    monkeypatch.setattr(main, "IMPORT_CHUNK_SIZE", 2)
+    body = "title,description\n" + "".join(f"t{i},d\n" for i in range(5))
+    r = await aclient.post("/tasks/import", content=body, headers=headers)
+    assert r.json()["imported"] == 5
+    assert len((await aclient.get("/tasks", headers=headers)).json()) == 5
+
+
+async def test_large_import_keeps_search_and_stats_consistent(aclient, monkeypatch):
+    headers = await _auth(aclient, "importer_large")
+    await aclient.post("/tasks", json={"title": "до импорта", "description": "d"}, headers=headers)
+    monkeypatch.setattr(main, "IMPORT_CHUNK_SIZE", 2)
+    body = "title,description,status\n" + "".join(f"строка{i},описание{i},в работе\n" for i in range(7))
+    r = await aclient.post("/tasks/import", content=body, headers=headers)
+    assert r.json()["imported"] == 7
+
+    # строки из всех пачек найдены поиском и учтены в счётчиках
+    found = (await aclient.get("/tasks", params={"search": "описание6"}, headers=headers)).json()
+    assert [t["title"] for t in found] == ["строка6"]
+    stats = (await aclient.get("/tasks/stats", headers=headers)).json()
+    assert stats["total"] == 8 and stats["by_status"]["в работе"] == 7
+
+    task = (await aclient.post("/tasks", json={"title": "после", "description": "новинка"}, headers=headers)).json()
+    found_new = (await aclient.get("/tasks", params={"search": "новинка"}, headers=headers)).json()
+    assert [t["id"] for t in found_new] == [task["id"]]
+    await aclient.delete(f"/tasks/{found[0]['id']}", headers=headers)
+    stats = (await aclient.get("/tasks/stats", headers=headers)).json()
+    assert stats["total"] == 8 and stats["by_status"]["в работе"] == 6
+
+
+async def test_import_rejects_unknown_format(aclient):
+    headers = await _auth(aclient, "importer4")
+    r = await aclient.post("/tasks/import", params={"format": "xml"}, content="", headers=headers)
+    assert r.status_code == 400
+
+
+def test_request_body_reader_joins_split_chunks():
+    # многобайтовый символ и кавычки с переносом разрезаны между кусками
+    data = 'title,description\n"a","x\ny"\nб,z\n'.encode()
+    chunks = [data[i:i + 3] for i in range(0, len(data), 3)] + [None]
+    raw = main.RequestBodyReader(lambda: chunks.pop(0))
+    stream = main.io.TextIOWrapper(main.io.BufferedReader(raw), encoding="utf-8-sig", newline="")
+    assert [record for _, record in main.csv_records(stream)] == [
+        {"title": "a", "description": "x\ny"},
+        {"title": "б", "description": "z"},
+    ]
@@ -0,0 +1,99 @@
+from sqlalchemy import event
+
+from backend import main
+from tests.conftest import engine
+
+BRANCHES = [{"n": 3}, {"n": 2, "priority": 2}, {"n": 4, "all_priorities": "true"}, {"n": 20}]
+
+
+async def _auth(aclient, username):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _top(aclient, headers, params):
+    r = await aclient.get("/tasks/top/", params=params, headers=headers)
+    assert r.status_code == 200
+    return r.json(), r.headers.get("x-next-cursor")
+
+
+async def _from_sql(aclient, headers, monkeypatch, params):
+    with monkeypatch.context() as patch:
+        patch.setattr(main.top_index, "depth", 0)
+        return await _top(aclient, headers, params)
+
+
+async def test_top_branches_served_from_memory_after_first_load(aclient):
+    headers = await _auth(aclient, "top_memory")
+    for i in range(8):
+        await aclient.post("/tasks", json={"title": f"m{i}", "description": "d", "priority": i % 4}, headers=headers)
+    first = [await _top(aclient, headers, params) for params in BRANCHES]
+
+    statements = []
+
+    def remember(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", remember)
+    try:
+        again = [await _top(aclient, headers, params) for params in BRANCHES]
+    finally:
+        event.remove(engine, "before_cursor_execute", remember)
+
+    assert again == first
+    assert not [s for s in statements if "FROM tasks" in s]
+
+
+async def test_writes_keep_memory_and_sql_in_agreement(aclient, monkeypatch):
+    monkeypatch.setattr(main.top_index, "depth", 4)
+    headers = await _auth(aclient, "top_writes")
+    ids = []
+    for i in range(10):
+        r = await aclient.post("/tasks", json={"title": f"w{i}", "description": "d", "priority": i % 3},
+                               headers=headers)
+        ids.append(r.json()["id"])
+    for params in BRANCHES:
+        await _top(aclient, headers, params)
+
+    # новая задача выше префикса, изменение приоритета, удаление из префикса
+    await aclient.post("/tasks", json={"title": "new", "description": "d", "priority": 5}, headers=headers)
+    await aclient.put(f"/tasks/{ids[0]}", json={"title": "moved", "description": "d", "status": "в работе",
+                                                "priority": 2}, headers=headers)
+    await aclient.delete(f"/tasks/{ids[8]}", headers=headers)
+
+    for params in BRANCHES:
+        assert await _top(aclient, headers, params) == await _from_sql(aclient, headers, monkeypatch, params)
+    assert main.top_index.stats()["hits"] > 0
+
+
+async def test_cursor_pages_match_sql(aclient, monkeypatch):
+    headers = await _auth(aclient, "top_pages")
+    for i in range(7):
+        await aclient.post("/tasks", json={"title": f"p{i}", "description": "d", "priority": i % 2}, headers=headers)
+
+    params = {"n": 2, "fields": "id,title"}
+    while True:
+        page = await _top(aclient, headers, params)
+        assert page == await _from_sql(aclient, headers, monkeypatch, params)
+        if not page[1]:
+            break
+        params["cursor"] = page[1]
+
+
+async def test_bulk_write_drops_memory_copy(aclient):
+    headers = await _auth(aclient, "top_bulk")
+    await aclient.post("/tasks", json={"title": "a", "description": "d", "priority": 1}, headers=headers)
+    before, _ = await _top(aclient, headers, {"n": 5})
+
+    await aclient.post("/tasks/bulk", json=[{"title": "b", "description": "d", "priority": 3}], headers=headers)
+
+    after, _ = await _top(aclient, headers, {"n": 5})
+    assert [t["title"] for t in before] == ["a"]
+    assert [t["title"] for t in after] == ["b", "a"]
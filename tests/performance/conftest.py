@@ -0,0 +1,86 @@
+"""
+Офлайн-бенчмарки горячих путей backend-а (pytest-benchmark) на SQLite.
+
+По умолчанию пропускаются; запуск и сравнение с сохранёнными результатами:
+    BENCHMARK=1 pytest tests/performance --no-cov --benchmark-storage=tests/performance/baselines --benchmark-autosave
+    BENCHMARK=1 pytest tests/performance --no-cov --benchmark-storage=tests/performance/baselines \
+        --benchmark-compare --benchmark-compare-fail=mean:15%
+
+BENCH_SIZES — размеры наборов через запятую (по умолчанию 1000; например 1000,100000,1000000).
+Наборы (один пользователь bench0) строит datagen — детерминированно, с тем же распределением полей,
+что и у нагрузочного теста, — и кэширует в BENCH_DATA_DIR (по умолчанию tests/performance/.data).
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from backend import main
+from tests.performance.datagen import DatasetSpec, generate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BENCH_ENABLED = os.getenv("BENCHMARK") == "1"
+BENCH_SIZES = [int(size) for size in os.getenv("BENCH_SIZES", "1000").split(",")]
+BENCH_DATA_DIR = os.getenv("BENCH_DATA_DIR", os.path.join(HERE, ".data"))
+BENCH_USERNAME_PREFIX = "bench"
+BENCH_USERNAME = f"{BENCH_USERNAME_PREFIX}0"
+
+
+def pytest_collection_modifyitems(config, items):
+    if BENCH_ENABLED:
+        return
+    skip = pytest.mark.skip(reason="бенчмарки запускаются с BENCHMARK=1")
+    for item in items:
+        if str(item.path).startswith(HERE):
+            item.add_marker(skip)
+
+
+class Dataset:
+    def __init__(self, bind, owner_id: int, size: int):
+        self.bind = bind
+        self.size = size
+        self.user = main.User(id=owner_id, username=BENCH_USERNAME)
+        self.session = sessionmaker(bind=bind, autoflush=False)
+
+
+def open_dataset(size: int) -> Dataset:
+    os.makedirs(BENCH_DATA_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DATA_DIR, f"tasks-{size}.db")
+    database_url = f"sqlite:///{path}"
+    owner_id, count = _cached_dataset(database_url)
+    if owner_id is None or count != size:
+        for stale in (path, f"{path}-wal", f"{path}-shm"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        generate(database_url, DatasetSpec(users=1, tasks=size, seed=size, username_prefix=BENCH_USERNAME_PREFIX))
+        owner_id, count = _cached_dataset(database_url)
+    bind = create_engine(database_url, connect_args={"check_same_thread": False})
+    return Dataset(bind, owner_id, size)
+
+
+def _cached_dataset(database_url: str):
+    """(id пользователя bench0, число задач) готового набора или (None, None)."""
+    bind = create_engine(database_url)
+    try:
+        with bind.connect() as conn:
+            owner_id = conn.execute(select(main.User.id).where(main.User.username == BENCH_USERNAME)).scalar()
+            count = conn.execute(select(func.count(main.Task.id))).scalar()
+        return owner_id, count
+    except Exception:
+        return None, None
+    finally:
+        bind.dispose()
+
+
+@pytest.fixture(scope="session", params=BENCH_SIZES, ids=lambda size: f"n={size}")
+def dataset(request):
+    data = open_dataset(request.param)
+    yield data
+    data.bind.dispose()
+
+
+@pytest.fixture
+def no_task_cache(monkeypatch):
+    """Каждый вызов GET /tasks идёт в БД: кэш всегда промахивается."""
+    monkeypatch.setattr(main.task_cache, "get", lambda key: None)
@@ -0,0 +1,261 @@
+"""
+Генератор синтетических наборов задач для нагрузочных тестов и бенчмарков.
+
+Данные детерминированы: одинаковые параметры и --seed дают те же строки при любом --jobs.
+Каждая пачка задач генерируется от своего зерна (seed, номер пачки), поэтому пачки
+грузятся параллельно отдельными процессами: на PostgreSQL — через COPY FROM STDIN,
+на SQLite — executemany. Построчные триггеры (счётчики task_counters, на SQLite ещё и FTS-индекс
+поиска) на время загрузки снимаются, а в конце индекс и счётчики строятся одним проходом.
+
+Запуск из корня репозитория:
+    python -m tests.performance.datagen --database-url sqlite:///./big.db --users 1000 --tasks 1000000
+    python -m tests.performance.datagen --database-url postgresql+psycopg2://u:p@localhost/benetasks \
+        --users 10000 --tasks 10000000 --jobs 8 --status-weights "в ожидании=5,в работе=3,завершено=2"
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(os.path.dirname(HERE))
+
+WORDS = ["отчёт", "релиз", "встреча", "ревью", "деплой", "бэкап", "счёт", "план", "созвон", "миграция",
+         "invoice", "report", "meeting", "budget", "review", "deploy", "backup", "roadmap", "hotfix", "sprint"]
+
+
+class DatasetSpec:
+    """Параметры набора: сколько пользователей и задач и как распределены их поля."""
+
+    def __init__(self, users=100, tasks=10000, seed=1, username_prefix="load_user_", password="loadtest123",
+                 status_weights=None, priority_weights=None, description_words=12, description_max_words=200,
+                 span_days=365, created_skew=2.0, owner_sigma=1.0, end=datetime(2025, 1, 1)):
+        self.users = users
+        self.tasks = tasks
+        self.seed = seed
+        self.username_prefix = username_prefix
+        self.password = password
+        self.status_weights = status_weights or {"в ожидании": 5, "в работе": 3, "завершено": 2}
+        self.priority_weights = priority_weights or {0: 4, 1: 3, 2: 3, 3: 2, 4: 1, 5: 1}
+        self.description_words = description_words          # медиана числа слов в описании
+        self.description_max_words = description_max_words
+        self.span_days = span_days                          # created_at в пределах span_days до end
+        self.created_skew = created_skew                    # >1 — больше свежих задач, 1 — равномерно
+        self.owner_sigma = owner_sigma                      # разброс числа задач у пользователей
+        self.end = end
+
+    def task_counts(self):
+        """Задачи по пользователям (логнормально: у немногих очень много), в сумме ровно tasks."""
+        if self.users <= 0:
+            return []
+        rng = random.Random(f"{self.seed}:owners")
+        weights = [rng.lognormvariate(0, self.owner_sigma) for _ in range(self.users)]
+        total = sum(weights)
+        counts = [int(self.tasks * weight / total) for weight in weights]
+        for index in range(self.tasks - sum(counts)):
+            counts[index % self.users] += 1
+        return counts
+
+
+def generate_rows(spec: DatasetSpec, owner_ids, bounds, start: int, stop: int):
+    """Задачи с номерами [start, stop): владелец по границам bounds (накопленные counts)."""
+    rng = random.Random(f"{spec.seed}:{start}")
+    statuses, status_weights = list(spec.status_weights), list(accumulate(spec.status_weights.values()))
+    priorities, priority_weights = list(spec.priority_weights), list(accumulate(spec.priority_weights.values()))
+    span = spec.span_days * 24 * 3600
+    median = max(spec.description_words, 1)
+    rows = []
+    owner = bisect_right(bounds, start)
+    for number in range(start, stop):
+        while number >= bounds[owner]:
+            owner += 1
+        words = min(spec.description_max_words, max(1, int(rng.lognormvariate(0, 0.8) * median)))
+        rows.append({
+            "title": f"{rng.choice(WORDS)} {rng.choice(WORDS)} #{number}",
+            "description": " ".join(rng.choices(WORDS, k=words)),
+            "status": rng.choices(statuses, cum_weights=status_weights)[0],
+            "priority": rng.choices(priorities, cum_weights=priority_weights)[0],
+            "created_at": spec.end - timedelta(seconds=int(span * rng.random() ** spec.created_skew)),
+            "owner_id": owner_ids[owner],
+        })
+    return rows
+
+
+def make_engine(database_url: str):
+    from sqlalchemy import create_engine, event
+
+    if not database_url.startswith("sqlite"):
+        return create_engine(database_url)
+    bind = create_engine(database_url, connect_args={"timeout": 120})
+
+    @event.listens_for(bind, "connect")
+    def _fast_sqlite(dbapi_connection, connection_record):
+        # набор одноразовый: журнал WAL без fsync на каждую транзакцию
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.close()
+
+    return bind
+
+
+_worker_engine = None
+
+
+def _load_batch(database_url: str, spec: DatasetSpec, owner_ids, bounds, start: int, stop: int) -> int:
+    global _worker_engine
+    from sqlalchemy.orm import Session
+    from backend import main
+
+    if _worker_engine is None:
+        _worker_engine = make_engine(database_url)
+    rows = generate_rows(spec, owner_ids, bounds, start, stop)
+    with Session(_worker_engine) as db:
+        main.write_import_chunk(db, rows)
+        db.commit()
+    return len(rows)
+
+
+def create_users(bind, spec: DatasetSpec):
+    from sqlalchemy import insert, select
+    from backend import main
+
+    hashed = main.pwd_context.hash(spec.password)
+    names = [f"{spec.username_prefix}{index}" for index in range(spec.users)]
+    with bind.begin() as conn:
+        conn.execute(insert(main.User), [{"username": name, "hashed_password": hashed} for name in names])
+        ids = dict(conn.execute(select(main.User.username, main.User.id)
+                                .where(main.User.username.in_(names))).all())
+    return [ids[name] for name in names]
+
+
+def default_jobs(database_url: str) -> int:
+    # SQLite пишет один процесс за раз — параллельная загрузка только ждала бы блокировку
+    return 1 if database_url.startswith("sqlite") else (os.cpu_count() or 1)
+
+
+def suspend_triggers(bind):
+    """
+    Убирает построчные триггеры на время загрузки: счётчики task_counters (их заново заполнит
+    install_task_counters) и на SQLite — FTS-таблицу с триггерами (install_search_index сделает rebuild).
+    """
+    from backend import main
+
+    with bind.begin() as conn:
+        for trigger in main.TASK_COUNTER_TRIGGERS:
+            on_table = " ON tasks" if bind.dialect.name == "postgresql" else ""
+            conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}{on_table}")
+        if bind.dialect.name == "sqlite":
+            for trigger in main.SQLITE_SEARCH_TRIGGERS:
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.exec_driver_sql("DROP TABLE IF EXISTS tasks_fts")
+
+
+def restore_triggers(bind):
+    from backend import main
+
+    with bind.begin() as conn:
+        main.install_search_index(conn)
+        main.install_task_counters(conn)
+
+
+def generate(database_url: str, spec: DatasetSpec, batch_size: int = 10000, jobs: int = 1, progress=None) -> dict:
+    """
+    Создаёт схему, пользователей и задачи в database_url; возвращает сводку.
+    Все соединения открываются по database_url, настройки backend-а (DATABASE_URL) не трогаются.
+    """
+    if spec.tasks and not spec.users:
+        raise ValueError("задачам нужен хотя бы один пользователь")
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    from backend import main
+
+    started = time.perf_counter()
+    bind = make_engine(database_url)
+    main.Base.metadata.create_all(bind=bind)
+    main.run_migrations(bind)
+    owner_ids = create_users(bind, spec)
+    suspend_triggers(bind)
+    bind.dispose()  # процессы загрузки открывают свои соединения
+    counts = spec.task_counts()
+    bounds = list(accumulate(counts))
+    batches = [(start, min(start + batch_size, spec.tasks)) for start in range(0, spec.tasks, batch_size)]
+    loaded = 0
+    if jobs <= 1:
+        for start, stop in batches:
+            loaded += _load_batch(database_url, spec, owner_ids, bounds, start, stop)
+            if progress:
+                progress(loaded, spec.tasks)
+    else:
+        with ProcessPoolExecutor(jobs) as pool:
+            futures = [pool.submit(_load_batch, database_url, spec, owner_ids, bounds, start, stop)
+                       for start, stop in batches]
+            for future in futures:
+                loaded += future.result()
+                if progress:
+                    progress(loaded, spec.tasks)
+    restore_triggers(bind)
+    bind.dispose()
+    seconds = time.perf_counter() - started
+    return {
+        "users": spec.users,
+        "tasks": loaded,
+        "max_tasks_per_user": max(counts, default=0),
+        "seconds": round(seconds, 2),
+        "rows_per_second": round(loaded / seconds) if seconds else None,
+    }
+
+
+def parse_weights(text: str, key=str) -> dict:
+    weights = {}
+    for item in text.split(","):
+        name, _, weight = item.rpartition("=")
+        weights[key(name.strip())] = float(weight)
+    return weights
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--tasks", type=int, default=1000000, help="всего задач")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--username-prefix", default="load_user_")
+    parser.add_argument("--password", default="loadtest123", help="общий пароль всех пользователей")
+    parser.add_argument("--status-weights", help='например "в ожидании=5,в работе=3,завершено=2"')
+    parser.add_argument("--priority-weights", help='например "0=4,1=3,2=3,3=2,4=1,5=1"')
+    parser.add_argument("--description-words", type=int, default=12, help="медиана слов в описании")
+    parser.add_argument("--description-max-words", type=int, default=200)
+    parser.add_argument("--span-days", type=int, default=365, help="created_at в пределах стольких дней")
+    parser.add_argument("--created-skew", type=float, default=2.0, help=">1 — больше свежих задач")
+    parser.add_argument("--owner-sigma", type=float, default=1.0, help="неравномерность задач по пользователям")
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="процессов загрузки (по умолчанию число CPU, для SQLite — 1)")
+    args = parser.parse_args(argv)
+
+    spec = DatasetSpec(
+        users=args.users, tasks=args.tasks, seed=args.seed, username_prefix=args.username_prefix,
+        password=args.password,
+        status_weights=parse_weights(args.status_weights) if args.status_weights else None,
+        priority_weights=parse_weights(args.priority_weights, int) if args.priority_weights else None,
+        description_words=args.description_words, description_max_words=args.description_max_words,
+        span_days=args.span_days, created_skew=args.created_skew, owner_sigma=args.owner_sigma,
+    )
+    jobs = args.jobs or default_jobs(args.database_url)
+
+    def progress(loaded, total):
+        print(f"\r{loaded}/{total} задач", end="", flush=True)
+
+    summary = generate(args.database_url, spec, args.batch_size, jobs, progress)
+    print(f"\nГотово: {summary['users']} пользователей, {summary['tasks']} задач за {summary['seconds']} с "
+          f"({summary['rows_per_second']} строк/с)")
+
+
+if __name__ == "__main__":
+    main_cli()
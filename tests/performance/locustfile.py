@@ -1,28 +1,60 @@
 # tests/performance/locustfile.py
-from random import choice, randint
+#
+# Ручной запуск против работающего стека:
+#     locust -f tests/performance/locustfile.py --host=http://127.0.0.1:8000
+# С заранее созданными пользователями (их заводит tests/performance/loadtest.py):
+#     LOADTEST_USERS=100 LOADTEST_PASSWORD=... locust -f tests/performance/locustfile.py ...
+import os
+from random import choice, randint, random, randrange, sample
+
 from locust import HttpUser, between, task
 
 users = [("u1", "pass123"), ("u2", "secret7"), ("u3", "hunter8")]
 
+LOADTEST_USERS = int(os.getenv("LOADTEST_USERS", "0"))  # load_user_0 .. load_user_{N-1}
+LOADTEST_PASSWORD = os.getenv("LOADTEST_PASSWORD", "loadtest123")
+
+SORTS = ["title", "status", "created_at", "priority"]
+SEARCH_TERMS = ["отчёт", "релиз", "встреча", "report", "budget", "ре"]
+STATUSES = ["в ожидании", "в работе", "завершено"]
+
 
 class BeneTasksUser(HttpUser):
     wait_time = between(0.1, 0.5)
 
     def on_start(self):
-        username, password = choice(users)
-
-        # пробуем зарегистрироваться (если пользователь уже есть — получим 400)
-        self.client.post(
-            "/register",
-            json={"username": username, "password": password},
-            name="/register",
-            catch_response=False,
-        )
+        self.task_ids = []   # задачи пользователя, которые можно читать и менять
+        self.created = []    # задачи, созданные этим клиентом, — только их удаляем
+        self.etag = None
+        self.next_cursor = None
 
+        if LOADTEST_USERS:
+            self.username, self.password = f"load_user_{randrange(LOADTEST_USERS)}", LOADTEST_PASSWORD
+        else:
+            self.username, self.password = choice(users)
+            # пробуем зарегистрироваться (если пользователь уже есть — получим 400)
+            self.client.post(
+                "/register",
+                json={"username": self.username, "password": self.password},
+                name="/register",
+                catch_response=False,
+            )
+        self.login()
+
+        r = self.client.get("/tasks", params={"limit": 500, "fields": "id"}, headers=self.headers,
+                            name="/tasks GET [ids]")
+        if r.status_code == 200:
+            self.task_ids = [item["id"] for item in r.json()]
+
+    # -----------------------------
+    # Аутентификация
+    # -----------------------------
+    @task(1)
+    def login(self):
         # берём токен и валидируем ответ
         with self.client.post(
             "/token",
-            data={"username": username, "password": password},
+            data={"username": self.username, "password": self.password},
             headers={"Content-Type": "application/x-www-form-urlencoded"},
             name="/token",
             catch_response=True,
@@ -35,10 +67,71 @@ class BeneTasksUser(HttpUser):
                 # опционально останавливаем тест:
                 # self.environment.runner.quit()
 
+    # -----------------------------
+    # Чтение
+    # -----------------------------
+    @task(8)
+    def list_tasks(self):
+        self.client.get("/tasks", params={"limit": 100}, headers=self.headers, name="/tasks GET")
+
+    @task(5)
+    def list_sorted(self):
+        params = {"limit": 100, "sort_by": choice(SORTS), "order": choice(["asc", "desc"])}
+        if random() < 0.5:
+            params["fields"] = "id,title,priority,status"
+        self.client.get("/tasks", params=params, headers=self.headers, name="/tasks GET [sort]")
+
+    @task(4)
+    def search_tasks(self):
+        params = {"limit": 100, "search": choice(SEARCH_TERMS)}
+        self.client.get("/tasks", params=params, headers=self.headers, name="/tasks GET [search]")
+
+    @task(3)
+    def next_page(self):
+        params = {"limit": 50, "sort_by": "created_at", "order": "desc"}
+        if self.next_cursor:
+            params["cursor"] = self.next_cursor
+        r = self.client.get("/tasks", params=params, headers=self.headers, name="/tasks GET [page]")
+        self.next_cursor = r.headers.get("X-Next-Cursor")
+
+    @task(3)
+    def list_conditional(self):
+        headers = dict(self.headers)
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        with self.client.get("/tasks", params={"limit": 100}, headers=headers,
+                             name="/tasks GET [etag]", catch_response=True) as r:
+            if r.status_code in (200, 304):
+                self.etag = r.headers.get("ETag", self.etag)
+                r.success()
+
+    @task(6)
+    def get_task(self):
+        if self.task_ids:
+            self.client.get(f"/tasks/{choice(self.task_ids)}", headers=self.headers, name="/tasks/{task_id} GET")
+
+    @task(4)
+    def top_tasks(self):
+        params = choice([{"n": 5}, {"n": 5, "priority": randint(0, 5)}, {"n": 10, "all_priorities": "true"}])
+        self.client.get("/tasks/top/", params=params, headers=self.headers, name="/tasks/top")
+
+    @task(2)
+    def task_stats(self):
+        self.client.get("/tasks/stats", headers=self.headers, name="/tasks/stats")
+
+    @task(1)
+    def bulk_get(self):
+        if self.task_ids:
+            ids = sample(self.task_ids, min(20, len(self.task_ids)))
+            self.client.get("/tasks/bulk", params={"ids": ids}, headers=self.headers, name="/tasks/bulk GET")
+
+    # -----------------------------
+    # Запись
+    # -----------------------------
     @task(3)
     def create_task(self):
         pr = randint(1, 5)
-        self.client.post(
+        r = self.client.post(
             "/tasks",
             json={
                 "title": f"locust-{pr}",
@@ -48,15 +141,24 @@ class BeneTasksUser(HttpUser):
             headers=self.headers,
             name="/tasks POST",
         )
+        if r.status_code == 200:
+            self.created.append(r.json()["id"])
+            self.task_ids.append(r.json()["id"])
 
     @task(2)
-    def list_tasks(self):
-        self.client.get("/tasks", headers=self.headers, name="/tasks GET")
+    def update_task(self):
+        if self.task_ids:
+            self.client.put(
+                f"/tasks/{choice(self.task_ids)}",
+                json={"title": "locust-upd", "description": "load-test", "status": choice(STATUSES),
+                      "priority": randint(0, 5)},
+                headers=self.headers,
+                name="/tasks/{task_id} PUT",
+            )
 
     @task(1)
-    def top_tasks(self):
-        self.client.get(
-            "/tasks/top/?n=5&all_priorities=true",
-            headers=self.headers,
-            name="/tasks/top",
-        )
+    def delete_task(self):
+        if self.created:
+            task_id = self.created.pop()
+            self.task_ids.remove(task_id)
+            self.client.delete(f"/tasks/{task_id}", headers=self.headers, name="/tasks/{task_id} DELETE")
@@ -0,0 +1,46 @@
+import csv
+import io
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from backend import main
+from tests.performance.datagen import DatasetSpec, generate_rows
+
+pytest.importorskip("pytest_benchmark")
+
+ROWS = 50000  # строк в одном импорте (10 пачек по IMPORT_CHUNK_SIZE)
+
+
+@pytest.fixture(scope="module")
+def body():
+    rows = generate_rows(DatasetSpec(users=1, tasks=ROWS), [0], [ROWS], 0, ROWS)
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, ["title", "description", "status", "priority"], extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+
+def test_import_csv(benchmark, body, tmp_path):
+    """POST /tasks/import без HTTP: разбор CSV, проверка TaskCreate, запись, FTS-индекс и счётчики."""
+    benchmark.group = "import"
+    databases = iter(range(1000))
+
+    def fresh_database():
+        bind = create_engine(f"sqlite:///{tmp_path / f'import-{next(databases)}.db'}")
+        main.Base.metadata.create_all(bind)
+        with bind.begin() as conn:
+            owner_id = conn.execute(insert(main.User).values(username="bench", hashed_password="x")).inserted_primary_key[0]
+        return (bind, owner_id), {}
+
+    def run(bind, owner_id):
+        with Session(bind) as db:
+            result = main.import_records(db, owner_id, main.csv_records(io.StringIO(body, newline="")))
+        bind.dispose()
+        return result
+
+    result = benchmark.pedantic(run, setup=fresh_database, rounds=3)
+    assert result["imported"] == ROWS
+    benchmark.extra_info["rows_per_second"] = round(ROWS / benchmark.stats.stats.mean)
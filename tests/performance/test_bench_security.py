@@ -0,0 +1,27 @@
+import pytest
+
+from backend import main
+
+pytest.importorskip("pytest_benchmark")
+
+
+def test_create_access_token(benchmark):
+    benchmark.group = "jwt"
+    benchmark(main.create_access_token, {"sub": "bench"})
+
+
+def test_decode_token(benchmark):
+    benchmark.group = "jwt"
+    token = main.create_access_token({"sub": "bench"})
+    assert benchmark(main.decode_token, token)["sub"] == "bench"
+
+
+def test_get_password_hash(benchmark):
+    benchmark.group = "bcrypt"
+    benchmark.pedantic(main.get_password_hash, args=("secret123",), rounds=5, iterations=1)
+
+
+def test_verify_password(benchmark):
+    benchmark.group = "bcrypt"
+    hashed = main.get_password_hash("secret123")
+    assert benchmark.pedantic(main.verify_password, args=("secret123", hashed), rounds=5, iterations=1)
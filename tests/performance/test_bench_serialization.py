@@ -0,0 +1,39 @@
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from backend import main
+
+pytest.importorskip("pytest_benchmark")
+
+ROWS = 10000  # сериализуем не больше стольких задач набора
+
+
+@pytest.fixture(scope="module")
+def loaded(dataset):
+    with dataset.session() as db:
+        stmt = select(main.Task).where(main.Task.owner_id == dataset.user.id).order_by(main.Task.id).limit(ROWS)
+        tasks = db.execute(stmt).scalars().all()
+        db.expunge_all()
+        columns = select(*main.TASK_OUT_COLUMNS).where(main.Task.owner_id == dataset.user.id)
+        rows = db.execute(columns.order_by(main.Task.id).limit(ROWS)).all()
+    return tasks, rows
+
+
+def test_taskout_response_model(benchmark, loaded):
+    """Путь FastAPI по response_model: ORM-объекты -> TaskOut -> JSON."""
+    tasks, _ = loaded
+    benchmark.group = "serialization"
+    adapter = TypeAdapter(List[main.TaskOut])
+    benchmark(lambda: adapter.dump_json(adapter.validate_python(tasks, from_attributes=True)))
+
+
+def test_rows_json(benchmark, loaded):
+    """Быстрый путь эндпоинтов: строки столбцов -> JSON."""
+    tasks, rows = loaded
+    benchmark.group = "serialization"
+    adapter = TypeAdapter(List[main.TaskOut])
+    assert main.rows_json(rows) == adapter.dump_json(adapter.validate_python(tasks, from_attributes=True))
+    benchmark(main.rows_json, rows)
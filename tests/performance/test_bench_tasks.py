@@ -0,0 +1,59 @@
+import pytest
+from fastapi import Request, Response
+
+from backend import main
+
+pytest.importorskip("pytest_benchmark")
+
+SORTS = [None, "title", "status", "created_at", "priority"]
+ORDERS = ["asc", "desc"]
+SEARCHES = [None, "отчёт", "ре"]  # FTS и короткая строка через LIKE
+FULL_LIST_MAX = 100000  # целиком списки больше этого не выгружаем
+
+
+def _request():
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""})
+
+
+def call_get_tasks(dataset, **params):
+    with dataset.session() as db:
+        return main.get_tasks(request=_request(), response=Response(), db=db, current_user=dataset.user,
+                              cursor=None, fields=None, **params)
+
+
+def call_top_tasks(dataset, **params):
+    with dataset.session() as db:
+        return main.top_tasks(request=_request(), response=Response(), db=db, current_user=dataset.user,
+                              cursor=None, fields=None, **params)
+
+
+@pytest.mark.parametrize("limit", [100, None], ids=["page", "all"])
+@pytest.mark.parametrize("search", SEARCHES)
+@pytest.mark.parametrize("order", ORDERS)
+@pytest.mark.parametrize("sort_by", SORTS)
+def test_get_tasks(benchmark, dataset, no_task_cache, sort_by, order, search, limit):
+    if limit is None and dataset.size > FULL_LIST_MAX:
+        pytest.skip("полный список слишком велик")
+    benchmark.group = f"get_tasks n={dataset.size}"
+    response = benchmark(call_get_tasks, dataset, sort_by=sort_by, order=order, search=search, limit=limit)
+    assert response.status_code == 200
+
+
+def test_get_tasks_cached(benchmark, dataset):
+    benchmark.group = f"get_tasks n={dataset.size}"
+    call_get_tasks(dataset, sort_by="priority", order="desc", search=None, limit=100)
+    benchmark(call_get_tasks, dataset, sort_by="priority", order="desc", search=None, limit=100)
+
+
+@pytest.mark.parametrize("branch", [
+    {"priority": None, "all_priorities": False},
+    {"priority": 3, "all_priorities": False},
+    {"priority": None, "all_priorities": True},
+], ids=["top", "priority", "all_priorities"])
+@pytest.mark.parametrize("source", ["sql", "memory"])
+def test_top_tasks(benchmark, dataset, branch, source, monkeypatch):
+    benchmark.group = f"top_tasks n={dataset.size}"
+    if source == "sql":
+        monkeypatch.setattr(main.top_index, "depth", 0)
+    response = benchmark(call_top_tasks, dataset, n=10, **branch)
+    assert response.status_code == 200
@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+from frontend import api_client as api
+
+
+class FakeApi(BaseHTTPRequestHandler):
+    """/tasks с ETag, /flaky отвечает 503 один раз, /slow — с задержкой."""
+
+    requests = []
+    version = 1
+    flaky_failures = 1
+
+    def do_GET(self):
+        FakeApi.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path.startswith("/flaky") and FakeApi.flaky_failures:
+            FakeApi.flaky_failures -= 1
+            return self._send(503, {"detail": "занято"})
+        if self.path.startswith("/slow"):
+            time.sleep(0.3)
+        etag = f'W/"{FakeApi.version}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        headers = {"ETag": etag}
+        if "limit=" in self.path:
+            headers["X-Next-Cursor"] = "next"
+        self._send(200, [{"version": FakeApi.version}], headers)
+
+    def do_POST(self):
+        FakeApi.requests.append((self.path, None))
+        self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/tasks":
+            FakeApi.version += 1
+            return self._send(200, {"id": 1})
+        self._send(400, {"detail": "Неверные имя пользователя или пароль"})
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApi)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(api, "API_URL", f"http://127.0.0.1:{server.server_address[1]}")
+    FakeApi.requests, FakeApi.version, FakeApi.flaky_failures = [], 1, 1
+    api._cached_get.clear()
+    yield FakeApi
+    server.shutdown()
+    server.server_close()
+
+
+def test_reads_cached_until_write_then_revalidated(fake_api):
+    assert api.get_tasks("tok") == [{"version": 1}]
+    assert api.get_tasks("tok") == [{"version": 1}]
+    assert len(fake_api.requests) == 1
+
+    api.invalidate("tok")
+    assert api.get_tasks("tok") == [{"version": 1}]
+    assert fake_api.requests[-1] == ("/tasks", 'W/"1"')  # 304, данные из хранилища ETag
+
+    api.create_task("tok", "t", "d", "в ожидании", 1)
+    assert api.get_tasks("tok") == [{"version": 2}]
+    assert len(fake_api.requests) == 4
+
+
+def test_cache_is_per_token_and_params(fake_api):
+    api.get_tasks("a")
+    api.get_tasks("b")
+    api.get_tasks("a", sort_by="priority", order="desc")
+    assert len(fake_api.requests) == 3
+
+
+def test_page_returns_next_cursor(fake_api):
+    rows, next_cursor = api.get_tasks_page("tok", limit=50, cursor="abc", fields="id,title")
+    assert rows == [{"version": 1}] and next_cursor == "next"
+    assert fake_api.requests[-1][0] == "/tasks?cursor=abc&fields=id%2Ctitle&limit=50"
+    assert api.get_tasks_page("tok", limit=50, cursor="abc", fields="id,title")[1] == "next"
+    assert len(fake_api.requests) == 1
+
+
+def test_get_retried_on_503(fake_api):
+    data, _ = api.conditional_get("tok", "/flaky", {})
+    assert data == [{"version": 1}]
+    assert [path for path, _ in fake_api.requests] == ["/flaky", "/flaky"]
+
+
+def test_errors_carry_server_detail(fake_api):
+    with pytest.raises(api.ApiError) as error:
+        api.login("u", "wrong")
+    assert error.value.status_code == 400
+    assert error.value.detail == "Неверные имя пользователя или пароль"
+
+
+def test_run_concurrently_overlaps_calls(fake_api):
+    started = time.monotonic()
+    results = api.run_concurrently(
+        partial(api.conditional_get, "tok", "/slow", {"i": 1}),
+        partial(api.conditional_get, "tok", "/slow", {"i": 2}),
+        partial(api.login, "u", "wrong"),
+    )
+    assert time.monotonic() - started < 0.55
+    assert [error for _, error in results] == [None, None, "Неверные имя пользователя или пароль"]
+
+
+def test_data_versions_live_in_session_state(fake_api):
+    before = api.data_version("session-tok")
+    api.invalidate("session-tok")
+    assert st.session_state["api_data_versions"]["session-tok"] == before + 1
+
+
+def test_run_concurrently_passes_script_context(monkeypatch):
+    ctx = object()
+    monkeypatch.setattr(threading.current_thread(), SCRIPT_RUN_CONTEXT_ATTR_NAME, ctx, raising=False)
+    results = api.run_concurrently(get_script_run_ctx, get_script_run_ctx)
+    assert results == [(ctx, None), (ctx, None)]
+
+
+def test_run_concurrently_reraises_unexpected_errors():
+    def broken():
+        raise KeyError("bug")
+
+    with pytest.raises(KeyError):
+        api.run_concurrently(broken)
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend import main
+
+
+@pytest.fixture()
+async def async_client(tmp_path):
+    """Приложение с async-роутером поверх aiosqlite."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(main.Base.metadata.create_all)
+    sessions = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    async def get_test_async_db():
+        async with sessions() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(main.async_api)
+    app.dependency_overrides[main.get_async_db] = get_test_async_db
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    await engine.dispose()
+
+
+async def _auth(client: AsyncClient):
+    r = await client.post("/register", json={"username": "asyncer", "password": "123456"})
+    assert r.status_code == 200
+    token = (
+        await client.post(
+            "/token",
+            data={"username": "asyncer", "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_async_crud_roundtrip(async_client: AsyncClient):
+    headers = await _auth(async_client)
+
+    created = await async_client.post(
+        "/tasks", json={"title": "async", "description": "aiosqlite", "priority": 4}, headers=headers
+    )
+    assert created.status_code == 200
+    task_id = created.json()["id"]
+
+    assert (await async_client.get(f"/tasks/{task_id}", headers=headers)).json()["title"] == "async"
+
+    updated = await async_client.put(
+        f"/tasks/{task_id}",
+        json={"title": "async2", "description": "d", "status": "в работе", "priority": 1},
+        headers=headers,
+    )
+    assert updated.json()["title"] == "async2"
+
+    listed = await async_client.get("/tasks", params={"search": "async"}, headers=headers)
+    assert [t["id"] for t in listed.json()] == [task_id]
+
+    assert (await async_client.delete(f"/tasks/{task_id}", headers=headers)).status_code == 200
+    assert (await async_client.get(f"/tasks/{task_id}", headers=headers)).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_async_top_and_pagination(async_client: AsyncClient):
+    headers = await _auth(async_client)
+    for pr in (2, 5, 1):
+        await async_client.post(
+            "/tasks", json={"title": f"p{pr}", "description": "x", "priority": pr}, headers=headers
+        )
+
+    top = await async_client.get("/tasks/top/", params={"n": 2}, headers=headers)
+    assert [t["priority"] for t in top.json()] == [5, 2]
+    assert "X-Next-Cursor" in top.headers
+
+    rest = await async_client.get(
+        "/tasks/top/", params={"n": 2, "cursor": top.headers["X-Next-Cursor"]}, headers=headers
+    )
+    assert [t["priority"] for t in rest.json()] == [1]
+
+
+@pytest.mark.asyncio
+async def test_async_auth_errors(async_client: AsyncClient):
+    r = await async_client.get("/tasks", headers={"Authorization": "Bearer broken"})
+    assert r.status_code == 401
+    assert r.json()["detail"] == "Неверный токен"
+
+
+@pytest.mark.asyncio
+async def test_async_group_commit(async_client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(main, "GROUP_COMMIT", True)
+    monkeypatch.setattr(main.group_commit, "window", 0.05)
+    headers = await _auth(async_client)
+    before = main.group_commit.stats()
+    try:
+        responses = await asyncio.gather(*[
+            async_client.post("/tasks", json={"title": f"a{i}", "description": "d", "priority": i}, headers=headers)
+            for i in range(10)
+        ])
+    finally:
+        main.group_commit.stop()
+
+    assert [r.json()["title"] for r in responses] == [f"a{i}" for i in range(10)]
+    after = main.group_commit.stats()
+    assert after["rows"] - before["rows"] == 10 and after["batches"] - before["batches"] < 10
+    listed = (await async_client.get("/tasks", headers=headers)).json()
+    assert sorted(t["id"] for t in listed) == sorted(r.json()["id"] for r in responses)
+
+
+@pytest.mark.asyncio
+async def test_async_stats_and_conditional_get(async_client: AsyncClient):
+    headers = await _auth(async_client)
+    task = (await async_client.post("/tasks", json={"title": "s", "description": "d"}, headers=headers)).json()
+
+    stats = await async_client.get("/tasks/stats", headers=headers)
+    assert stats.json()["total"] == 1
+    etag = stats.headers["etag"]
+    for path in ("/tasks", "/tasks/stats", f"/tasks/{task['id']}", "/tasks/top/"):
+        assert (await async_client.get(path, headers={**headers, "If-None-Match": etag})).status_code == 304
+    missing = await async_client.get("/tasks/999999", headers={**headers, "If-None-Match": "*"})
+    assert missing.status_code == 404
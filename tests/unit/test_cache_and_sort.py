@@ -18,10 +18,11 @@ async def test_in_memory_cache_behavior(aclient: AsyncClient):
     ).json()
     hdrs = {"Authorization": f"Bearer {token}"}
 
-    # 1-й запрос — кэш пустой
+    # 1-й запрос — с неверным токеном до кэша дело не доходит
+    stats_before = main.task_cache.stats()
     first = await aclient.get("/tasks", headers=hdrs)
     assert first.status_code == 401
-    assert main.cache_data["tasks"] is None
+    assert main.task_cache.stats()["misses"] == stats_before["misses"]
 
     # 2-й запрос через < CACHE_TIMEOUT — должен отдать из кэша
     before = time.time()
@@ -34,7 +35,7 @@ async def test_in_memory_cache_behavior(aclient: AsyncClient):
         json={"title": "t", "description": "d", "status": "в ожидании"},
         headers=hdrs,
     )
-    assert main.cache_data["tasks"] is None
+    assert main.task_cache.stats()["hits"] == stats_before["hits"]
 
 
 @pytest.mark.asyncio
@@ -0,0 +1,91 @@
+from backend import main
+
+
+def test_local_generations_bump():
+    gens = main.LocalGenerations()
+    assert gens.get(7) == 0
+    assert gens.bump(7) == 1
+    assert gens.get(7) == 1
+    assert gens.get(8) == 0
+
+
+def test_file_generations_shared_between_workers(tmp_path):
+    path = str(tmp_path / "generations.bin")
+    # два «воркера» открывают один и тот же файл
+    worker_a = main.FileGenerations(path, slots=128)
+    worker_b = main.FileGenerations(path, slots=128)
+
+    assert worker_b.get(42) == 0
+    worker_a.bump(42)
+    assert worker_b.get(42) == 1
+
+
+def test_cache_drops_entry_after_write_in_other_worker(tmp_path):
+    path = str(tmp_path / "generations.bin")
+    cache_a = main.TaskListCache(16, 60, main.FileGenerations(path, slots=128))
+    cache_b = main.TaskListCache(16, 60, main.FileGenerations(path, slots=128))
+    key = main.tasks_cache_key(5, None, "asc", None)
+
+    cache_b.set(key, ["old"], cache_b.generation(5))
+    assert cache_b.get(key) == ["old"]
+
+    # запись в воркере A инвалидирует копию воркера B
+    cache_a.invalidate_owner(5)
+    assert cache_b.get(key) is None
+    assert cache_b.stats()["stale"] == 1
+
+
+def test_generation_read_before_query_protects_from_race():
+    cache = main.TaskListCache(16, 60)
+    key = main.tasks_cache_key(9, None, "asc", None)
+
+    generation = cache.generation(9)  # читаем до выборки
+    cache.generations.bump(9)         # параллельная запись во время выборки
+    cache.set(key, ["stale"], generation)
+    assert cache.get(key) is None
+
+
+class _ListenConnection:
+    """Драйверное соединение, которое останавливает шину сразу после LISTEN."""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.autocommit = False
+        self.driver_connection = self
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement):
+        self.bus.stop()
+
+    def close(self):
+        pass
+
+
+class _FlakyBind:
+    def __init__(self, bus):
+        self.bus = bus
+        self.attempts = 0
+
+    def raw_connection(self):
+        self.attempts += 1
+        if self.attempts == 1:
+            raise OSError("connection refused")
+        return _ListenConnection(self.bus)
+
+
+def test_postgres_bus_invalidates_everything_after_reconnect(caplog):
+    bus = main.PostgresGenerations(None)
+    bus._bind = _FlakyBind(bus)
+    cache = main.TaskListCache(max_entries=10, ttl=60, generations=bus)
+    generation = cache.generation(7)
+    cache.set((7, "list"), b"[]", generation)  # владелец ни разу не писал: поколение 0
+    epoch = bus.epoch
+
+    bus._listen()  # первая попытка падает, вторая подключается и делает LISTEN
+
+    assert bus._bind.attempts == 2
+    assert "LISTEN-соединение потеряно" in caplog.text and "OSError" in caplog.text
+    assert bus.epoch != epoch
+    assert cache.get((7, "list")) is None  # уведомления за время разрыва могли потеряться
@@ -3,6 +3,15 @@ from backend import main
 
 def test_clear_cache_manual():
     # вручную кладём что-то в кэш и очищаем
-    main.cache_data["tasks"] = ["dummy"]
+    main.task_cache.set(main.tasks_cache_key(1, None, "asc", None), ["dummy"], 0)
+    main.clear_cache()
+    assert len(main.task_cache) == 0
+
+
+def test_clear_cache_only_for_owner():
+    main.task_cache.set(main.tasks_cache_key(1, None, "asc", None), ["first"], main.task_cache.generation(1))
+    main.task_cache.set(main.tasks_cache_key(2, None, "asc", None), ["second"], main.task_cache.generation(2))
+    main.clear_cache(1)
+    assert main.task_cache.get(main.tasks_cache_key(1, None, "asc", None)) is None
+    assert main.task_cache.get(main.tasks_cache_key(2, None, "asc", None)) == ["second"]
     main.clear_cache()
-    assert main.cache_data["tasks"] is None
@@ -0,0 +1,56 @@
+import os
+from itertools import accumulate
+
+from sqlalchemy import create_engine, text
+
+from tests.performance import datagen
+
+
+def test_task_counts_sum_exactly_and_are_seeded():
+    spec = datagen.DatasetSpec(users=7, tasks=1000, seed=3)
+    counts = spec.task_counts()
+    assert sum(counts) == 1000
+    assert counts == datagen.DatasetSpec(users=7, tasks=1000, seed=3).task_counts()
+    assert counts != datagen.DatasetSpec(users=7, tasks=1000, seed=4).task_counts()
+
+
+def test_rows_do_not_depend_on_batch_boundaries():
+    spec = datagen.DatasetSpec(users=3, tasks=100, seed=5)
+    bounds = list(accumulate(spec.task_counts()))
+    whole = datagen.generate_rows(spec, [10, 20, 30], bounds, 0, 100)
+    again = datagen.generate_rows(spec, [10, 20, 30], bounds, 0, 100)
+    assert whole == again
+    owners = [row["owner_id"] for row in whole]
+    assert owners == sorted(owners)
+    assert [owners.count(owner) for owner in (10, 20, 30)] == spec.task_counts()
+
+
+def test_weights_shape_statuses():
+    spec = datagen.DatasetSpec(users=1, tasks=500, status_weights={"завершено": 1})
+    rows = datagen.generate_rows(spec, [1], [500], 0, 500)
+    assert {row["status"] for row in rows} == {"завершено"}
+
+
+def test_generate_loads_sqlite_and_restores_triggers(tmp_path):
+    url = f"sqlite:///{tmp_path / 'gen.db'}"
+    spec = datagen.DatasetSpec(users=3, tasks=250, seed=2, password="pw")
+    environ = dict(os.environ)
+
+    summary = datagen.generate(url, spec, batch_size=100)
+
+    assert dict(os.environ) == environ  # адрес передан явно, окружение процесса не меняется
+
+    assert summary["users"] == 3 and summary["tasks"] == 250
+    bind = create_engine(url)
+    with bind.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM tasks")).scalar() == 250
+        found = conn.execute(text("SELECT count(*) FROM tasks_fts WHERE tasks_fts MATCH 'отчёт'")).scalar()
+        expected = conn.execute(text(
+            "SELECT count(*) FROM tasks WHERE title LIKE '%отчёт%' OR description LIKE '%отчёт%'"
+        )).scalar()
+        triggers = conn.execute(text("SELECT count(*) FROM sqlite_master WHERE type = 'trigger'")).scalar()
+        counted = conn.execute(text("SELECT sum(count) FROM task_counters")).scalar()
+    bind.dispose()
+    assert found == expected > 0
+    assert triggers == 6
+    assert counted == 250
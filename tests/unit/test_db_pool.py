@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.pool import StaticPool
+
+from backend import main
+
+
+@pytest.fixture
+def tiny_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DB_POOL_SIZE", 1)
+    monkeypatch.setattr(main, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(main, "DB_POOL_TIMEOUT", 0.05)
+
+    class Pool(main.TimedCheckoutPool, main.QueuePool):
+        stats = main.PoolStats()
+
+    url = f"sqlite:///{tmp_path / 'pool.db'}"
+    bind = create_engine(url, **main.engine_options(url, Pool))
+    yield bind
+    bind.dispose()
+
+
+def test_pool_settings_applied(tiny_pool):
+    assert tiny_pool.pool.size() == 1
+    assert tiny_pool.pool._timeout == 0.05
+    assert tiny_pool.pool._pre_ping is main.DB_POOL_PRE_PING
+
+
+def test_pool_metrics_count_in_use_and_timeouts(tiny_pool):
+    held = tiny_pool.connect()
+    metrics = main.pool_metrics(tiny_pool)
+    assert (metrics["in_use"], metrics["checkouts"], metrics["timeouts"]) == (1, 1, 0)
+
+    with pytest.raises(sa_exc.TimeoutError):
+        tiny_pool.connect()
+    metrics = main.pool_metrics(tiny_pool)
+    assert metrics["timeouts"] == 1
+    assert metrics["wait_seconds_max"] >= 0.05
+    assert metrics["waiting"] == 0
+
+    held.close()
+    assert main.pool_metrics(tiny_pool)["in_use"] == 0
+
+
+def test_memory_sqlite_keeps_default_pool():
+    options = main.engine_options("sqlite://", main.InstrumentedQueuePool)
+    assert "poolclass" not in options
+    bind = create_engine("sqlite://", poolclass=StaticPool)
+    assert main.pool_metrics(bind) == {"pool": "StaticPool"}
+
+
+async def test_pool_metrics_endpoint(aclient):
+    r = await aclient.get("/metrics/pool")
+    assert r.status_code == 200
+    assert {"in_use", "overflow", "wait_seconds_total"} <= set(r.json()["sync"])
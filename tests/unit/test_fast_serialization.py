@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from pydantic import TypeAdapter
+from sqlalchemy import select
+
+from backend import main
+from tests.conftest import TestingSessionLocal
+
+TRICKY = ['кириллица "в кавычках"', "строка\nперенос\tтаб", "\x01\x1f\x7f   \\ / <>&", "", "😀"]
+
+
+async def _auth(aclient, username):
+    await aclient.post("/register", json={"username": username, "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": username, "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _expected(owner):
+    """Байты, которые FastAPI выдаёт по response_model=List[TaskOut] из ORM-объектов."""
+    with TestingSessionLocal() as db:
+        stmt = select(main.Task).where(main.Task.owner_id == owner).order_by(main.Task.id)
+        tasks = db.execute(stmt).scalars().all()
+        adapter = TypeAdapter(List[main.TaskOut])
+        return adapter.dump_json(adapter.validate_python(tasks, from_attributes=True))
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+async def test_task_list_bytes_match_response_model(aclient, monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(main, "orjson", None)
+    name = f"fastpath_{use_orjson}"
+    headers = await _auth(aclient, name)
+    for i, text in enumerate(TRICKY):
+        await aclient.post("/tasks", json={"title": text, "description": text[::-1], "priority": i}, headers=headers)
+    main.clear_cache()
+
+    r = await aclient.get("/tasks", headers=headers)
+    assert r.headers["content-type"] == "application/json"
+    with TestingSessionLocal() as db:
+        owner = db.execute(select(main.User.id).where(main.User.username == name)).scalar()
+    assert r.content == _expected(owner)
+
+    single = await aclient.get(f"/tasks/{r.json()[0]['id']}", headers=headers)
+    assert single.content == TypeAdapter(main.TaskOut).dump_json(main.TaskOut(**r.json()[0]))
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dump_json_datetimes_match_pydantic(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(main, "orjson", None)
+    adapter = TypeAdapter(datetime)
+    for value in (
+        datetime(2024, 1, 2, 3, 4, 5),
+        datetime(2024, 1, 2, 3, 4, 5, 120000),
+        datetime(2024, 1, 2, 3, 4, 5, 1, tzinfo=timezone.utc),
+        datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=3))),
+    ):
+        assert main.dump_json(value) == adapter.dump_json(value)
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from backend import main
+
+
+@pytest.fixture()
+def bind(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'group.db'}", connect_args={"check_same_thread": False})
+    main.Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _values(i, **overrides):
+    values = {"title": f"t{i}", "description": "d", "status": "в работе", "priority": i, "owner_id": 1}
+    values.update(overrides)
+    return values
+
+
+def test_rows_returned_to_their_callers(bind):
+    writer = main.TaskWriter(bind, window=0.05, max_rows=8)
+    barrier = threading.Barrier(20)
+    results = {}
+
+    def create(i):
+        barrier.wait()
+        results[i] = writer.insert(_values(i))
+
+    threads = [threading.Thread(target=create, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.stop()
+
+    assert all(results[i].title == f"t{i}" and results[i].priority == i for i in range(20))
+    assert len({row.id for row in results.values()}) == 20
+    stats = writer.stats()
+    assert stats["rows"] == 20 and stats["largest_batch"] <= 8 and stats["batches"] < 20
+    with bind.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM tasks")).scalar() == 20
+
+
+def test_failed_batch_written_row_by_row(bind):
+    writer = main.TaskWriter(bind, window=0.05, max_rows=8)
+    futures = [writer.submit(_values(i, title=object() if i == 1 else f"t{i}")) for i in range(3)]
+
+    assert futures[0].result().title == "t0" and futures[2].result().title == "t2"
+    with pytest.raises(Exception):
+        futures[1].result()
+    writer.stop()
+
+    assert writer.stats()["split_batches"] == 1
+    with bind.connect() as conn:
+        assert conn.execute(text("SELECT title FROM tasks ORDER BY id")).scalars().all() == ["t0", "t2"]
+
+
+def test_stop_flushes_pending_rows(bind):
+    writer = main.TaskWriter(bind, window=1.0, max_rows=256)
+    future = writer.submit(_values(0))
+    writer.stop()
+    assert future.result().title == "t0"
+
+
+def test_writer_thread_survives_unexpected_errors(bind):
+    writer = main.TaskWriter(bind, window=0.01, max_rows=8)
+    record = writer._record
+
+    def broken_record(size, split):
+        writer._record = record
+        raise RuntimeError("сбой учёта")
+
+    writer._record = broken_record
+    with pytest.raises(RuntimeError):
+        writer.insert(_values(0))
+    assert writer.insert(_values(1)).title == "t1"
+    writer.stop()
+
+
+async def test_async_writer_survives_caller_cancelled_during_retry(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'group_async.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(main.Base.metadata.create_all)
+    writer = main.AsyncTaskWriter(engine, window=0.05, max_rows=8)
+    execute, calls = writer._execute, []
+
+    async def flaky_execute(rows):
+        calls.append(len(rows))
+        if len(calls) == 1:
+            raise ValueError("пачка не записалась")  # пачка пишется по одной строке
+        if len(calls) == 2:
+            first.cancel()  # клиент ушёл, пока пишется его строка
+            await asyncio.sleep(0)
+        return await execute(rows)
+
+    writer._execute = flaky_execute
+    first = asyncio.ensure_future(writer.insert(_values(0)))
+    second = asyncio.ensure_future(writer.insert(_values(1)))
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert (await second).title == "t1"
+    assert (await asyncio.wait_for(writer.insert(_values(2)), 5)).title == "t2"
+    writer.stop()
+    await engine.dispose()
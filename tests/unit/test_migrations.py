@@ -0,0 +1,132 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from backend import main
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR UNIQUE, hashed_password VARCHAR)",
+    """CREATE TABLE tasks (
+        id INTEGER PRIMARY KEY, title VARCHAR, description TEXT, status VARCHAR,
+        created_at DATETIME, priority INTEGER, owner_id INTEGER REFERENCES users(id)
+    )""",
+    "INSERT INTO users (id, username, hashed_password) VALUES (1, 'legacy', 'x')",
+    "INSERT INTO tasks (id, title, description, status, created_at, priority, owner_id) "
+    "VALUES (1, 'старая задача', 'из прошлой версии', 'в работе', '2024-01-01 00:00:00', 2, 1)",
+]
+
+
+def _legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+    return engine
+
+
+def test_migrations_upgrade_existing_database(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    main.run_migrations(engine)
+
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("tasks")}
+    assert {"ix_tasks_owner_priority_created", "ix_tasks_owner_created", "ix_tasks_owner_id_id"} <= indexes
+
+    with engine.connect() as conn:
+        versions = conn.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars().all()
+        assert versions == [v for v, _, _ in sorted(main.MIGRATIONS, key=lambda m: m[0])]
+        # поисковый индекс построен и по строкам, существовавшим до миграции
+        found = conn.execute(text("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH '\"прошлой\"'")).all()
+        assert found == [(1,)]
+
+
+def test_migrations_are_idempotent(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    main.run_migrations(engine)
+    main.run_migrations(engine)
+
+    with engine.connect() as conn:
+        count = conn.execute(text("SELECT count(*) FROM schema_migrations")).scalar()
+    assert count == len(main.MIGRATIONS)
+
+
+def test_fresh_schema_matches_migrated_indexes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    main.Base.metadata.create_all(bind=engine)
+    fresh = {ix["name"] for ix in inspect(engine).get_indexes("tasks")}
+
+    migrated_engine = _legacy_engine(tmp_path)
+    main.run_migrations(migrated_engine)
+    migrated = {ix["name"] for ix in inspect(migrated_engine).get_indexes("tasks")}
+
+    assert {name for name in migrated if name.startswith("ix_tasks_owner")} <= fresh
+
+
+def test_fresh_database_needs_no_migrations(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    main.Base.metadata.create_all(bind=engine)
+
+    assert main.pending_migrations(engine) == []
+    assert main.pending_migrations(_legacy_engine(tmp_path)) == [
+        (version, description) for version, description, _ in sorted(main.MIGRATIONS, key=lambda m: m[0])
+    ]
+
+
+def test_startup_only_warns_about_pending_migrations(monkeypatch, tmp_path, caplog):
+    engine = _legacy_engine(tmp_path)
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr(main, "RUN_MIGRATIONS", False)
+
+    with caplog.at_level("WARNING", logger="benetasks"):
+        main.startup()
+    main.generations.stop()
+
+    assert "python main.py migrate" in caplog.text
+    indexes = {ix["name"] for ix in inspect(engine).get_indexes("tasks")}
+    assert "ix_tasks_owner_priority_created" not in indexes
+    assert len(main.pending_migrations(engine)) == len(main.MIGRATIONS)
+
+
+def test_counters_migration_counts_existing_tasks(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    main.run_migrations(engine)
+
+    with engine.begin() as conn:
+        counters = conn.execute(text("SELECT owner_id, status, priority, count FROM task_counters")).all()
+        assert counters == [(1, "в работе", 2, 1)]
+        conn.execute(text("UPDATE tasks SET status = 'завершено' WHERE id = 1"))
+        counters = conn.execute(text(
+            "SELECT status, count FROM task_counters WHERE count > 0"
+        )).all()
+    assert counters == [("завершено", 1)]
+
+
+def test_create_all_leaves_existing_database_to_migrations(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    main.Base.metadata.create_all(engine)  # создаёт только task_counters и schema_migrations
+
+    with engine.connect() as conn:
+        assert not main.task_counter_triggers_installed(conn)
+        assert conn.execute(text("SELECT count(*) FROM task_counters")).scalar() == 0
+    main.run_migrations(engine)
+    with engine.connect() as conn:
+        assert main.task_counter_triggers_installed(conn)
+        assert conn.execute(text("SELECT sum(count) FROM task_counters")).scalar() == 1
+
+
+def test_batched_reconcile_matches_full_recount(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'batches.db'}")
+    main.Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for i in range(30):
+            owner = None if i % 10 == 0 else i % 7 + 1
+            conn.execute(text("INSERT INTO tasks (title, status, priority, owner_id) VALUES ('t', :s, :p, :o)"),
+                         {"s": main.TASK_STATUSES[i % 3], "p": i % 4, "o": owner})
+        expected = conn.execute(text("SELECT * FROM task_counters WHERE count > 0 ORDER BY 1, 2, 3")).all()
+        conn.execute(text("UPDATE task_counters SET count = 99"))
+        conn.execute(text("INSERT INTO task_counters VALUES (5, 'лишний', 9, 3)"))
+
+    main.reconcile_task_counters_in_batches(engine, batch_owners=3)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT * FROM task_counters WHERE count > 0 ORDER BY 1, 2, 3")).all()
+    assert rows == expected and any(row[0] == 0 for row in rows)
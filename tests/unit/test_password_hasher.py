@@ -0,0 +1,47 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from backend import main
+
+
+def test_inline_hasher_roundtrip_and_stats():
+    hasher = main.PasswordHasher(workers=0, queue_limit=4)
+    hashed = hasher.hash("s3cr3t!")
+    assert hasher.verify("s3cr3t!", hashed)
+    assert not hasher.verify("wrong", hashed)
+
+    stats = hasher.stats()
+    assert stats["completed"] == 3
+    assert stats["in_flight"] == 0
+    assert stats["bcrypt_seconds"] > 0
+
+
+def test_process_pool_hasher_and_queue_limit():
+    hasher = main.PasswordHasher(workers=1, queue_limit=1)
+    try:
+        hashed = hasher.hash("pooled")
+        assert hasher.verify("pooled", hashed)
+
+        # единственный слот очереди занят — следующий запрос отклоняется сразу
+        busy = hasher.submit(time.sleep, 0.5)
+        with pytest.raises(HTTPException) as exc:
+            hasher.hash("overflow")
+        assert exc.value.status_code == 503
+        busy.result()
+        assert hasher.stats()["rejected"] == 1
+    finally:
+        hasher.shutdown()
+
+
+async def test_async_verify_uses_pool():
+    hasher = main.PasswordHasher(workers=0, queue_limit=2)
+    hashed = await hasher.hash_async("async-pass")
+    assert await hasher.verify_async("async-pass", hashed)
+
+
+async def test_hashing_metrics_endpoint(aclient):
+    r = await aclient.get("/metrics/hashing")
+    assert r.status_code == 200
+    assert {"in_flight", "submitted", "rejected", "bcrypt_seconds"} <= r.json().keys()
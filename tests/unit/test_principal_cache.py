@@ -0,0 +1,83 @@
+import time
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import event
+
+from backend import main
+from tests.conftest import TestingSessionLocal, engine
+
+
+async def _login(ac: AsyncClient, name: str):
+    await ac.post("/register", json={"username": name, "password": "principal"})
+    token = (
+        await ac.post(
+            "/token",
+            data={"username": name, "password": "principal"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@pytest.mark.asyncio
+async def test_seen_token_needs_no_users_query(aclient: AsyncClient):
+    hdrs = await _login(aclient, "principal_user")
+    task_id = (
+        await aclient.post("/tasks", json={"title": "p", "description": "x"}, headers=hdrs)
+    ).json()["id"]
+
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        r = await aclient.get(f"/tasks/{task_id}", headers=hdrs)
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+    assert r.status_code == 200
+    assert not any("FROM users" in statement for statement in counter.statements)
+    assert len(counter.statements) == 1
+
+
+@pytest.mark.asyncio
+async def test_user_change_invalidates_principal(aclient: AsyncClient):
+    hdrs = await _login(aclient, "renamed_user")
+    assert (await aclient.get("/tasks", headers=hdrs)).status_code == 200
+
+    db = TestingSessionLocal()
+    try:
+        user = db.query(main.User).filter(main.User.username == "renamed_user").first()
+        user.username = "renamed_user_2"
+        db.commit()
+    finally:
+        db.close()
+
+    # токен выдан на старое имя — кэш сброшен, пользователь больше не находится
+    r = await aclient.get("/tasks", headers=hdrs)
+    assert r.status_code == 401
+    assert r.json()["detail"] == "Пользователь не найден"
+
+
+def test_entry_never_outlives_token_exp():
+    cache = main.PrincipalCache(max_entries=10, ttl=3600, generations=main.LocalGenerations())
+    user = main.User(id=1, username="short", hashed_password="x")
+    cache.remember("tok", user, exp=time.time() - 1)  # токен уже истёк
+    assert cache.get("tok") is None
+
+
+def test_lru_bound_and_detached_copy():
+    cache = main.PrincipalCache(max_entries=1, ttl=60, generations=main.LocalGenerations())
+    first = cache.remember("a", main.User(id=1, username="a", hashed_password="x"), exp=None)
+    cache.remember("b", main.User(id=2, username="b", hashed_password="x"), exp=None)
+
+    assert cache.get("a") is None
+    assert cache.get("b").username == "b"
+    assert first.id == 1  # копия доступна без сессии
@@ -0,0 +1,59 @@
+from backend import main
+
+
+def _samples(text):
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, _, value = line.rpartition(" ")
+            samples[name] = float(value)
+    return samples
+
+
+async def test_metrics_record_routes_statuses_and_latency(aclient):
+    await aclient.post("/register", json={"username": "prom_user", "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": "prom_user", "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    before = _samples((await aclient.get("/metrics")).text)
+
+    await aclient.get("/tasks", headers=headers)
+    await aclient.get("/tasks", headers=headers)
+    await aclient.get("/tasks/987654", headers=headers)
+    await aclient.get("/no/such/path")
+
+    r = await aclient.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = _samples(r.text)
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    assert delta('benetasks_http_requests_total{method="GET",route="/tasks",status="200"}') == 2
+    assert delta('benetasks_http_requests_total{method="GET",route="/tasks/{task_id}",status="404"}') == 1
+    assert delta('benetasks_http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert delta('benetasks_http_request_duration_seconds_count{method="GET",route="/tasks"}') == 2
+    assert after['benetasks_http_request_duration_seconds_bucket{method="GET",route="/tasks",le="+Inf"}'] == \
+        after['benetasks_http_request_duration_seconds_count{method="GET",route="/tasks"}']
+    assert after["benetasks_http_requests_in_flight"] == 1  # сам запрос /metrics
+    assert delta("benetasks_task_cache_hits_total") >= 1
+    assert 0 <= after["benetasks_task_cache_hit_ratio"] <= 1
+    assert after["benetasks_bcrypt_seconds_count"] >= 2  # регистрация и вход
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = main.Histogram((0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert histogram.render("x", 'a="b"') == [
+        'x_bucket{a="b",le="0.1"} 2',
+        'x_bucket{a="b",le="1.0"} 3',
+        'x_bucket{a="b",le="+Inf"} 4',
+        'x_sum{a="b"} 3.65',
+        'x_count{a="b"} 4',
+    ]
@@ -0,0 +1,82 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.dialects import postgresql
+
+from backend import main
+
+
+async def _headers(ac: AsyncClient, name: str):
+    await ac.post("/register", json={"username": name, "password": "search123"})
+    token = (
+        await ac.post(
+            "/token",
+            data={"username": name, "password": "search123"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _titles(ac: AsyncClient, hdrs, search):
+    r = await ac.get("/tasks", params={"search": search}, headers=hdrs)
+    assert r.status_code == 200
+    return [t["title"] for t in r.json()]
+
+
+@pytest.mark.asyncio
+async def test_fts_index_follows_insert_update_delete(aclient: AsyncClient):
+    hdrs = await _headers(aclient, "searcher")
+    created = await aclient.post(
+        "/tasks", json={"title": "Купить молоко", "description": "в магазине"}, headers=hdrs
+    )
+    task_id = created.json()["id"]
+    await aclient.post("/tasks", json={"title": "Позвонить", "description": "маме"}, headers=hdrs)
+
+    # подстрока без учёта регистра, в том числе по описанию
+    assert await _titles(aclient, hdrs, "МОЛОК") == ["Купить молоко"]
+    assert await _titles(aclient, hdrs, "магазин") == ["Купить молоко"]
+
+    await aclient.put(
+        f"/tasks/{task_id}",
+        json={"title": "Купить хлеб", "description": "в булочной", "status": "в работе", "priority": 1},
+        headers=hdrs,
+    )
+    assert await _titles(aclient, hdrs, "молок") == []
+    assert await _titles(aclient, hdrs, "хлеб") == ["Купить хлеб"]
+
+    await aclient.delete(f"/tasks/{task_id}", headers=hdrs)
+    assert await _titles(aclient, hdrs, "хлеб") == []
+
+
+@pytest.mark.asyncio
+async def test_search_ranked_and_short_queries(aclient: AsyncClient):
+    hdrs = await _headers(aclient, "ranker")
+    await aclient.post("/tasks", json={"title": "report", "description": "weekly"}, headers=hdrs)
+    await aclient.post(
+        "/tasks", json={"title": "report report", "description": "report for the report"}, headers=hdrs
+    )
+
+    # более релевантная задача — первой
+    assert await _titles(aclient, hdrs, "report") == ["report report", "report"]
+    # строки короче триграммы ищутся обычным LIKE
+    assert sorted(await _titles(aclient, hdrs, "re")) == ["report", "report report"]
+    # спецсимволы не ломают запрос и не работают как шаблоны
+    assert await _titles(aclient, hdrs, '"%_') == []
+
+
+@pytest.mark.asyncio
+async def test_search_isolated_between_users(aclient: AsyncClient):
+    owner = await _headers(aclient, "search_owner")
+    other = await _headers(aclient, "search_other")
+    await aclient.post("/tasks", json={"title": "секретный план", "description": "x"}, headers=owner)
+
+    assert await _titles(aclient, other, "секрет") == []
+
+
+def test_postgres_search_uses_tsvector_and_trigrams():
+    query, relevance = main.apply_search(main.Session().query(main.Task), "postgresql", "отчёт")
+    sql = str(query.order_by(relevance).statement.compile(dialect=postgresql.dialect()))
+    assert "to_tsvector('russian', coalesce(title, ''))" in sql and ") @@" in sql
+    assert "plainto_tsquery" in sql
+    assert "ILIKE" in sql
+    assert "ts_rank" in sql and "similarity" in sql
@@ -0,0 +1,80 @@
+from sqlalchemy import text
+
+from backend import main
+from tests.conftest import engine
+
+
+async def test_server_timing_counts_request_queries(aclient):
+    await aclient.post("/register", json={"username": "timing_user", "password": "123456"})
+    token = (
+        await aclient.post(
+            "/token",
+            data={"username": "timing_user", "password": "123456"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    task = (await aclient.post("/tasks", json={"title": "a", "description": "b"}, headers=headers)).json()
+
+    r = await aclient.get(f"/tasks/{task['id']}", headers=headers)
+    timing = r.headers["server-timing"]
+    assert timing.startswith('db;desc="') and ";dur=" in timing
+    assert int(timing.split('"')[1].split()[0]) >= 1
+
+    r = await aclient.get("/metrics/cache")
+    assert r.headers["server-timing"].startswith('db;desc="0 SQL"')
+
+
+def test_slow_queries_logged_without_parameters(monkeypatch, caplog):
+    monkeypatch.setattr(main, "SQL_SLOW_QUERY_MS", 0)
+    with caplog.at_level("WARNING", logger="benetasks.sql"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT :secret"), {"secret": "hashed-password-value"})
+    assert "Медленный SQL-запрос" in caplog.text and "SELECT ?" in caplog.text
+    assert "hashed-password-value" not in caplog.text
+
+
+def test_slow_query_parameters_logged_on_request(monkeypatch, caplog):
+    monkeypatch.setattr(main, "SQL_SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(main, "SQL_LOG_PARAMS", True)
+    with caplog.at_level("WARNING", logger="benetasks.sql"):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT :value"), {"value": 42})
+    assert "SELECT ?" in caplog.text and "42" in caplog.text
+
+
+def test_repeated_statements_reported_as_n_plus_one(monkeypatch, caplog):
+    monkeypatch.setattr(main, "SQL_N_PLUS_ONE_THRESHOLD", 3)
+    queries = main.RequestQueries()
+    token = main.current_queries.set(queries)
+    try:
+        with engine.connect() as conn:
+            for task_id in range(3):
+                conn.execute(text("SELECT title FROM tasks WHERE id = :id"), {"id": task_id})
+            conn.execute(text("SELECT 1"))
+    finally:
+        main.current_queries.reset(token)
+
+    assert queries.count == 4
+    with caplog.at_level("WARNING", logger="benetasks.sql"):
+        main.report_repeated_queries("GET", "/tasks", queries)
+    assert "Возможный N+1 в GET /tasks: запрос выполнен 3 раз" in caplog.text
+    assert "SELECT 1" not in caplog.text
+
+
+def test_executemany_batches_not_reported_as_n_plus_one(monkeypatch, caplog):
+    monkeypatch.setattr(main, "SQL_N_PLUS_ONE_THRESHOLD", 3)
+    queries = main.RequestQueries()
+    token = main.current_queries.set(queries)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("CREATE TEMP TABLE imported (value INTEGER)"))
+            for chunk in range(3):
+                conn.execute(text("INSERT INTO imported VALUES (:value)"), [{"value": chunk * 10 + i} for i in range(10)])
+    finally:
+        main.current_queries.reset(token)
+
+    assert queries.count == 4
+    with caplog.at_level("WARNING", logger="benetasks.sql"):
+        main.report_repeated_queries("POST", "/tasks/import", queries)
+    assert "Возможный N+1" not in caplog.text
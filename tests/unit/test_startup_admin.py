@@ -1,3 +1,6 @@
+from sqlalchemy import create_engine, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
 from backend import main
 
 
@@ -23,3 +26,24 @@ def test_startup_creates_admin(monkeypatch):
         db.close()
 
     assert after == before  # кол-во записей не изменилось
+
+
+def test_startup_tolerates_admin_created_by_another_worker(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "SessionLocal", sessionmaker(bind=engine))
+    hash_password = main.get_password_hash
+
+    def hash_while_neighbour_starts(password):
+        # соседний воркер успевает создать admin между проверкой и вставкой
+        with engine.begin() as conn:
+            conn.execute(insert(main.User).values(username="admin", hashed_password="x"))
+        return hash_password(password)
+
+    monkeypatch.setattr(main, "get_password_hash", hash_while_neighbour_starts)
+    main.startup()
+    main.generations.stop()
+
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(main.User)).scalar() == 1
+    engine.dispose()
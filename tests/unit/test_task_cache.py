@@ -0,0 +1,79 @@
+import pytest
+from httpx import AsyncClient
+
+from backend import main
+
+
+def test_lru_eviction_and_stats():
+    cache = main.TaskListCache(max_entries=2, ttl=60)
+    cache.set((1, None, None, None), ["a"], 0)
+    cache.set((1, "title", "asc", None), ["b"], 0)
+    assert cache.get((1, None, None, None)) == ["a"]  # теперь самый «свежий»
+    cache.set((2, None, None, None), ["c"], 0)             # вытесняет (1, "title", ...)
+
+    assert cache.get((1, "title", "asc", None)) is None
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    cache = main.TaskListCache(max_entries=10, ttl=5)
+    now = [1000.0]
+    monkeypatch.setattr(main.time, "monotonic", lambda: now[0])
+    cache.set((1, None, None, None), [], 0)
+    assert cache.get((1, None, None, None)) == []
+    now[0] += 5
+    assert cache.get((1, None, None, None)) is None
+    assert len(cache) == 0
+
+
+def test_byte_budget_evicts_and_skips_oversized_bodies():
+    cache = main.TaskListCache(max_entries=10, ttl=60, max_bytes=10, max_entry_bytes=6)
+    cache.set((1, "a"), b"aaaa", 0)
+    cache.set((1, "b"), b"bbbb", 0)
+    cache.set((2, "c"), b"cccc", 0)                    # 12 байт > 10: вытесняется (1, "a")
+    assert cache.get((1, "a")) is None
+    assert cache.stats()["bytes"] == 8
+
+    cache.set((2, "big"), b"x" * 7, 0)                 # больше max_entry_bytes — не кэшируется
+    assert cache.get((2, "big")) is None
+    cache.set((1, "b"), b"bb", 0)                      # перезапись учитывает новый размер
+    cache.invalidate_owner(2)
+    stats = cache.stats()
+    assert (stats["entries"], stats["bytes"], stats["oversized"], stats["evictions"]) == (1, 2, 1, 1)
+
+
+def test_cache_key_normalization():
+    assert main.tasks_cache_key(1, None, "desc", "") == main.tasks_cache_key(1, None, "asc", None)
+    assert main.tasks_cache_key(1, "title", "desc", None) != main.tasks_cache_key(1, "title", "asc", None)
+
+
+async def _headers(ac: AsyncClient, name: str):
+    await ac.post("/register", json={"username": name, "password": "cache123"})
+    token = (
+        await ac.post(
+            "/token",
+            data={"username": name, "password": "cache123"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+    ).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_cache_is_per_user(aclient: AsyncClient):
+    first = await _headers(aclient, "cache_first")
+    second = await _headers(aclient, "cache_second")
+
+    await aclient.post("/tasks", json={"title": "mine", "description": "x"}, headers=first)
+    assert [t["title"] for t in (await aclient.get("/tasks", headers=first)).json()] == ["mine"]
+
+    # второй пользователь не получает закэшированный список первого
+    assert (await aclient.get("/tasks", headers=second)).json() == []
+
+    r = await aclient.get("/metrics/cache")
+    assert r.status_code == 200
+    assert {"hits", "misses", "evictions", "hit_ratio"} <= r.json().keys()
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+from backend import main
+
+START = datetime(2025, 1, 1)
+
+
+def _item(task_id, priority, minutes=0):
+    return main.TopItem(id=task_id, title=f"t{task_id}", description="", status="в ожидании",
+                        created_at=START + timedelta(minutes=minutes), priority=priority)
+
+
+def _index(depth=3, max_owners=10):
+    return main.TopIndex(depth, max_owners, main.LocalGenerations())
+
+
+def _rows(index, owner_id, generation, n=10, priority=None, all_priorities=False):
+    rows = index.page(owner_id, generation, n, priority, all_priorities, None)
+    return None if rows is None else [row.id for row in rows]
+
+
+def test_complete_branch_accepts_any_insert():
+    index = _index()
+    index.load(1, 0, None, False, [_item(1, 2), _item(2, 1)])
+    generation = index.generations.bump(1)
+    index.upsert(1, generation, _item(3, 0))
+
+    assert _rows(index, 1, generation) == [1, 2, 3]
+
+
+def test_incomplete_prefix_ignores_tasks_past_its_end_and_reloads_after_delete():
+    index = _index(depth=2)
+    index.load(1, 0, None, False, [_item(1, 5), _item(2, 4), _item(3, 3)])  # depth + 1 — есть ещё задачи
+    assert _rows(index, 1, 0, n=1) == [1, 2]
+    assert _rows(index, 1, 0, n=2) is None  # нужно 3 строки, известно 2
+
+    generation = index.generations.bump(1)
+    index.upsert(1, generation, _item(4, 0))  # ниже префикса — позиция неизвестна
+    assert _rows(index, 1, generation, n=1) == [1, 2]
+
+    generation = index.generations.bump(1)
+    index.forget(1)  # изменение или удаление задачи
+    assert index.needs_load(1, generation, None, False)
+
+
+def test_priority_branch_takes_only_its_priority():
+    index = _index()
+    index.load(1, 0, 2, False, [_item(1, 2, minutes=1)])
+    generation = index.generations.bump(1)
+    index.upsert(1, generation, _item(2, 3, minutes=5))
+    generation = index.generations.bump(1)
+    index.upsert(1, generation, _item(3, 2, minutes=9))
+
+    assert _rows(index, 1, generation, priority=2) == [3, 1]
+
+
+def test_foreign_write_makes_prefix_stale():
+    index = _index()
+    index.load(1, 0, None, False, [_item(1, 1)])
+    index.generations.bump(1)  # запись без правки префикса (другой воркер, пакет)
+    generation = index.generations.bump(1)
+    index.upsert(1, generation, _item(2, 9))
+
+    assert _rows(index, 1, generation) is None
+    assert index.stats()["stale"] == 1
+
+
+def test_load_skipped_when_generation_moved():
+    index = _index()
+    index.generations.bump(1)
+    index.load(1, 0, None, False, [_item(1, 1)])
+
+    assert index.stats()["owners"] == 0
+
+
+def test_least_recently_used_owner_evicted():
+    index = _index(max_owners=2)
+    for owner_id in (1, 2):
+        index.load(owner_id, 0, None, False, [_item(owner_id, 1)])
+    assert _rows(index, 1, 0) == [1]
+    index.load(3, 0, None, False, [_item(3, 1)])
+
+    assert _rows(index, 2, 0) is None
+    assert _rows(index, 1, 0) == [1]
+    assert index.stats()["evictions"] == 1
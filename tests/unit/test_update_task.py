@@ -37,10 +37,12 @@ async def test_update_task_success_and_cache_cleared(aclient: AsyncClient):
     task = create.json()
     task_id = task["id"]
 
-    # 3) Запрашиваем список, чтобы заполнить кэш
+    # 3) Запрашиваем список, чтобы заполнить кэш; повторный запрос — из кэша
     r1 = await aclient.get("/tasks", headers=headers)
     assert r1.status_code == 200
-    assert main.cache_data["tasks"] is not None
+    hits = main.task_cache.stats()["hits"]
+    await aclient.get("/tasks", headers=headers)
+    assert main.task_cache.stats()["hits"] == hits + 1
 
     # 4) Обновляем ВСЕ поля, включая status
     payload = {
@@ -60,8 +62,11 @@ async def test_update_task_success_and_cache_cleared(aclient: AsyncClient):
     assert updated["status"] == "в работе"
     assert updated["priority"] == 5
 
-    # 6) И кэш был очищен
-    assert main.cache_data["tasks"] is None
+    # 6) И кэш был очищен — список отдаёт уже обновлённую задачу
+    misses = main.task_cache.stats()["misses"]
+    r2 = await aclient.get("/tasks", headers=headers)
+    assert main.task_cache.stats()["misses"] == misses + 1
+    assert r2.json()[0]["title"] == "updated"
 
 
 @pytest.mark.asyncio